@@ -4,7 +4,12 @@ API routes module for voice command application.
 from flask import Blueprint, request, jsonify, send_from_directory, current_app
 import db
 import os
-from speech_recognition_handler import start_speech_recognition, stop_speech_recognition, update_openai_api_key, toggle_sentiment_mode, get_sentiment_mode_state, execute_script, get_scripts_execution_state, toggle_scripts_execution
+from speech_recognizer import RECOGNIZER_BACKENDS, WAKE_WORD_BACKENDS, create_backend
+from command_policy import CONCURRENCY_POLICIES
+from command_grammar import normalize_grammar_phrase
+from input_simulation import TIMING_PROFILES
+from decision_cache import decision_cache
+from speech_recognition_handler import get_openai_client, get_capture_stats, get_vad_stats, get_wake_word_stats, get_pipeline_stats, get_script_jobs, cancel_script_job, start_speech_recognition, stop_speech_recognition, update_openai_api_key, toggle_sentiment_mode, get_sentiment_mode_state, execute_script, get_scripts_execution_state, toggle_scripts_execution
 
 # Create the API blueprint
 api_bp = Blueprint('api', __name__)
@@ -18,6 +23,59 @@ def index():
 def serve_public(path):
     return send_from_directory('public', path)
 
+def parse_fuzzy_threshold(value):
+    """Validate a fuzzy match threshold from a request. None means use the global setting."""
+    if value is None or value == '':
+        return None
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('fuzzy_threshold must be a number between 0 and 1')
+    if threshold < 0 or threshold > 1:
+        raise ValueError('fuzzy_threshold must be a number between 0 and 1')
+    return threshold
+
+def parse_concurrency_policy(value):
+    """Validate a command concurrency policy from a request. None means serialize."""
+    if value is None or value == '':
+        return None
+    if value not in CONCURRENCY_POLICIES:
+        raise ValueError(f"concurrency_policy must be one of {', '.join(CONCURRENCY_POLICIES)}")
+    return value
+
+def parse_optional_count(name, value, minimum=0):
+    """Validate an optional whole number of at least minimum from a request."""
+    if value is None or value == '':
+        return None
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a whole number of at least {minimum}')
+    if count < minimum or count != float(value):
+        raise ValueError(f'{name} must be a whole number of at least {minimum}')
+    return count
+
+def parse_timing_profile(value):
+    """Validate a keystroke timing profile name from a request. None means use the global setting."""
+    if value is None or value == '':
+        return None
+    if value not in TIMING_PROFILES:
+        raise ValueError(f"timing_profile must be one of {', '.join(TIMING_PROFILES)}")
+    return value
+
+def parse_command_policy(data, existing=None):
+    """Validate the concurrency, coalescing, rate and timing fields, keeping existing values that aren't sent."""
+    existing = existing or {}
+    return {
+        'concurrency_policy': parse_concurrency_policy(data.get('concurrency_policy', existing.get('concurrency_policy'))),
+        'coalesce_ms': parse_optional_count('coalesce_ms', data.get('coalesce_ms', existing.get('coalesce_ms'))),
+        # null means no limit; 0 is rejected rather than read as either no limit or never
+        'max_rate_per_minute': parse_optional_count(
+            'max_rate_per_minute', data.get('max_rate_per_minute', existing.get('max_rate_per_minute')), minimum=1
+        ),
+        'timing_profile': parse_timing_profile(data.get('timing_profile', existing.get('timing_profile')))
+    }
+
 # API Routes
 @api_bp.route('/api/commands', methods=['GET'])
 def get_commands():
@@ -45,11 +103,20 @@ def add_command():
     # Get partial match field
     partial_match = data.get('partial_match', False)
     
+    # Get fuzzy match threshold and concurrency policy fields
+    try:
+        fuzzy_threshold = parse_fuzzy_threshold(data.get('fuzzy_threshold'))
+        policy = parse_command_policy(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     command_id = db.add_command(
         phrases, 
         data['script'], 
         understand_sentiment=understand_sentiment,
-        partial_match=partial_match
+        partial_match=partial_match,
+        fuzzy_threshold=fuzzy_threshold,
+        **policy
     )
     
     return jsonify({
@@ -58,7 +125,9 @@ def add_command():
         'phrase': phrases[0],  # For backward compatibility
         'script': data['script'],
         'understand_sentiment': understand_sentiment,
-        'partial_match': partial_match
+        'partial_match': partial_match,
+        'fuzzy_threshold': fuzzy_threshold,
+        **policy
     }), 201
 
 @api_bp.route('/api/commands/<int:command_id>', methods=['PUT'])
@@ -82,12 +151,25 @@ def update_command(command_id):
     # Get partial match field
     partial_match = data.get('partial_match', False)
     
+    existing = db.get_command(command_id)
+    if not existing:
+        return jsonify({'error': 'Command not found'}), 404
+    
+    # Keep the existing fuzzy match threshold and concurrency policy unless they are sent
+    try:
+        fuzzy_threshold = parse_fuzzy_threshold(data.get('fuzzy_threshold', existing['fuzzy_threshold']))
+        policy = parse_command_policy(data, existing)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     success = db.update_command(
         command_id, 
         phrases, 
         data['script'],
         understand_sentiment=understand_sentiment,
-        partial_match=partial_match
+        partial_match=partial_match,
+        fuzzy_threshold=fuzzy_threshold,
+        **policy
     )
     
     if not success:
@@ -99,7 +181,9 @@ def update_command(command_id):
         'phrase': phrases[0],  # For backward compatibility
         'script': data['script'],
         'understand_sentiment': understand_sentiment,
-        'partial_match': partial_match
+        'partial_match': partial_match,
+        'fuzzy_threshold': fuzzy_threshold,
+        **policy
     })
 
 @api_bp.route('/api/commands/<int:command_id>', methods=['DELETE'])
@@ -166,13 +250,230 @@ def set_openai_key():
     
     return jsonify({'success': True})
 
+@api_bp.route('/api/openai-base-url', methods=['GET'])
+def get_openai_base_url():
+    return jsonify({'baseUrl': db.get_openai_base_url()})
+
+@api_bp.route('/api/openai-base-url', methods=['POST'])
+def set_openai_base_url():
+    data = request.get_json()
+    if not data or not data.get('baseUrl'):
+        return jsonify({'error': 'Missing base URL'}), 400
+    
+    base_url = data['baseUrl'].strip().rstrip('/')
+    if not base_url.startswith(('http://', 'https://')):
+        return jsonify({'error': 'Base URL must start with http:// or https://'}), 400
+    
+    db.set_openai_base_url(base_url)
+    return jsonify({'baseUrl': base_url})
+
+@api_bp.route('/api/openai-streaming', methods=['GET'])
+def get_openai_streaming():
+    return jsonify({'enabled': db.get_openai_streaming_enabled()})
+
+@api_bp.route('/api/openai-streaming', methods=['POST'])
+def set_openai_streaming():
+    data = request.get_json()
+    if not data or 'enabled' not in data:
+        return jsonify({'error': 'Missing enabled state'}), 400
+    
+    db.set_openai_streaming_enabled(bool(data['enabled']))
+    return jsonify({'enabled': bool(data['enabled'])})
+
+@api_bp.route('/api/continuous-capture', methods=['GET'])
+def get_continuous_capture():
+    return jsonify({
+        'enabled': db.get_continuous_capture_enabled(),
+        'stats': get_capture_stats()
+    })
+
+@api_bp.route('/api/continuous-capture', methods=['POST'])
+def set_continuous_capture():
+    """Enable or disable continuous capture; applies when recognition restarts."""
+    data = request.get_json()
+    if not data or 'enabled' not in data:
+        return jsonify({'error': 'Missing enabled state'}), 400
+    
+    db.set_continuous_capture_enabled(bool(data['enabled']))
+    return jsonify({'enabled': bool(data['enabled'])})
+
+@api_bp.route('/api/recognizer-backend', methods=['GET'])
+def get_recognizer_backend():
+    settings = db.get_recognizer_backend_settings()
+    return jsonify({
+        'backend': settings['backend'],
+        'voskModelPath': settings['vosk_model_path'],
+        'available': list(RECOGNIZER_BACKENDS)
+    })
+
+@api_bp.route('/api/recognizer-backend', methods=['POST'])
+def set_recognizer_backend():
+    data = request.get_json()
+    if not data or 'backend' not in data:
+        return jsonify({'error': 'Missing backend'}), 400
+    
+    backend = data['backend']
+    if backend not in RECOGNIZER_BACKENDS:
+        return jsonify({'error': f"Backend must be one of: {', '.join(RECOGNIZER_BACKENDS)}"}), 400
+    
+    db.set_recognizer_backend_settings(backend, data.get('voskModelPath'))
+    return jsonify({'backend': backend})
+
+@api_bp.route('/api/grammar-mode', methods=['GET'])
+def get_grammar_mode():
+    return jsonify({'enabled': db.get_grammar_mode_enabled()})
+
+@api_bp.route('/api/grammar-mode', methods=['POST'])
+def set_grammar_mode():
+    data = request.get_json()
+    if not data or 'enabled' not in data:
+        return jsonify({'error': 'Missing enabled state'}), 400
+    
+    db.set_grammar_mode_enabled(bool(data['enabled']))
+    return jsonify({'enabled': bool(data['enabled'])})
+
+@api_bp.route('/api/vad', methods=['GET'])
+def get_vad():
+    return jsonify({
+        'enabled': db.get_vad_enabled(),
+        'stats': get_vad_stats()
+    })
+
+@api_bp.route('/api/vad', methods=['POST'])
+def set_vad():
+    data = request.get_json()
+    if not data or 'enabled' not in data:
+        return jsonify({'error': 'Missing enabled state'}), 400
+    
+    db.set_vad_enabled(bool(data['enabled']))
+    return jsonify({'enabled': bool(data['enabled'])})
+
+@api_bp.route('/api/interim-triggering', methods=['GET'])
+def get_interim_triggering():
+    return jsonify({'enabled': db.get_interim_triggering_enabled()})
+
+@api_bp.route('/api/interim-triggering', methods=['POST'])
+def set_interim_triggering():
+    """Enable or disable firing commands from interim hypotheses.
+    
+    Needs continuous capture and a streaming recognizer backend (vosk).
+    """
+    data = request.get_json()
+    if not data or 'enabled' not in data:
+        return jsonify({'error': 'Missing enabled state'}), 400
+    
+    db.set_interim_triggering_enabled(bool(data['enabled']))
+    return jsonify({'enabled': bool(data['enabled'])})
+
+@api_bp.route('/api/keystroke-timing', methods=['GET'])
+def get_keystroke_timing():
+    return jsonify({
+        'profile': db.get_keystroke_timing_profile(),
+        'profiles': TIMING_PROFILES
+    })
+
+@api_bp.route('/api/keystroke-timing', methods=['POST'])
+def set_keystroke_timing():
+    """Set the global keystroke timing profile; commands can override it with timing_profile."""
+    data = request.get_json()
+    if not data or 'profile' not in data:
+        return jsonify({'error': 'Missing profile'}), 400
+    if data['profile'] not in TIMING_PROFILES:
+        return jsonify({'error': f"profile must be one of {', '.join(TIMING_PROFILES)}"}), 400
+    
+    db.set_keystroke_timing_profile(data['profile'])
+    return jsonify({'profile': data['profile']})
+
+@api_bp.route('/api/wake-word', methods=['GET'])
+def get_wake_word():
+    settings = db.get_wake_word_settings()
+    return jsonify({
+        'wakeWord': settings['wake_word'],
+        'backend': settings['backend'],
+        'windowSeconds': settings['window_seconds'],
+        'available': WAKE_WORD_BACKENDS,
+        'stats': get_wake_word_stats()
+    })
+
+@api_bp.route('/api/wake-word', methods=['POST'])
+def set_wake_word():
+    """Set the wake word; an empty wake word turns the gate off."""
+    data = request.get_json()
+    if not data or 'wakeWord' not in data:
+        return jsonify({'error': 'Missing wake word'}), 400
+    
+    settings = db.get_wake_word_settings()
+    backend = data.get('backend', settings['backend'])
+    if backend not in WAKE_WORD_BACKENDS:
+        return jsonify({'error': f"Backend must be one of the on-device backends: {', '.join(WAKE_WORD_BACKENDS)}"}), 400
+    
+    try:
+        window_seconds = float(data.get('windowSeconds', settings['window_seconds']))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'windowSeconds must be a number'}), 400
+    if window_seconds < 0:
+        return jsonify({'error': 'windowSeconds must not be negative'}), 400
+    
+    wake_word = data['wakeWord'].strip()
+    if wake_word and not normalize_grammar_phrase(wake_word):
+        return jsonify({'error': 'Wake word must contain letters or digits'}), 400
+    if wake_word:
+        # Fail now rather than silently leaving the gate off when the backend is missing
+        try:
+            create_backend(backend, model_path=db.get_recognizer_backend_settings()['vosk_model_path']).close()
+        except Exception as e:
+            return jsonify({'error': f"Wake word backend '{backend}' is not available: {e}"}), 400
+    
+    db.set_wake_word_settings(wake_word, backend, window_seconds)
+    return jsonify({
+        'wakeWord': wake_word,
+        'backend': backend,
+        'windowSeconds': window_seconds
+    })
+
+@api_bp.route('/api/calibration', methods=['GET'])
+def get_calibration():
+    return jsonify({'profile': db.get_calibration_profile()})
+
+@api_bp.route('/api/calibration', methods=['DELETE'])
+def clear_calibration():
+    """Forget the saved calibration so the next start calibrates again."""
+    db.clear_calibration_profile()
+    return jsonify({'success': True})
+
+@api_bp.route('/api/pipeline-stats', methods=['GET'])
+def pipeline_stats():
+    return jsonify({'pipeline': get_pipeline_stats()})
+
+@api_bp.route('/api/script-jobs', methods=['GET'])
+def script_jobs():
+    return jsonify(get_script_jobs())
+
+@api_bp.route('/api/script-jobs/cancel', methods=['POST'])
+def cancel_all_script_jobs():
+    return jsonify({'success': True, 'cancelled': cancel_script_job()})
+
+@api_bp.route('/api/script-jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_one_script_job(job_id):
+    if not cancel_script_job(job_id):
+        return jsonify({'error': 'Job not found or already finished'}), 404
+    return jsonify({'success': True, 'cancelled': 1})
+
 @api_bp.route('/api/openai-stats', methods=['GET'])
 def get_openai_stats():
     request_count = db.get_openai_request_count()
     return jsonify({
-        'requestCount': request_count
+        'requestCount': request_count,
+        'decisionCache': decision_cache.get_stats(),
+        'http': get_openai_client().get_stats()
     })
 
+@api_bp.route('/api/openai-cache', methods=['DELETE'])
+def clear_openai_cache():
+    """Clear the cached OpenAI command decisions."""
+    decision_cache.clear()
+    return jsonify({'success': True})
+
 @api_bp.route('/api/shortcut-key', methods=['GET'])
 def get_shortcut_key():
     shortcut_key = db.get_global_shortcut_key()
@@ -220,9 +521,9 @@ def update_ai_timeout():
         enabled = data.get('enabled', False)
         seconds = data.get('seconds', 60)
         
-        db.update_ai_timeout_setting(enabled, seconds)
+        db.set_ai_timeout_settings(enabled, seconds)
         
-        # No need to call update_ai_timeout_state since the settings will be read from the DB when needed
+        # Subscribers to the settings store are notified of the change
         
         print(f"Updated AI timeout: enabled={enabled}, seconds={seconds}")
         return jsonify({'success': True, 'enabled': enabled, 'seconds': seconds})
@@ -230,6 +531,50 @@ def update_ai_timeout():
         print(f"Error updating AI timeout: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@api_bp.route('/api/fuzzy-match', methods=['GET'])
+def get_fuzzy_match():
+    """Get the global fuzzy match threshold."""
+    return jsonify({'threshold': db.get_fuzzy_match_threshold()})
+
+@api_bp.route('/api/fuzzy-match', methods=['POST'])
+def set_fuzzy_match():
+    """Set the global fuzzy match threshold."""
+    data = request.get_json()
+    if not data or 'threshold' not in data:
+        return jsonify({'error': 'Missing threshold'}), 400
+    
+    try:
+        threshold = parse_fuzzy_threshold(data['threshold'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if threshold is None:
+        return jsonify({'error': 'Missing threshold'}), 400
+    
+    db.set_fuzzy_match_threshold(threshold)
+    return jsonify({'threshold': threshold})
+
+@api_bp.route('/api/intent-classifier', methods=['GET'])
+def get_intent_classifier():
+    """Get the local intent classifier confidence threshold."""
+    return jsonify({'threshold': db.get_intent_confidence_threshold()})
+
+@api_bp.route('/api/intent-classifier', methods=['POST'])
+def set_intent_classifier():
+    """Set the local intent classifier confidence threshold."""
+    data = request.get_json()
+    if not data or 'threshold' not in data:
+        return jsonify({'error': 'Missing threshold'}), 400
+    
+    try:
+        threshold = float(data['threshold'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'threshold must be a number between 0 and 1'}), 400
+    if threshold < 0 or threshold > 1:
+        return jsonify({'error': 'threshold must be a number between 0 and 1'}), 400
+    
+    db.set_intent_confidence_threshold(threshold)
+    return jsonify({'threshold': threshold})
+
 @api_bp.route('/api/scripts-execution', methods=['GET'])
 def get_scripts_execution():
     """Get the current scripts execution state."""
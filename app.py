@@ -51,11 +51,22 @@ def initialize_app():
     if api_key:
         update_openai_api_key(api_key)
     
+    # Push setting changes to clients instead of having them poll
+    db.subscribe_settings(broadcast_setting_change)
+    
     # Start AI timeout update thread
     start_ai_timeout_update_thread()
     
     print("Application initialized.")
 
+# Settings that are safe to broadcast to clients when they change
+BROADCAST_SETTINGS = ('active', 'global_shortcut_key', 'ai_timeout_enabled', 'ai_timeout_seconds')
+
+def broadcast_setting_change(key, value):
+    """Push a changed setting to all connected clients."""
+    if key in BROADCAST_SETTINGS:
+        socketio.emit('settings_changed', {'key': key, 'value': value})
+
 def ai_timeout_update_loop():
     """Background thread that sends regular AI timeout updates to clients."""
     global ai_timeout_update_thread_running
@@ -0,0 +1,532 @@
+"""
+Continuous audio capture module for voice command application.
+"""
+import collections
+import glob
+import math
+import os
+import queue
+import threading
+import time
+import wave
+import numpy as np
+import speech_recognition as sr
+
+# Capture settings
+RING_BUFFER_SECONDS = 30
+PHRASE_QUEUE_SIZE = 8
+
+class AudioRingBuffer:
+    """Preallocated ring buffer of fixed-size 16-bit audio chunks.
+
+    One writer (the capture thread) and one reader (the segmenter) share the
+    buffer. If the reader falls more than the buffer's capacity behind, the
+    oldest chunks are overwritten and counted as overruns. last_index is the
+    position in the stream of the chunk read last, counting overwritten ones.
+    """
+
+    def __init__(self, capacity, chunk_samples):
+        """Allocate the buffer.
+
+        Args:
+            capacity: Number of chunks the buffer holds
+            chunk_samples: Samples per chunk
+        """
+        self.capacity = capacity
+        self.chunk_samples = chunk_samples
+        self._data = np.zeros((capacity, chunk_samples), dtype=np.int16)
+        self._lengths = np.zeros(capacity, dtype=np.int32)
+        self._write_index = 0
+        self._read_index = 0
+        self._condition = threading.Condition()
+        self.closed = False
+        self.overruns = 0
+        self.last_index = None
+
+    def write(self, buffer):
+        """Append a chunk of raw 16-bit little-endian audio."""
+        samples = np.frombuffer(buffer, dtype='<i2')
+        count = min(len(samples), self.chunk_samples)
+        with self._condition:
+            slot = self._write_index % self.capacity
+            self._data[slot, :count] = samples[:count]
+            self._lengths[slot] = count
+            self._write_index += 1
+
+            behind = self._write_index - self._read_index
+            if behind > self.capacity:
+                self.overruns += behind - self.capacity
+                self._read_index = self._write_index - self.capacity
+            self._condition.notify_all()
+
+    def read(self, timeout=None):
+        """Take the oldest unread chunk.
+
+        Args:
+            timeout: Seconds to wait for a chunk, or None to wait forever
+
+        Returns:
+            NumPy int16 array, or None on timeout or once closed and drained
+        """
+        with self._condition:
+            available = self._condition.wait_for(
+                lambda: self._read_index < self._write_index or self.closed, timeout
+            )
+            if not available or self._read_index >= self._write_index:
+                return None
+            slot = self._read_index % self.capacity
+            chunk = self._data[slot, :self._lengths[slot]].copy()
+            self.last_index = self._read_index
+            self._read_index += 1
+            return chunk
+
+    def close(self):
+        """Wake up the reader; no more chunks will be written."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class PhraseSegmenter:
+    """Split a stream of audio chunks into phrases by energy.
+
+    Follows the same rules as ``speech_recognition.Recognizer.listen``: a
+    phrase starts when a chunk's energy exceeds the recognizer's energy
+    threshold and ends after ``pause_threshold`` seconds below it. Timing
+    parameters are read from the recognizer for every phrase, so runtime
+    changes apply. With an enabled voice activity detector, it decides which
+    chunks are speech instead, and phrases without enough speech are dropped.
+
+    An optional listener sees every phrase as it is captured, through
+    on_phrase_start(sample_rate, chunks), on_phrase_chunk(chunk) and
+    on_phrase_end(). Whatever on_phrase_end() returns is attached to the
+    phrase's AudioData as ``interim_fired``, and the phrase's span in the
+    stream, in seconds, as ``stream_start`` and ``stream_end``.
+    """
+
+    def __init__(self, recognizer, sample_rate, chunk_samples, vad=None, listener=None):
+        """Create the segmenter.
+
+        Args:
+            recognizer: speech_recognition.Recognizer holding the thresholds
+            sample_rate: Samples per second of the audio
+            chunk_samples: Samples per chunk
+            vad: Optional VoiceActivityDetector
+            listener: Optional phrase listener, e.g. an InterimTrigger
+        """
+        self.recognizer = recognizer
+        self.vad = vad
+        self.listener = listener
+        self.sample_rate = sample_rate
+        self.seconds_per_buffer = float(chunk_samples) / sample_rate
+        # Samples of the stream up to the end of the last chunk fed
+        self.position = 0
+        self._reset()
+
+    def _buffer_count(self, seconds):
+        return int(math.ceil(seconds / self.seconds_per_buffer))
+
+    def _reset(self):
+        """Go back to waiting for a phrase to start."""
+        self._frames = collections.deque()
+        self._in_phrase = False
+        self._phrase_count = 0
+        self._pause_count = 0
+        self._phrase_elapsed = 0.0
+
+    def energy(self, chunk):
+        """RMS energy of a chunk."""
+        if not len(chunk):
+            return 0.0
+        samples = chunk.astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples)))
+
+    @property
+    def vad_enabled(self):
+        return self.vad is not None and self.vad.enabled
+
+    def is_speech(self, chunk):
+        """Whether a chunk counts as speech."""
+        if self.vad_enabled:
+            speech = self.vad.is_speech(chunk, self.sample_rate)
+            self.recognizer.energy_threshold = self.vad.energy_threshold
+            return speech
+        return self.energy(chunk) > self.recognizer.energy_threshold
+
+    def _adjust_threshold(self, chunk):
+        """Track ambient energy while waiting, like Recognizer.listen does."""
+        recognizer = self.recognizer
+        if recognizer.dynamic_energy_threshold and not self.vad_enabled:
+            damping = recognizer.dynamic_energy_adjustment_damping ** self.seconds_per_buffer
+            target_energy = self.energy(chunk) * recognizer.dynamic_energy_ratio
+            recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+
+    def process(self, chunk, phrase_time_limit=None, position=None):
+        """Feed one chunk.
+
+        Args:
+            chunk: NumPy int16 array
+            phrase_time_limit: Maximum phrase length in seconds, or None
+            position: Sample offset of the chunk in the stream, if chunks were skipped
+
+        Returns:
+            speech_recognition.AudioData when a phrase completes, otherwise None
+        """
+        if position is not None:
+            self.position = position
+        self.position += len(chunk)
+        recognizer = self.recognizer
+        non_speaking_buffer_count = self._buffer_count(recognizer.non_speaking_duration)
+
+        if not self._in_phrase:
+            self._frames.append(chunk)
+            if len(self._frames) > non_speaking_buffer_count:
+                self._frames.popleft()
+            if self.is_speech(chunk):
+                self._in_phrase = True
+                if self.listener:
+                    self.listener.on_phrase_start(self.sample_rate, list(self._frames))
+            else:
+                self._adjust_threshold(chunk)
+            return None
+
+        self._frames.append(chunk)
+        if self.listener:
+            self.listener.on_phrase_chunk(chunk)
+        self._phrase_count += 1
+        self._phrase_elapsed += self.seconds_per_buffer
+
+        if self.is_speech(chunk):
+            self._pause_count = 0
+        else:
+            self._pause_count += 1
+
+        ended = self._pause_count > self._buffer_count(recognizer.pause_threshold)
+        if phrase_time_limit and self._phrase_elapsed > phrase_time_limit:
+            ended = True
+        if not ended:
+            return None
+
+        return self._finish(non_speaking_buffer_count)
+
+    def flush(self):
+        """Return the phrase in progress at the end of the stream, if any."""
+        if not self._in_phrase:
+            self._reset()
+            return None
+        return self._finish(self._buffer_count(self.recognizer.non_speaking_duration))
+
+    def _finish(self, non_speaking_buffer_count):
+        """Close the current phrase and return it if it's long enough."""
+        frames = self._frames
+        pause_count = self._pause_count
+        long_enough = self._phrase_count - pause_count >= self._buffer_count(self.recognizer.phrase_threshold)
+        self._reset()
+        interim_fired = self.listener.on_phrase_end() if self.listener else None
+        if not long_enough:
+            return None
+
+        # Drop the extra non-speaking chunks at the end
+        end = self.position
+        for _ in range(pause_count - non_speaking_buffer_count):
+            end -= len(frames.pop())
+        samples = np.concatenate(list(frames)).astype('<i2')
+        if self.vad_enabled and not self.vad.contains_speech(samples, self.sample_rate):
+            print("Dropped a noise-only phrase")
+            return None
+        audio = sr.AudioData(samples.tobytes(), self.sample_rate, 2)
+        audio.interim_fired = interim_fired
+        audio.stream_start = (end - len(samples)) / self.sample_rate
+        audio.stream_end = end / self.sample_rate
+        return audio
+
+class ContinuousCapture:
+    """Keep one audio stream open and segment it into phrases in the background.
+
+    A capture thread reads the stream without pause into an AudioRingBuffer,
+    and a segmenter thread turns the buffered chunks into phrases. No speech
+    is lost between phrases and the stream is only set up once.
+    """
+
+    def __init__(self, recognizer, source_factory=sr.Microphone,
+                 buffer_seconds=RING_BUFFER_SECONDS, phrase_queue_size=PHRASE_QUEUE_SIZE,
+                 phrase_time_limit=None, vad=None, listener=None):
+        """Create the capture.
+
+        Args:
+            recognizer: speech_recognition.Recognizer holding the thresholds
+            source_factory: Callable returning a 16-bit speech_recognition AudioSource
+            buffer_seconds: Seconds of audio the ring buffer holds
+            phrase_queue_size: Completed phrases held before the oldest is dropped
+            phrase_time_limit: Maximum phrase length in seconds, or None
+            vad: Optional VoiceActivityDetector used by the segmenter
+            listener: Optional phrase listener passed to the segmenter
+        """
+        self.recognizer = recognizer
+        self.vad = vad
+        self.listener = listener
+        self.source_factory = source_factory
+        self.buffer_seconds = buffer_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self.phrases = queue.Queue(maxsize=phrase_queue_size)
+        self.dropped_phrases = 0
+        self.source = None
+        self.ring = None
+        self.segmenter = None
+        self._running = False
+        self._threads = []
+        self._source_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Open the audio source and start the capture and segmenter threads."""
+        source = self.source_factory()
+        source.__enter__()
+        if source.stream is None:
+            raise RuntimeError("Audio source could not be opened")
+        if source.SAMPLE_WIDTH != 2:
+            source.__exit__(None, None, None)
+            raise RuntimeError("Continuous capture requires 16-bit audio")
+
+        self.source = source
+        capacity = max(1, int(math.ceil(self.buffer_seconds * source.SAMPLE_RATE / source.CHUNK)))
+        self.ring = AudioRingBuffer(capacity, source.CHUNK)
+        self.segmenter = PhraseSegmenter(
+            self.recognizer, source.SAMPLE_RATE, source.CHUNK, self.vad, self.listener
+        )
+        self._running = True
+
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='audio-capture'),
+            threading.Thread(target=self._segment_loop, name='audio-segmenter')
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        print(f"Continuous capture started ({capacity} chunk ring buffer)")
+
+    def _capture_loop(self):
+        """Read the stream into the ring buffer until stopped, then close the source."""
+        source = self.source
+        try:
+            while self._running:
+                buffer = source.stream.read(source.CHUNK)
+                if len(buffer) == 0:
+                    break  # reached end of the stream
+                self.ring.write(buffer)
+        except Exception as e:
+            print(f"Error in audio capture: {e}")
+        finally:
+            self.ring.close()
+            # Closed here rather than in stop(), which can't tell if a read is still in progress
+            self._close_source()
+
+    def _close_source(self):
+        """Close the audio source once, from whichever thread gets here first."""
+        with self._source_lock:
+            source, self.source = self.source, None
+        if source is not None:
+            try:
+                source.__exit__(None, None, None)
+            except Exception as e:
+                print(f"Error closing audio source: {e}")
+
+    def _segment_loop(self):
+        """Turn buffered chunks into phrases until the ring buffer is closed."""
+        while True:
+            chunk = self.ring.read(timeout=0.5)
+            if chunk is None:
+                if self.ring.closed:
+                    break
+                continue
+            # Position the chunk by its ring index, so overruns don't shift phrase spans
+            position = self.ring.last_index * self.ring.chunk_samples
+            audio = self.segmenter.process(chunk, self.phrase_time_limit, position)
+            if audio is not None:
+                self._put_phrase(audio)
+
+        audio = self.segmenter.flush()
+        if audio is not None:
+            self._put_phrase(audio)
+        self._running = False
+
+    def _put_phrase(self, audio):
+        """Queue a completed phrase, dropping the oldest one if the queue is full."""
+        while True:
+            try:
+                self.phrases.put_nowait(audio)
+                return
+            except queue.Full:
+                try:
+                    self.phrases.get_nowait()
+                    self.dropped_phrases += 1
+                    print("Phrase queue full, dropped the oldest phrase")
+                except queue.Empty:
+                    pass
+
+    def next_phrase(self, timeout=None):
+        """Wait for the next completed phrase.
+
+        Args:
+            timeout: Seconds to wait, or None to wait forever
+
+        Returns:
+            speech_recognition.AudioData or None on timeout
+        """
+        try:
+            return self.phrases.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """Stop the threads; the capture thread closes the audio source when its read returns."""
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=2)
+        reading = any(thread.name == 'audio-capture' and thread.is_alive() for thread in self._threads)
+        self._threads = []
+        if reading:
+            print("Audio capture is still reading, the source will be closed when the read returns")
+        else:
+            self._close_source()
+        print("Continuous capture stopped")
+
+    def get_stats(self):
+        """Get buffer overrun and dropped phrase counts."""
+        return {
+            'overruns': self.ring.overruns if self.ring else 0,
+            'droppedPhrases': self.dropped_phrases,
+            'queuedPhrases': self.phrases.qsize()
+        }
+
+class _ReplayStream:
+    """Stream of replayed audio, paced to real time divided by the speed."""
+
+    def __init__(self, frame_data, sample_rate, speed):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.position = 0
+        self.started_at = None
+
+    def read(self, size):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        start = self.position * 2
+        buffer = self.frame_data[start:start + size * 2]
+        self.position += len(buffer) // 2
+
+        if self.speed:
+            delay = self.started_at + self.position / self.sample_rate / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return buffer
+
+class ReplaySource:
+    """Audio source that replays WAV files in place of the microphone.
+
+    Behaves like a speech_recognition AudioSource for ContinuousCapture. The
+    files are converted to 16-bit mono at one sample rate and played back to
+    back with silence between them, at real time, faster (speed > 1) or as
+    fast as possible (speed 0). The stream ends after the last file.
+    """
+
+    def __init__(self, paths, speed=1.0, gap_seconds=1.0, sample_rate=16000, chunk_size=1024):
+        """Load the utterances.
+
+        Args:
+            paths: WAV files and directories of WAV files
+            speed: Playback speed relative to real time, 0 for no pacing
+            gap_seconds: Silence before, between and after the utterances
+            sample_rate: Sample rate the audio is converted to
+            chunk_size: Samples per read, like Microphone's chunk_size
+        """
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.speed = speed
+        self.stream = None
+        self.utterances = []
+
+        gap = np.zeros(int(gap_seconds * sample_rate), dtype='<i2')
+        parts = [gap]
+        offset = len(gap)
+        for path in expand_wav_paths(paths):
+            samples = read_wav(path, sample_rate)
+            self.utterances.append({
+                'path': path,
+                'transcript': transcript_for(path),
+                'start': offset / sample_rate,
+                'end': (offset + len(samples)) / sample_rate
+            })
+            parts.extend([samples, gap])
+            offset += len(samples) + len(gap)
+        self._frame_data = np.concatenate(parts).tobytes()
+
+    def __enter__(self):
+        self.stream = _ReplayStream(self._frame_data, self.SAMPLE_RATE, self.speed)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    def wall_time(self, stream_seconds):
+        """perf_counter() time at which a position in the replay was played.
+
+        Args:
+            stream_seconds: Position in the replayed audio, in seconds
+        """
+        if self.stream is None or self.stream.started_at is None:
+            return None
+        if not self.speed:
+            return self.stream.started_at
+        return self.stream.started_at + stream_seconds / self.speed
+
+def expand_wav_paths(paths):
+    """List the WAV files given directly or inside the given directories, in order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.wav'))))
+        else:
+            files.append(path)
+    return files
+
+def read_wav(path, sample_rate):
+    """Read a WAV file as 16-bit mono samples at the given sample rate."""
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frame_data = wav.readframes(wav.getnframes())
+
+    # Let AudioData handle sample width and rate conversion once the audio is mono
+    if channels > 1:
+        if width == 3:
+            # No 24-bit dtype; widen each sample to 32 bits, keeping its sign in the top byte
+            padded = np.zeros((len(frame_data) // 3, 4), dtype=np.uint8)
+            padded[:, 1:] = np.frombuffer(frame_data, dtype=np.uint8).reshape(-1, 3)
+            frame_data = padded.tobytes()
+            width = 4
+        dtype = {1: np.uint8, 2: '<i2', 4: '<i4'}.get(width)
+        if dtype is None:
+            raise ValueError(f"Unsupported WAV format in {path}: {channels} channels of {width * 8}-bit samples")
+        samples = np.frombuffer(frame_data, dtype=dtype).reshape(-1, channels)
+        frame_data = samples.mean(axis=1).astype(dtype).tobytes()
+    audio = sr.AudioData(frame_data, rate, width)
+    return np.frombuffer(audio.get_raw_data(convert_rate=sample_rate, convert_width=2), dtype='<i2')
+
+def transcript_for(path):
+    """Expected transcript of a replayed utterance.
+
+    Read from a .txt file next to the WAV file, or derived from its name,
+    e.g. "03_next_tab.wav" -> "next tab".
+    """
+    base = os.path.splitext(path)[0]
+    if os.path.exists(base + '.txt'):
+        with open(base + '.txt') as f:
+            return f.read().strip()
+    name = os.path.basename(base).replace('_', ' ').replace('-', ' ')
+    return ' '.join(word for word in name.split() if not word.isdigit())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-call overhead of the database layer.
+
+Compares opening a fresh SQLite connection for every call, the way db.py
+used to work, against the pooled WAL connections used now.
+
+Usage: python benchmarks/db_overhead.py [iterations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db
+
+def connect_per_call_read():
+    """Read a setting with a new connection, as before pooling."""
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_request_count',))
+    value = cursor.fetchone()[0]
+    conn.close()
+    return value
+
+def connect_per_call_write():
+    """Bump the request counter with a new connection, as before pooling."""
+    conn = sqlite3.connect(db.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_request_count',))
+    count = int(cursor.fetchone()[0]) + 1
+    cursor.execute('UPDATE settings SET value = ? WHERE key = ?', (str(count), 'openai_request_count'))
+    conn.commit()
+    conn.close()
+    return count
+
+def pooled_read():
+    """Read a setting with a pooled connection."""
+    with db.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_request_count',))
+        value = cursor.fetchone()[0]
+    return value
+
+def time_calls(func, iterations):
+    """Return the mean time per call in microseconds."""
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_PATH = os.path.join(tmp_dir, 'bench.db')
+        db.init_db()
+        
+        results = [
+            ('read, connect per call', time_calls(connect_per_call_read, iterations)),
+            ('read, pooled', time_calls(pooled_read, iterations)),
+            ('write, connect per call', time_calls(connect_per_call_write, iterations)),
+            ('write, pooled', time_calls(db.increment_openai_request_count, iterations)),
+        ]
+        
+        print(f"{iterations} iterations")
+        for name, micros in results:
+            print(f"  {name:<26} {micros:10.1f} us/call")
+        
+        # Close pooled connections so the temporary directory can be removed
+        db._pool.close_all()
+
+if __name__ == '__main__':
+    main()
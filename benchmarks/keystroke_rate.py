@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark keystroke throughput of each keystroke timing profile.
+
+A macro of single keys with a combination every few keys is compiled once
+and run through execute_script on the recording output backend, so no input
+reaches the desktop and no display is needed. For every timing profile it
+reports achieved keystrokes per second and checks that the recorded event
+stream is exactly the one the script asks for.
+
+Usage: python benchmarks/keystroke_rate.py [--keys 20] [--runs 5] [--profile burst ...]
+"""
+import argparse
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+import input_simulation
+from script_compiler import KEY, COMBO, compile_script
+
+# Every this many keys the macro presses a combination instead of a single key
+COMBO_EVERY = 5
+
+def build_macro(key_count):
+    """Script of key_count lines: letters, with ctrl+<letter> every COMBO_EVERY lines."""
+    lines = []
+    for index in range(key_count):
+        letter = string.ascii_lowercase[index % len(string.ascii_lowercase)]
+        lines.append(f"ctrl+{letter}" if (index + 1) % COMBO_EVERY == 0 else letter)
+    return '\n'.join(lines)
+
+def expected_events(compiled):
+    """The (action, key) stream a correct run of the script produces."""
+    events = []
+    for opcode, operand, _ in compiled.ops:
+        if opcode == KEY:
+            events += [('press', operand), ('release', operand)]
+        elif opcode == COMBO:
+            events += [('press', key) for key in operand]
+            events += [('release', key) for key in reversed(operand)]
+    return events
+
+def run_profile(compiled, profile, runs, recorder):
+    """Run the macro repeatedly and collect throughput and correctness."""
+    expected = expected_events(compiled)
+    rates = []
+    gaps = []
+    correct = True
+    for _ in range(runs):
+        recorder.clear()
+        start = time.perf_counter()
+        input_simulation.execute_script(compiled, timing=profile)
+        elapsed = time.perf_counter() - start
+
+        events = recorder.events
+        presses = [timestamp for timestamp, action, _ in events if action == 'press']
+        rates.append(len(presses) / elapsed if elapsed else float('inf'))
+        gaps.extend(np.diff(presses) * 1000)
+        correct = correct and [(action, key) for _, action, key in events] == expected
+    return {
+        'keystrokes': len(expected) // 2,
+        'rate': float(np.median(rates)),
+        'gap_p50': float(np.percentile(gaps, 50)) if gaps else 0.0,
+        'gap_p95': float(np.percentile(gaps, 95)) if gaps else 0.0,
+        'correct': correct
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=20, help='lines in the macro')
+    parser.add_argument('--runs', type=int, default=5, help='runs per profile')
+    parser.add_argument('--profile', action='append', choices=sorted(input_simulation.TIMING_PROFILES),
+                        help='profile to measure, may be repeated (default: all)')
+    args = parser.parse_args()
+
+    input_simulation.DEBUG = False
+    recorder = input_simulation.set_output_backend('recording')
+
+    compiled = compile_script(build_macro(args.keys))
+    print(f"{args.keys}-line macro, {args.runs} runs per profile")
+    print(f"{'profile':<10} {'keys':>5} {'keys/s':>9} {'gap p50 ms':>11} {'gap p95 ms':>11} {'correct':>8}")
+    for profile in args.profile or input_simulation.TIMING_PROFILES:
+        result = run_profile(compiled, profile, args.runs, recorder)
+        print(f"  {profile:<8} {result['keystrokes']:>5} {result['rate']:9.0f} "
+              f"{result['gap_p50']:11.2f} {result['gap_p95']:11.2f} {'yes' if result['correct'] else 'NO':>8}")
+
+if __name__ == '__main__':
+    main()
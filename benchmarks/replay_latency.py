@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end command latency by replaying recorded utterances.
+
+WAV files are played through continuous capture, segmentation, recognition,
+matching and execution, the same pipeline the live microphone feeds. The
+fake recognizer returns the transcript of the file a segmented phrase was
+cut from (from a .txt file next to it or from its name, e.g.
+"03_next_tab.wav" -> "next tab") after a fixed latency, and scripts run on
+the null output backend. Phrases that don't overlap any file are reported
+and recognized as silence.
+
+Without --db, a temporary database gets one command per distinct transcript.
+
+Usage: python benchmarks/replay_latency.py [--speed 1.0] [--recognizer-latency 0.3]
+                                           [--db voice_commands.db] WAV_OR_DIR [...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+import db
+import input_simulation
+import speech_recognition_handler as handler
+from audio_capture import ReplaySource
+from pipeline import Pipeline, BLOCK, DROP_OLDEST, DROP_NEWEST
+from speech_recognizer import SpeechRecognizer
+
+STAGES = ('segmentation', 'recognition', 'matching', 'execution', 'end_to_end')
+
+class LatencyRecorder:
+    """Collects per-stage latencies from the pipeline worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+        self.unmatched = []
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds * 1000)
+
+    def add_unmatched(self, start, end):
+        """Record a segmented phrase, as a span of the replay, that overlaps no utterance."""
+        with self._lock:
+            self.unmatched.append((start, end))
+
+    def report(self):
+        print(f"{'stage':<14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage in STAGES:
+            values = self.samples[stage]
+            if not values:
+                print(f"  {stage:<12} {0:>6} {'-':>9} {'-':>9} {'-':>9}")
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            print(f"  {stage:<12} {len(values):>6} {p50:9.1f} {p95:9.1f} {p99:9.1f}")
+        if self.unmatched:
+            spans = ', '.join(f"{start:.2f}-{end:.2f}s" for start, end in self.unmatched)
+            print(f"{len(self.unmatched)} phrases matched no utterance: {spans}")
+
+def utterance_for(source, audio):
+    """The replayed utterance a segmented phrase overlaps the most, or None."""
+    best = None
+    best_overlap = 0.0
+    for utterance in source.utterances:
+        overlap = min(audio.stream_end, utterance['end']) - max(audio.stream_start, utterance['start'])
+        if overlap > best_overlap:
+            best = utterance
+            best_overlap = overlap
+    return best
+
+def build_timed_pipeline(source, recorder):
+    """The handler's speech pipeline with every stage timed."""
+    def capture():
+        capture = handler.speech_recognizer.capture
+        if not capture.running and capture.phrases.empty():
+            time.sleep(0.05)  # Replay finished; don't fall back to the microphone
+            return None
+        audio = handler.capture_stage()
+        if audio is None:
+            return None
+        audio.captured_at = time.perf_counter()
+        utterance = utterance_for(source, audio)
+        if utterance is None:
+            recorder.add_unmatched(audio.stream_start, audio.stream_end)
+            audio.transcript = ''
+            audio.speech_end = audio.captured_at
+            return audio
+        audio.transcript = utterance['transcript']
+        speech_end = source.wall_time(utterance['end'])
+        audio.speech_end = min(speech_end, audio.captured_at) if speech_end is not None else audio.captured_at
+        recorder.add('segmentation', audio.captured_at - audio.speech_end)
+        return audio
+
+    def recognize(audio):
+        start = time.perf_counter()
+        utterance = handler.recognize_stage(audio)
+        recorder.add('recognition', time.perf_counter() - start)
+        if utterance:
+            utterance['speech_end'] = audio.speech_end
+        return utterance
+
+    def match(utterance):
+        start = time.perf_counter()
+        command = handler.match_stage(utterance)
+        recorder.add('matching', time.perf_counter() - start)
+        if command:
+            command['speech_end'] = utterance['speech_end']
+        return command
+
+    def execute(command):
+        # The executor runs scripts on its own thread; wait here so the
+        # timings cover the key presses, not just queueing the job
+        start = time.perf_counter()
+        job = handler.execute_stage(command)
+        if job is None:
+            return
+        job.done_event.wait()
+        finished = time.perf_counter()
+        recorder.add('execution', finished - start)
+        recorder.add('end_to_end', finished - command['speech_end'])
+
+    return (
+        Pipeline('replay')
+        .add_stage('capture', capture)
+        .add_stage('recognize', recognize, handler.AUDIO_QUEUE_SIZE, DROP_OLDEST)
+        .add_stage('match', match, handler.TEXT_QUEUE_SIZE, BLOCK)
+        .add_stage('execute', execute, handler.SCRIPT_QUEUE_SIZE, DROP_NEWEST)
+    )
+
+def wait_until_drained(pipeline, capture, settle_seconds):
+    """Wait for the replay to end and every queued item to be processed."""
+    while capture.running:
+        time.sleep(0.05)
+
+    last_counts = None
+    stable_since = time.perf_counter()
+    while time.perf_counter() - stable_since < settle_seconds:
+        stats = pipeline.get_stats()
+        # The capture stage keeps polling after the replay; only count the stages behind it
+        counts = [(s['processed'], s['queue']['size']) for s in stats.values() if s['queue']]
+        scripts = handler.script_executor.get_stats()
+        busy = capture.phrases.qsize() or scripts['queued'] or scripts['current'] is not None
+        if counts != last_counts or busy:
+            last_counts = counts
+            stable_since = time.perf_counter()
+        time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='WAV files or directories of WAV files')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed, 0 for as fast as possible')
+    parser.add_argument('--gap', type=float, default=1.0, help='seconds of silence between utterances')
+    parser.add_argument('--recognizer-latency', type=float, default=0.0, help='seconds the fake recognizer takes')
+    parser.add_argument('--db', help='use the commands of an existing database')
+    parser.add_argument('--script', default='enter', help='script of the generated commands')
+    args = parser.parse_args()
+
+    source = ReplaySource(args.paths, speed=args.speed, gap_seconds=args.gap)
+    transcripts = [utterance['transcript'] for utterance in source.utterances]
+    if not transcripts:
+        print("No WAV files found")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_PATH = args.db or os.path.join(tmp_dir, 'replay.db')
+        db.init_db()
+        if not args.db:
+            for transcript in dict.fromkeys(transcripts):
+                db.add_command([transcript], args.script)
+
+        input_simulation.DEBUG = False
+        input_simulation.set_output_backend('null')
+
+        handler.speech_recognizer = SpeechRecognizer(
+            energy_threshold=300,
+            dynamic_energy_threshold=False,
+            pause_threshold=0.1,
+            phrase_threshold=0.2,
+            non_speaking_duration=0.1
+        )
+        handler.speech_recognizer.set_backend('fake', latency=args.recognizer_latency)
+
+        recorder = LatencyRecorder()
+        pipeline = build_timed_pipeline(source, recorder)
+        handler.speech_pipeline = pipeline
+        handler.speech_recognizer.start_continuous(source_factory=lambda: source)
+        capture = handler.speech_recognizer.capture
+
+        started = time.perf_counter()
+        handler.script_executor.start()
+        pipeline.start()
+        wait_until_drained(pipeline, capture, settle_seconds=max(0.5, args.recognizer_latency * 2))
+        elapsed = time.perf_counter() - started
+
+        pipeline.stop()
+        handler.script_executor.stop()
+        handler.speech_pipeline = None
+        handler.speech_recognizer.stop_continuous()
+
+        print(f"\n{len(transcripts)} utterances replayed at "
+              f"{'max' if not args.speed else f'{args.speed:g}x'} speed in {elapsed:.1f}s")
+        print(f"Pipeline: {pipeline.get_stats()}")
+        print(f"Capture: {capture.get_stats()}")
+        print(f"Scripts: {handler.script_executor.get_stats()}")
+        recorder.report()
+
+        db._pool.close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Command grammar module for voice command application.
+"""
+import re
+from collections import Counter
+
+def normalize_grammar_phrase(phrase):
+    """Lowercase a phrase and keep only the words a decoder can match."""
+    return ' '.join(re.sub(r"[^a-z0-9' ]+", ' ', phrase.lower()).split())
+
+class CommandGrammar:
+    """Closed phrase list for constrained decoding, built from the command phrases.
+
+    update() only touches the commands whose phrases changed since the last
+    call, and reports whether the overall phrase list changed, so backends
+    only recompile their grammar when they have to. It keeps no lock of its
+    own; callers serialize update() with the reads of its phrase list.
+    """
+
+    def __init__(self):
+        self._by_command = {}
+        self._counts = Counter()
+        self.version = 0
+
+    def update(self, commands):
+        """Apply the current command set.
+
+        Args:
+            commands: List of command dicts as returned by db.get_commands()
+
+        Returns:
+            True if the phrase list changed
+        """
+        before = set(self._counts)
+        seen = set()
+
+        for cmd in commands:
+            seen.add(cmd['id'])
+            phrases = tuple(sorted({normalize_grammar_phrase(p) for p in cmd['phrases']} - {''}))
+            previous = self._by_command.get(cmd['id'])
+            if previous == phrases:
+                continue
+            if previous:
+                self._counts.subtract(previous)
+            self._counts.update(phrases)
+            self._by_command[cmd['id']] = phrases
+
+        for command_id in set(self._by_command) - seen:
+            self._counts.subtract(self._by_command.pop(command_id))
+
+        # Drop phrases no command uses any more
+        self._counts = +self._counts
+        if set(self._counts) == before:
+            return False
+
+        self.version += 1
+        return True
+
+    @property
+    def phrases(self):
+        """Sorted list of every distinct command phrase."""
+        return sorted(self._counts)
+
+    @property
+    def words(self):
+        """Sorted vocabulary of the command phrases."""
+        return sorted({word for phrase in self._counts for word in phrase.split()})
+
+    def __len__(self):
+        return len(self._counts)
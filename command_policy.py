@@ -0,0 +1,167 @@
+"""
+Command concurrency policy module for voice command application.
+"""
+import threading
+import time
+from collections import deque
+
+from script_executor import DROPPED
+
+# What happens when a command triggers while an earlier run of it hasn't finished
+SERIALIZE = 'serialize'              # Queue the new run behind the earlier one
+DROP_IF_RUNNING = 'drop_if_running'  # Ignore the new trigger
+REPLACE_RUNNING = 'replace_running'  # Cancel the earlier run and start the new one
+CONCURRENCY_POLICIES = (SERIALIZE, DROP_IF_RUNNING, REPLACE_RUNNING)
+DEFAULT_CONCURRENCY_POLICY = SERIALIZE
+
+# Repeats of a command within this window are coalesced into its first trigger
+DEFAULT_COALESCE_MS = 2000
+
+# Window the max rate of a command is counted over
+RATE_WINDOW_SECONDS = 60.0
+
+class _CommandState:
+    """Trigger history and unfinished jobs of one command."""
+
+    __slots__ = ('last_fired', 'recent', 'jobs')
+
+    def __init__(self):
+        self.last_fired = None
+        self.recent = deque()
+        self.jobs = []
+
+class CommandPolicyGate:
+    """Applies each command's coalescing, rate and concurrency policy.
+
+    State is kept per command id in a dict, so checking a trigger costs the
+    same however many commands exist. allow() runs when a command matches
+    and rejects repeats inside the coalescing window or over the max rate.
+    submit() checks again, applies the concurrency policy against the
+    command's jobs that haven't finished, and only charges the coalescing
+    window and the rate once the script was actually queued, so triggers
+    dropped by the policy or a full executor don't use up the budget.
+    Replaced runs are likewise only cancelled once their replacement is
+    queued, so a full executor never leaves the command with nothing running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.replaced = 0
+
+    def _state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _CommandState()
+        return state
+
+    def _check_locked(self, state, options, now):
+        """Rejection reason of a trigger, or None; called with the lock held."""
+        coalesce_ms = options.get('coalesce_ms')
+        if coalesce_ms is None:
+            coalesce_ms = DEFAULT_COALESCE_MS
+        if state.last_fired is not None and (now - state.last_fired) * 1000 < coalesce_ms:
+            self.coalesced += 1
+            return 'coalesced'
+
+        max_rate = options.get('max_rate_per_minute')
+        if max_rate:
+            recent = state.recent
+            while recent and now - recent[0] >= RATE_WINDOW_SECONDS:
+                recent.popleft()
+            if len(recent) >= max_rate:
+                self.rate_limited += 1
+                return 'rate_limited'
+        return None
+
+    def allow(self, key, options=None, now=None):
+        """Decide whether a trigger of a command should fire, without charging its limits.
+
+        Args:
+            key: Command id, or the phrase for commands without one
+            options: Command dict with optional 'coalesce_ms' and
+                'max_rate_per_minute' entries; a max rate of None means no limit
+            now: Trigger time, defaults to the current time
+
+        Returns:
+            (allowed, reason) where reason is None, 'coalesced' or 'rate_limited'
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            reason = self._check_locked(self._state(key), options or {}, now)
+        return reason is None, reason
+
+    def submit(self, key, options, submit_job, cancel_job, now=None):
+        """Queue a command's script according to its limits and concurrency policy.
+
+        Args:
+            key: Command id, or the phrase for commands without one
+            options: Command dict with optional 'concurrency_policy',
+                'coalesce_ms' and 'max_rate_per_minute' entries
+            submit_job: Callable returning the new ScriptJob
+            cancel_job: Callable(job) cancelling an earlier job, called
+                after the new job was queued
+            now: Trigger time, defaults to the current time
+
+        Returns:
+            (job, reason) where job is the queued ScriptJob, or None if the
+            trigger was rejected, and reason is None, 'coalesced',
+            'rate_limited', 'running' (dropped by drop_if_running) or
+            'queue_full' (dropped by the executor)
+        """
+        options = options or {}
+        policy = options.get('concurrency_policy') or DEFAULT_CONCURRENCY_POLICY
+        now = time.time() if now is None else now
+
+        with self._lock:
+            state = self._state(key)
+            reason = self._check_locked(state, options, now)
+            if reason:
+                return None, reason
+            state.jobs = [job for job in state.jobs if not job.finished]
+            earlier = state.jobs
+            if earlier and policy == DROP_IF_RUNNING:
+                self.dropped += 1
+                return None, 'running'
+
+        job = submit_job()
+        if job.status == DROPPED:
+            return None, 'queue_full'
+
+        replaced = []
+        with self._lock:
+            state = self._state(key)
+            state.last_fired = now
+            if options.get('max_rate_per_minute'):
+                state.recent.append(now)
+            if policy == REPLACE_RUNNING:
+                replaced = [earlier_job for earlier_job in state.jobs if earlier_job in earlier]
+                state.jobs = [earlier_job for earlier_job in state.jobs if earlier_job not in earlier]
+                self.replaced += len(replaced)
+            if not job.finished:
+                state.jobs.append(job)
+
+        for earlier_job in replaced:
+            cancel_job(earlier_job)
+        return job, None
+
+    def forget(self, key=None):
+        """Drop the state of a deleted command, or of every command if key is None."""
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'commands': len(self._states),
+                'coalesced': self.coalesced,
+                'rateLimited': self.rate_limited,
+                'dropped': self.dropped,
+                'replaced': self.replaced
+            }
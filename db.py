@@ -3,172 +3,237 @@ Database module for voice command application.
 """
 import sqlite3
 import json
+import queue
+import threading
+from contextlib import contextmanager
 
 # Database setup
 DB_PATH = 'voicecommand.db'
 
-def init_db():
-    """Initialize the SQLite database with required tables if they don't exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Connection pool settings
+POOL_MAX_IDLE_CONNECTIONS = 8
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_SECONDS = 10
+
+class ConnectionPool:
+    """Pool of persistent SQLite connections shared by all threads.
     
-    # Check if we need to migrate data
-    needs_migration = False
-    try:
-        cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
-        table_def = cursor.fetchone()[0]
-        needs_migration = "JSON" not in table_def and "json" not in table_def
-    except:
-        pass
-        
-    if needs_migration:
-        print("Migrating database to support multiple phrases...")
-        # Create a backup of the commands table
-        cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
-        # Drop the existing table
-        cursor.execute("DROP TABLE commands")
-    
-    # Check if we need to migrate to add sentiment fields
-    sentiment_migration = False
-    try:
-        cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
-        table_def = cursor.fetchone()[0]
-        sentiment_migration = "understand_sentiment" not in table_def.lower()
-    except:
-        pass
-        
-    if sentiment_migration and not needs_migration:
-        print("Migrating database to support sentiment analysis...")
-        # Create a backup of the commands table
-        cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
-        # Drop the existing table
-        cursor.execute("DROP TABLE commands")
-    
-    # Check if we need to migrate to add partial match field
-    partial_match_migration = False
-    try:
-        cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
-        table_def = cursor.fetchone()[0]
-        partial_match_migration = "partial_match" not in table_def.lower()
-    except:
-        pass
-        
-    if partial_match_migration and not needs_migration and not sentiment_migration:
-        print("Migrating database to support partial matching...")
-        # Create a backup of the commands table
-        cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
-        # Drop the existing table
-        cursor.execute("DROP TABLE commands")
-    
-    # Create commands table with phrases as JSON array if not exists
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS commands (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        phrases TEXT NOT NULL,  -- JSON array of phrases
-        script TEXT NOT NULL,
-        understand_sentiment INTEGER DEFAULT 0,  -- Boolean 0/1 for sentiment analysis
-        partial_match INTEGER DEFAULT 0  -- Boolean 0/1 for partial phrase matching
-    )
-    ''')
-    
-    # Migrate data if needed for phrases
-    if needs_migration:
-        cursor.execute("SELECT id, phrase, script FROM commands_backup")
-        for row in cursor.fetchall():
-            phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
-            cursor.execute(
-                'INSERT INTO commands (id, phrases, script) VALUES (?, ?, ?)',
-                (row[0], phrases, row[2])
-            )
-        print("Migration completed.")
-    
-    # Migrate data if needed for sentiment fields
-    if sentiment_migration and not needs_migration:
-        # Check which columns exist in the backup table
-        cursor.execute("PRAGMA table_info(commands_backup)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'phrases' in columns:
-            # New schema backup
-            cursor.execute("SELECT id, phrases, script FROM commands_backup")
-            for row in cursor.fetchall():
-                cursor.execute(
-                    'INSERT INTO commands (id, phrases, script, understand_sentiment) VALUES (?, ?, ?, ?)',
-                    (row[0], row[1], row[2], 0)
-                )
-        elif 'phrase' in columns:
-            # Old schema backup
-            cursor.execute("SELECT id, phrase, script FROM commands_backup")
-            for row in cursor.fetchall():
-                phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
-                cursor.execute(
-                    'INSERT INTO commands (id, phrases, script, understand_sentiment) VALUES (?, ?, ?, ?)',
-                    (row[0], phrases, row[2], 0)
-                )
-        print("Sentiment fields migration completed.")
+    Connections are opened once in WAL mode, so readers on the Flask request
+    threads, the speech thread and the health checker don't block the writer,
+    and each connection keeps its own prepared statement cache. A connection
+    is only used by one thread at a time between get() and release().
+    """
     
-    # Migrate data if needed for partial match field
-    if partial_match_migration and not needs_migration and not sentiment_migration:
-        # Check which columns exist in the backup table
-        cursor.execute("PRAGMA table_info(commands_backup)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'understand_sentiment' in columns:
-            # Schema has sentiment analysis
-            cursor.execute("SELECT id, phrases, script, understand_sentiment FROM commands_backup")
-            for row in cursor.fetchall():
-                cursor.execute(
-                    'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
-                    (row[0], row[1], row[2], row[3], 0)
-                )
-        elif 'phrases' in columns:
-            # New schema without sentiment field
-            cursor.execute("SELECT id, phrases, script FROM commands_backup")
-            for row in cursor.fetchall():
-                cursor.execute(
-                    'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
-                    (row[0], row[1], row[2], 0, 0)
-                )
-        elif 'phrase' in columns:
-            # Old schema
-            cursor.execute("SELECT id, phrase, script FROM commands_backup")
-            for row in cursor.fetchall():
-                phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
-                cursor.execute(
-                    'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
-                    (row[0], phrases, row[2], 0, 0)
-                )
-        print("Partial match field migration completed.")
+    def __init__(self, db_path, max_idle=POOL_MAX_IDLE_CONNECTIONS):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+    
+    def _connect(self):
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    def get(self):
+        """Take an idle connection from the pool or open a new one."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+    
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            conn.close()
+    
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# Global connection pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection():
+    """Get a pooled database connection. Pass it to release_connection() when done, or use pooled_connection()."""
+    global _pool
+    
+    with _pool_lock:
+        # Recreate the pool if DB_PATH was changed
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_PATH)
+        pool = _pool
+    
+    return pool.get()
+
+def release_connection(conn):
+    """Return a connection obtained from get_connection() to the pool."""
+    with _pool_lock:
+        pool = _pool
+    
+    if pool is None:
+        conn.close()
+    else:
+        pool.release(conn)
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection for the duration of a with block.
     
-    # Migrate data from old table with sentiment_prefix to new schema without prefix
+    Uncommitted work is rolled back if the block raises, and the connection
+    is returned to the pool however the block exits.
+    """
+    conn = get_connection()
     try:
-        cursor.execute("PRAGMA table_info(commands)")
-        columns = [column[1] for column in cursor.fetchall()]
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+# Per-command option columns added after the base commands schema
+COMMAND_OPTION_COLUMNS = {
+    'fuzzy_threshold': 'REAL DEFAULT NULL',  # Fuzzy match similarity (0-1), NULL uses the global setting
+    'concurrency_policy': 'TEXT DEFAULT NULL',  # serialize, drop_if_running or replace_running, NULL for serialize
+    'coalesce_ms': 'INTEGER DEFAULT NULL',  # Repeats within this many ms fire once, NULL for the default window
+    'max_rate_per_minute': 'INTEGER DEFAULT NULL',  # Maximum triggers per minute, NULL for no limit
+    'timing_profile': 'TEXT DEFAULT NULL',  # Keystroke timing profile, NULL uses the global setting
+}
+
+def _ensure_command_column(cursor, column, definition):
+    """Add a column to the commands table if it doesn't exist yet."""
+    cursor.execute("PRAGMA table_info(commands)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if column not in columns:
+        print(f"Migrating database to add {column} field...")
+        cursor.execute(f"ALTER TABLE commands ADD COLUMN {column} {definition}")
+
+def init_db():
+    """Initialize the SQLite database with required tables if they don't exist."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check if we need to migrate data
+        needs_migration = False
+        try:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
+            table_def = cursor.fetchone()[0]
+            needs_migration = "JSON" not in table_def and "json" not in table_def
+        except:
+            pass
+        
+        if needs_migration:
+            print("Migrating database to support multiple phrases...")
+            # Create a backup of the commands table
+            cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
+            # Drop the existing table
+            cursor.execute("DROP TABLE commands")
         
-        if 'sentiment_prefix' in columns:
-            print("Migrating from sentiment_prefix schema to prefix-free schema...")
+        # Check if we need to migrate to add sentiment fields
+        sentiment_migration = False
+        try:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
+            table_def = cursor.fetchone()[0]
+            sentiment_migration = "understand_sentiment" not in table_def.lower()
+        except:
+            pass
+        
+        if sentiment_migration and not needs_migration:
+            print("Migrating database to support sentiment analysis...")
             # Create a backup of the commands table
             cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
-            
             # Drop the existing table
             cursor.execute("DROP TABLE commands")
-            
-            # Recreate the table without sentiment_prefix field
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS commands (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phrases TEXT NOT NULL,  -- JSON array of phrases
-                script TEXT NOT NULL,
-                understand_sentiment INTEGER DEFAULT 0,  -- Boolean 0/1 for sentiment analysis
-                partial_match INTEGER DEFAULT 0  -- Boolean 0/1 for partial phrase matching
-            )
-            ''')
-            
+        
+        # Check if we need to migrate to add partial match field
+        partial_match_migration = False
+        try:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name='commands'")
+            table_def = cursor.fetchone()[0]
+            partial_match_migration = "partial_match" not in table_def.lower()
+        except:
+            pass
+        
+        if partial_match_migration and not needs_migration and not sentiment_migration:
+            print("Migrating database to support partial matching...")
+            # Create a backup of the commands table
+            cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
+            # Drop the existing table
+            cursor.execute("DROP TABLE commands")
+        
+        # Create commands table with phrases as JSON array if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS commands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phrases TEXT NOT NULL,  -- JSON array of phrases
+            script TEXT NOT NULL,
+            understand_sentiment INTEGER DEFAULT 0,  -- Boolean 0/1 for sentiment analysis
+            partial_match INTEGER DEFAULT 0  -- Boolean 0/1 for partial phrase matching
+        )
+        ''')
+        
+        # Migrate data if needed for phrases
+        if needs_migration:
+            cursor.execute("SELECT id, phrase, script FROM commands_backup")
+            for row in cursor.fetchall():
+                phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
+                cursor.execute(
+                    'INSERT INTO commands (id, phrases, script) VALUES (?, ?, ?)',
+                    (row[0], phrases, row[2])
+                )
+            print("Migration completed.")
+        
+        # Migrate data if needed for sentiment fields
+        if sentiment_migration and not needs_migration:
+            # Check which columns exist in the backup table
+            cursor.execute("PRAGMA table_info(commands_backup)")
+            columns = [column[1] for column in cursor.fetchall()]
+        
+            if 'phrases' in columns:
+                # New schema backup
+                cursor.execute("SELECT id, phrases, script FROM commands_backup")
+                for row in cursor.fetchall():
+                    cursor.execute(
+                        'INSERT INTO commands (id, phrases, script, understand_sentiment) VALUES (?, ?, ?, ?)',
+                        (row[0], row[1], row[2], 0)
+                    )
+            elif 'phrase' in columns:
+                # Old schema backup
+                cursor.execute("SELECT id, phrase, script FROM commands_backup")
+                for row in cursor.fetchall():
+                    phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
+                    cursor.execute(
+                        'INSERT INTO commands (id, phrases, script, understand_sentiment) VALUES (?, ?, ?, ?)',
+                        (row[0], phrases, row[2], 0)
+                    )
+            print("Sentiment fields migration completed.")
+        
+        # Migrate data if needed for partial match field
+        if partial_match_migration and not needs_migration and not sentiment_migration:
             # Check which columns exist in the backup table
             cursor.execute("PRAGMA table_info(commands_backup)")
-            backup_columns = [column[1] for column in cursor.fetchall()]
-            
-            if 'understand_sentiment' in backup_columns:
+            columns = [column[1] for column in cursor.fetchall()]
+        
+            if 'understand_sentiment' in columns:
                 # Schema has sentiment analysis
                 cursor.execute("SELECT id, phrases, script, understand_sentiment FROM commands_backup")
                 for row in cursor.fetchall():
@@ -176,85 +241,280 @@ def init_db():
                         'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
                         (row[0], row[1], row[2], row[3], 0)
                     )
-            else:
-                # Schema without sentiment field
+            elif 'phrases' in columns:
+                # New schema without sentiment field
                 cursor.execute("SELECT id, phrases, script FROM commands_backup")
                 for row in cursor.fetchall():
                     cursor.execute(
                         'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
                         (row[0], row[1], row[2], 0, 0)
                     )
-            print("Migration from sentiment_prefix schema completed.")
-    except Exception as e:
-        print(f"Error during schema migration: {e}")
-    
-    # Create settings table if not exists
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS settings (
-        key TEXT PRIMARY KEY,
-        value TEXT NOT NULL
-    )
-    ''')
-    
-    # Initialize default settings if they don't exist
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('active', 'false'))
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('openai_api_key', ''))
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('openai_request_count', '0'))
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('global_shortcut_key', ''))
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('ai_timeout_enabled', 'false'))
-    cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
-                  ('ai_timeout_seconds', '60'))
-    
-    conn.commit()
-    conn.close()
+            elif 'phrase' in columns:
+                # Old schema
+                cursor.execute("SELECT id, phrase, script FROM commands_backup")
+                for row in cursor.fetchall():
+                    phrases = json.dumps([row[1]])  # Convert single phrase to JSON array
+                    cursor.execute(
+                        'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
+                        (row[0], phrases, row[2], 0, 0)
+                    )
+            print("Partial match field migration completed.")
+        
+        # Migrate data from old table with sentiment_prefix to new schema without prefix
+        try:
+            cursor.execute("PRAGMA table_info(commands)")
+            columns = [column[1] for column in cursor.fetchall()]
+        
+            if 'sentiment_prefix' in columns:
+                print("Migrating from sentiment_prefix schema to prefix-free schema...")
+                # Create a backup of the commands table
+                cursor.execute("CREATE TABLE IF NOT EXISTS commands_backup AS SELECT * FROM commands")
+        
+                # Drop the existing table
+                cursor.execute("DROP TABLE commands")
+        
+                # Recreate the table without sentiment_prefix field
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS commands (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phrases TEXT NOT NULL,  -- JSON array of phrases
+                    script TEXT NOT NULL,
+                    understand_sentiment INTEGER DEFAULT 0,  -- Boolean 0/1 for sentiment analysis
+                    partial_match INTEGER DEFAULT 0  -- Boolean 0/1 for partial phrase matching
+                )
+                ''')
+        
+                # Check which columns exist in the backup table
+                cursor.execute("PRAGMA table_info(commands_backup)")
+                backup_columns = [column[1] for column in cursor.fetchall()]
+        
+                if 'understand_sentiment' in backup_columns:
+                    # Schema has sentiment analysis
+                    cursor.execute("SELECT id, phrases, script, understand_sentiment FROM commands_backup")
+                    for row in cursor.fetchall():
+                        cursor.execute(
+                            'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
+                            (row[0], row[1], row[2], row[3], 0)
+                        )
+                else:
+                    # Schema without sentiment field
+                    cursor.execute("SELECT id, phrases, script FROM commands_backup")
+                    for row in cursor.fetchall():
+                        cursor.execute(
+                            'INSERT INTO commands (id, phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?, ?)',
+                            (row[0], row[1], row[2], 0, 0)
+                        )
+                print("Migration from sentiment_prefix schema completed.")
+        except Exception as e:
+            print(f"Error during schema migration: {e}")
+        
+        # Add per-command option columns missing from older schemas
+        for column, definition in COMMAND_OPTION_COLUMNS.items():
+            _ensure_command_column(cursor, column, definition)
+        
+        # Create LLM decision cache table if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_decisions (
+            utterance TEXT NOT NULL,  -- Normalized utterance
+            fingerprint TEXT NOT NULL,  -- Hash of the sentiment-enabled commands
+            command_id INTEGER,  -- NULL for NO_MATCH decisions
+            phrase TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (utterance, fingerprint)
+        )
+        ''')
+        
+        # Create settings table if not exists
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
+        
+        # Initialize default settings if they don't exist
+        for key, value in SETTING_DEFAULTS.items():
+            cursor.execute('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', 
+                          (key, _serialize_setting(value)))
+        
+        conn.commit()
+    
+    # Migrations may have rewritten the commands table
+    command_registry.invalidate()
+    settings_store.invalidate()
 
-def get_commands():
-    """Get all command mappings from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, phrases, script, understand_sentiment, partial_match FROM commands')
-    commands = []
-    for row in cursor.fetchall():
-        cmd = dict(row)
-        # Parse phrases JSON array back to Python list
-        cmd['phrases'] = json.loads(cmd['phrases'])
+class CommandRegistry:
+    """Process-wide in-memory copy of the commands table.
+    
+    Commands are loaded from SQLite once, kept parsed in memory and patched
+    by add_command, update_command and delete_command so that lookups on the
+    recognition hot path never touch disk. The returned command dicts are
+    shared and must be treated as read-only.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._commands = None
+        self._snapshot = None
+        self._mappings = None
+        self._subscribers = []
+        self.version = 0
+    
+    def _ensure_loaded(self):
+        """Load the commands table if it hasn't been loaded yet."""
+        if self._commands is None:
+            self._commands = {cmd['id']: cmd for cmd in _load_commands()}
+            self._changed()
+    
+    def _changed(self):
+        """Drop derived views and bump the version after a change."""
+        self._snapshot = None
+        self._mappings = None
+        self.version += 1
+    
+    def _notify(self, command_id):
+        """Tell subscribers a command changed; command_id is None when all may have."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(command_id)
+            except Exception as e:
+                print(f"Error in command change callback: {e}")
+    
+    def get_commands(self):
+        """Get all commands in table order."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._snapshot is None:
+                self._snapshot = list(self._commands.values())
+            return list(self._snapshot)
+    
+    def get_command_mappings(self):
+        """Get the lowercased phrase to script mapping."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._mappings is None:
+                command_map = {}
+                for cmd in self._commands.values():
+                    for phrase in cmd['phrases']:
+                        command_map[phrase.lower()] = cmd['script']
+                self._mappings = command_map
+            return dict(self._mappings)
+    
+    def get_command(self, command_id):
+        """Get a single command by id, or None if it doesn't exist."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._commands.get(command_id)
+    
+    def get_version(self):
+        """Get a counter that changes whenever the commands change."""
+        with self._lock:
+            self._ensure_loaded()
+            return self.version
+    
+    def put(self, cmd):
+        """Add or replace a command after it was written to the database."""
+        with self._lock:
+            if self._commands is not None:
+                self._commands[cmd['id']] = cmd
+                self._changed()
+        self._notify(cmd['id'])
+    
+    def remove(self, command_id):
+        """Remove a command after it was deleted from the database."""
+        with self._lock:
+            if self._commands is not None:
+                self._commands.pop(command_id, None)
+                self._changed()
+        self._notify(command_id)
+    
+    def invalidate(self):
+        """Discard the cache so it is reloaded from the database on next use."""
+        with self._lock:
+            self._commands = None
+            self._changed()
+        self._notify(None)
+    
+    def subscribe(self, callback):
+        """Register callback(command_id) for command changes."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+# Global command registry instance
+command_registry = CommandRegistry()
+
+def _make_command(command_id, phrases, script, understand_sentiment, partial_match, fuzzy_threshold=None,
+                  concurrency_policy=None, coalesce_ms=None, max_rate_per_minute=None, timing_profile=None):
+    """Build the command dict shape returned by get_commands()."""
+    return {
+        'id': command_id,
+        'phrases': phrases,
+        'script': script,
+        'understand_sentiment': bool(understand_sentiment),
+        'partial_match': bool(partial_match),
+        'fuzzy_threshold': fuzzy_threshold,
+        'concurrency_policy': concurrency_policy,
+        'coalesce_ms': coalesce_ms,
+        'max_rate_per_minute': max_rate_per_minute,
+        'timing_profile': timing_profile,
         # Add primary phrase for compatibility
-        cmd['phrase'] = cmd['phrases'][0] if cmd['phrases'] else ""
-        # Convert understand_sentiment to boolean
-        cmd['understand_sentiment'] = bool(cmd['understand_sentiment'])
-        # Convert partial_match to boolean
-        cmd['partial_match'] = bool(cmd['partial_match'])
-        commands.append(cmd)
-    
-    conn.close()
+        'phrase': phrases[0] if phrases else ""
+    }
+
+def _load_commands():
+    """Load and parse all commands from the database."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'SELECT id, phrases, script, understand_sentiment, partial_match, fuzzy_threshold, '
+            'concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile FROM commands'
+        )
+        commands = []
+        for row in cursor.fetchall():
+            # Parse phrases JSON array back to Python list
+            commands.append(_make_command(
+                row['id'],
+                json.loads(row['phrases']),
+                row['script'],
+                row['understand_sentiment'],
+                row['partial_match'],
+                row['fuzzy_threshold'],
+                row['concurrency_policy'],
+                row['coalesce_ms'],
+                row['max_rate_per_minute'],
+                row['timing_profile']
+            ))
+    
     return commands
 
+def get_commands():
+    """Get all command mappings from the command registry."""
+    return command_registry.get_commands()
+
+def get_command(command_id):
+    """Get a single command by id from the command registry."""
+    return command_registry.get_command(command_id)
+
 def get_command_mappings():
     """Get command phrase to script mappings for recognition matching."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT phrases, script FROM commands')
-    command_map = {}
-    
-    for row in cursor.fetchall():
-        script = row['script']
-        # Each phrase in the JSON array maps to the same script
-        for phrase in json.loads(row['phrases']):
-            command_map[phrase.lower()] = script
+    return command_registry.get_command_mappings()
+
+def get_commands_version():
+    """Get the command registry version, which changes whenever commands change."""
+    return command_registry.get_version()
+
+def subscribe_commands(callback):
+    """Register callback(command_id) to be called when a command is added, updated or deleted.
     
-    conn.close()
-    return command_map
+    command_id is None when the whole table was reloaded.
+    """
+    command_registry.subscribe(callback)
 
-def add_command(phrases, script, understand_sentiment=False, partial_match=False):
+def add_command(phrases, script, understand_sentiment=False, partial_match=False, fuzzy_threshold=None,
+                concurrency_policy=None, coalesce_ms=None, max_rate_per_minute=None, timing_profile=None):
     """Add a new command to the database.
     
     Args:
@@ -262,26 +522,36 @@ def add_command(phrases, script, understand_sentiment=False, partial_match=False
         script: Command script to execute
         understand_sentiment: Whether to use sentiment analysis
         partial_match: Whether to allow partial matching
+        fuzzy_threshold: Fuzzy match similarity (0-1), None to use the global setting
+        concurrency_policy: serialize, drop_if_running or replace_running, None for serialize
+        coalesce_ms: Repeats within this many ms fire once, None for the default window
+        max_rate_per_minute: Maximum triggers per minute, None for no limit
+        timing_profile: Keystroke timing profile name, None for the global setting
     """
     # Ensure phrases is a list
     if isinstance(phrases, str):
         phrases = [phrases]
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'INSERT INTO commands (phrases, script, understand_sentiment, partial_match) VALUES (?, ?, ?, ?)',
-        (json.dumps(phrases), script, 1 if understand_sentiment else 0, 1 if partial_match else 0)
-    )
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'INSERT INTO commands (phrases, script, understand_sentiment, partial_match, fuzzy_threshold, '
+            'concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (json.dumps(phrases), script, 1 if understand_sentiment else 0, 1 if partial_match else 0, fuzzy_threshold,
+             concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile)
+        )
+        
+        command_id = cursor.lastrowid
+        conn.commit()
     
-    command_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    command_registry.put(_make_command(command_id, list(phrases), script, understand_sentiment, partial_match, fuzzy_threshold,
+                                       concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile))
     
     return command_id
 
-def update_command(command_id, phrases, script, understand_sentiment=False, partial_match=False):
+def update_command(command_id, phrases, script, understand_sentiment=False, partial_match=False, fuzzy_threshold=None,
+                   concurrency_policy=None, coalesce_ms=None, max_rate_per_minute=None, timing_profile=None):
     """Update an existing command in the database.
     
     Args:
@@ -290,167 +560,257 @@ def update_command(command_id, phrases, script, understand_sentiment=False, part
         script: Command script to execute
         understand_sentiment: Whether to use sentiment analysis
         partial_match: Whether to allow partial matching
+        fuzzy_threshold: Fuzzy match similarity (0-1), None to use the global setting
+        concurrency_policy: serialize, drop_if_running or replace_running, None for serialize
+        coalesce_ms: Repeats within this many ms fire once, None for the default window
+        max_rate_per_minute: Maximum triggers per minute, None for no limit
+        timing_profile: Keystroke timing profile name, None for the global setting
     """
     # Ensure phrases is a list
     if isinstance(phrases, str):
         phrases = [phrases]
         
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'UPDATE commands SET phrases = ?, script = ?, understand_sentiment = ?, partial_match = ? WHERE id = ?',
-        (json.dumps(phrases), script, 1 if understand_sentiment else 0, 1 if partial_match else 0, command_id)
-    )
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'UPDATE commands SET phrases = ?, script = ?, understand_sentiment = ?, partial_match = ?, fuzzy_threshold = ?, '
+            'concurrency_policy = ?, coalesce_ms = ?, max_rate_per_minute = ?, timing_profile = ? WHERE id = ?',
+            (json.dumps(phrases), script, 1 if understand_sentiment else 0, 1 if partial_match else 0, fuzzy_threshold,
+             concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile, command_id)
+        )
+        
+        rows_affected = cursor.rowcount
+        conn.commit()
     
-    rows_affected = cursor.rowcount
-    conn.commit()
-    conn.close()
+    if rows_affected > 0:
+        command_registry.put(_make_command(command_id, list(phrases), script, understand_sentiment, partial_match, fuzzy_threshold,
+                                           concurrency_policy, coalesce_ms, max_rate_per_minute, timing_profile))
     
     return rows_affected > 0
 
 def delete_command(command_id):
     """Delete a command from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM commands WHERE id = ?', (command_id,))
-    rows_affected = cursor.rowcount
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM commands WHERE id = ?', (command_id,))
+        rows_affected = cursor.rowcount
+        
+        conn.commit()
     
-    conn.commit()
-    conn.close()
+    if rows_affected > 0:
+        command_registry.remove(command_id)
     
     return rows_affected > 0
 
-def get_active_state():
-    """Get the active state from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Typed defaults for every key in the settings table
+SETTING_DEFAULTS = {
+    'active': False,
+    'openai_api_key': '',
+    'openai_request_count': 0,
+    'global_shortcut_key': '',
+    'ai_timeout_enabled': False,
+    'ai_timeout_seconds': 60,
+    'fuzzy_match_threshold': 0.9,  # Similarity ratio (0-1) a misheard phrase needs, see FuzzyPhraseIndex
+    'intent_confidence_threshold': 0.6,
+    'openai_base_url': 'https://api.openai.com/v1',
+    'openai_streaming_enabled': False,
+    'continuous_capture_enabled': False,
+    'recognizer_backend': 'google',
+    'vosk_model_path': '',
+    'grammar_mode_enabled': False,
+    'vad_enabled': False,
+    'calibration_energy_threshold': 0.0,
+    'calibration_noise_floor': 0.0,
+    'calibration_timestamp': 0.0,
+    'interim_triggering_enabled': False,
+    'wake_word': '',
+    'wake_word_backend': 'sphinx',
+    'wake_word_window_seconds': 10.0,
+    'keystroke_timing_profile': 'normal',
+}
+
+def _serialize_setting(value):
+    """Convert a typed setting value to the string stored in the database."""
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+class SettingsStore:
+    """In-memory, typed cache of the settings table.
     
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('active',))
-    active = cursor.fetchone()[0] == 'true'
+    Reads are served from memory, writes go through to SQLite and then notify
+    subscribers, so callers can react to changes instead of polling.
+    """
     
-    conn.close()
-    return active
+    def __init__(self, defaults):
+        self.defaults = defaults
+        self._lock = threading.RLock()
+        self._values = None
+        self._subscribers = []
+    
+    def _parse(self, key, raw):
+        """Convert a stored string to the type of the key's default."""
+        default = self.defaults.get(key, '')
+        if isinstance(default, bool):
+            return raw.lower() == 'true'
+        if isinstance(default, int):
+            try:
+                return int(raw)
+            except ValueError:
+                return default
+        if isinstance(default, float):
+            try:
+                return float(raw)
+            except ValueError:
+                return default
+        return raw
+    
+    def _ensure_loaded(self):
+        """Load the settings table if it hasn't been loaded yet."""
+        if self._values is not None:
+            return
+        
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT key, value FROM settings')
+            values = {row['key']: self._parse(row['key'], row['value']) for row in cursor.fetchall()}
+        
+        self._values = values
+    
+    def get(self, key):
+        """Get a setting, falling back to its default."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._values.get(key, self.defaults.get(key))
+    
+    def set_many(self, values, notify=True):
+        """Write several settings in one transaction and notify subscribers.
+        
+        Args:
+            values: Dict of setting key to typed value
+            notify: False to write without notifying subscribers, for internal
+                state nothing reacts to
+        """
+        with self._lock:
+            changed, subscribers = self._write_locked(values)
+        if notify:
+            self._notify(changed, subscribers)
+    
+    def _write_locked(self, values):
+        """Write settings to the database and cache; called with the lock held.
+        
+        Returns:
+            (changed, subscribers) to pass to _notify() once the lock is released
+        """
+        self._ensure_loaded()
+        
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            for key, value in values.items():
+                cursor.execute(
+                    'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                    (key, _serialize_setting(value))
+                )
+            conn.commit()
+        
+        changed = {}
+        for key, value in values.items():
+            value = self._parse(key, _serialize_setting(value))
+            if self._values.get(key) != value:
+                changed[key] = value
+            self._values[key] = value
+        return changed, list(self._subscribers)
+    
+    def _notify(self, changed, subscribers):
+        """Call subscribers for changed settings, outside the lock so callbacks may read settings."""
+        for key, value in changed.items():
+            for subscribed_key, callback in subscribers:
+                if subscribed_key is None or subscribed_key == key:
+                    try:
+                        callback(key, value)
+                    except Exception as e:
+                        print(f"Error in settings callback for '{key}': {e}")
+    
+    def set(self, key, value):
+        """Write a single setting and notify subscribers."""
+        self.set_many({key: value})
+    
+    def increment(self, key, amount=1):
+        """Atomically increment an integer setting and return the new value."""
+        with self._lock:
+            new_value = self.get(key) + amount
+            changed, subscribers = self._write_locked({key: new_value})
+        self._notify(changed, subscribers)
+        return new_value
+    
+    def subscribe(self, callback, key=None):
+        """Register callback(key, value) for changes to a key, or to every key if None."""
+        with self._lock:
+            self._subscribers.append((key, callback))
+    
+    def unsubscribe(self, callback):
+        """Remove every registration of a callback."""
+        with self._lock:
+            self._subscribers = [(k, cb) for k, cb in self._subscribers if cb != callback]
+    
+    def invalidate(self):
+        """Discard the cache so it is reloaded from the database on next use."""
+        with self._lock:
+            self._values = None
+
+# Global settings store instance
+settings_store = SettingsStore(SETTING_DEFAULTS)
+
+def subscribe_settings(callback, key=None):
+    """Register callback(key, value) to be called when a setting changes."""
+    settings_store.subscribe(callback, key)
+
+def unsubscribe_settings(callback):
+    """Remove a callback registered with subscribe_settings()."""
+    settings_store.unsubscribe(callback)
+
+def get_active_state():
+    """Get the active state from the settings cache."""
+    return settings_store.get('active')
 
 def set_active_state(active):
     """Set the active state in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'UPDATE settings SET value = ? WHERE key = ?',
-        (str(active).lower(), 'active')
-    )
-    
-    conn.commit()
-    conn.close()
+    settings_store.set('active', bool(active))
 
 def get_openai_api_key():
-    """Get the OpenAI API key from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_api_key',))
-    result = cursor.fetchone()
-    api_key = result[0] if result else ''
-    
-    conn.close()
-    return api_key
+    """Get the OpenAI API key from the settings cache."""
+    return settings_store.get('openai_api_key')
 
 def set_openai_api_key(api_key):
     """Set the OpenAI API key in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('openai_api_key', api_key)
-    )
-    
-    conn.commit()
-    conn.close()
+    settings_store.set('openai_api_key', api_key)
     return True
 
 def get_openai_request_count():
-    """Get the OpenAI API request count from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_request_count',))
-    result = cursor.fetchone()
-    count = int(result[0]) if result else 0
-    
-    conn.close()
-    return count
+    """Get the OpenAI API request count from the settings cache."""
+    return settings_store.get('openai_request_count')
 
 def increment_openai_request_count():
     """Increment the OpenAI API request count in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get current count
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('openai_request_count',))
-    result = cursor.fetchone()
-    current_count = int(result[0]) if result else 0
-    
-    # Increment count
-    new_count = current_count + 1
-    
-    # Update in database
-    cursor.execute(
-        'UPDATE settings SET value = ? WHERE key = ?',
-        (str(new_count), 'openai_request_count')
-    )
-    
-    conn.commit()
-    conn.close()
-    return new_count 
+    return settings_store.increment('openai_request_count')
 
 def get_global_shortcut_key():
-    """Get the global shortcut key from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('global_shortcut_key',))
-    result = cursor.fetchone()
-    shortcut_key = result[0] if result else ''
-    
-    conn.close()
-    return shortcut_key
+    """Get the global shortcut key from the settings cache."""
+    return settings_store.get('global_shortcut_key')
 
 def set_global_shortcut_key(shortcut_key):
     """Set the global shortcut key in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('global_shortcut_key', shortcut_key)
-    )
-    
-    conn.commit()
-    conn.close()
+    settings_store.set('global_shortcut_key', shortcut_key)
     return True
 
 # Add new functions for AI mode timeout settings
 def get_ai_timeout_settings():
-    """Get the AI mode timeout settings from the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('ai_timeout_enabled',))
-    enabled_result = cursor.fetchone()
-    enabled = enabled_result[0].lower() == 'true' if enabled_result else False
-    
-    cursor.execute('SELECT value FROM settings WHERE key = ?', ('ai_timeout_seconds',))
-    seconds_result = cursor.fetchone()
-    seconds = int(seconds_result[0]) if seconds_result else 60
-    
-    conn.close()
+    """Get the AI mode timeout settings from the settings cache."""
     return {
-        'enabled': enabled,
-        'seconds': seconds
+        'enabled': settings_store.get('ai_timeout_enabled'),
+        'seconds': settings_store.get('ai_timeout_seconds')
     }
 
 def set_ai_timeout_settings(enabled, seconds):
@@ -460,19 +820,189 @@ def set_ai_timeout_settings(enabled, seconds):
         enabled: Boolean indicating if timeout is enabled
         seconds: Integer number of seconds for timeout
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('ai_timeout_enabled', str(enabled).lower())
-    )
-    
-    cursor.execute(
-        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-        ('ai_timeout_seconds', str(seconds))
-    )
-    
-    conn.commit()
-    conn.close()
-    return True 
\ No newline at end of file
+    settings_store.set_many({
+        'ai_timeout_enabled': bool(enabled),
+        'ai_timeout_seconds': int(seconds)
+    })
+    return True
+
+def get_fuzzy_match_threshold():
+    """Get the default fuzzy match similarity threshold from the settings cache."""
+    return settings_store.get('fuzzy_match_threshold')
+
+def set_fuzzy_match_threshold(threshold):
+    """Set the default fuzzy match similarity threshold in the database."""
+    settings_store.set('fuzzy_match_threshold', float(threshold))
+    return True
+
+def get_intent_confidence_threshold():
+    """Get the local intent classifier confidence threshold from the settings cache."""
+    return settings_store.get('intent_confidence_threshold')
+
+def set_intent_confidence_threshold(threshold):
+    """Set the local intent classifier confidence threshold in the database."""
+    settings_store.set('intent_confidence_threshold', float(threshold))
+    return True
+
+def get_llm_decisions(limit):
+    """Get the most recent cached LLM decisions, oldest first."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'SELECT utterance, fingerprint, command_id, phrase, created_at FROM llm_decisions ORDER BY created_at DESC LIMIT ?',
+            (limit,)
+        )
+        decisions = [dict(row) for row in cursor.fetchall()]
+    
+    decisions.reverse()
+    return decisions
+
+def save_llm_decision(utterance, fingerprint, command_id, phrase, created_at, max_entries):
+    """Store a cached LLM decision and trim the table to the newest max_entries rows."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'INSERT OR REPLACE INTO llm_decisions (utterance, fingerprint, command_id, phrase, created_at) VALUES (?, ?, ?, ?, ?)',
+            (utterance, fingerprint, command_id, phrase, created_at)
+        )
+        cursor.execute(
+            'DELETE FROM llm_decisions WHERE created_at < (SELECT MIN(created_at) FROM '
+            '(SELECT created_at FROM llm_decisions ORDER BY created_at DESC LIMIT ?))',
+            (max_entries,)
+        )
+        
+        conn.commit()
+
+def delete_llm_decisions_before(created_at):
+    """Delete cached LLM decisions created before the given timestamp."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM llm_decisions WHERE created_at < ?', (created_at,))
+        
+        conn.commit()
+
+def get_openai_base_url():
+    """Get the OpenAI-compatible API base URL from the settings cache."""
+    return settings_store.get('openai_base_url')
+
+def set_openai_base_url(base_url):
+    """Set the OpenAI-compatible API base URL in the database."""
+    settings_store.set('openai_base_url', base_url)
+    return True
+
+def get_openai_streaming_enabled():
+    """Get whether OpenAI replies are streamed and resolved early, from the settings cache."""
+    return settings_store.get('openai_streaming_enabled')
+
+def set_openai_streaming_enabled(enabled):
+    """Set whether OpenAI replies are streamed and resolved early in the database."""
+    settings_store.set('openai_streaming_enabled', bool(enabled))
+    return True
+
+def get_continuous_capture_enabled():
+    """Get whether the microphone stays open between phrases, from the settings cache."""
+    return settings_store.get('continuous_capture_enabled')
+
+def set_continuous_capture_enabled(enabled):
+    """Set whether the microphone stays open between phrases in the database."""
+    settings_store.set('continuous_capture_enabled', bool(enabled))
+    return True
+
+def get_recognizer_backend_settings():
+    """Get the speech-to-text backend name and its options from the settings cache."""
+    return {
+        'backend': settings_store.get('recognizer_backend'),
+        'vosk_model_path': settings_store.get('vosk_model_path')
+    }
+
+def set_recognizer_backend_settings(backend, vosk_model_path=None):
+    """Set the speech-to-text backend and, optionally, the Vosk model path in the database."""
+    values = {'recognizer_backend': backend}
+    if vosk_model_path is not None:
+        values['vosk_model_path'] = vosk_model_path
+    settings_store.set_many(values)
+    return True
+
+def get_grammar_mode_enabled():
+    """Get whether recognition is constrained to the command phrases, from the settings cache."""
+    return settings_store.get('grammar_mode_enabled')
+
+def set_grammar_mode_enabled(enabled):
+    """Set whether recognition is constrained to the command phrases in the database."""
+    settings_store.set('grammar_mode_enabled', bool(enabled))
+    return True
+
+def get_vad_enabled():
+    """Get whether voice activity detection filters the audio, from the settings cache."""
+    return settings_store.get('vad_enabled')
+
+def set_vad_enabled(enabled):
+    """Set whether voice activity detection filters the audio in the database."""
+    settings_store.set('vad_enabled', bool(enabled))
+    return True
+
+def get_calibration_profile():
+    """Get the saved microphone calibration, or None if there isn't one."""
+    timestamp = settings_store.get('calibration_timestamp')
+    if not timestamp:
+        return None
+    return {
+        'energy_threshold': settings_store.get('calibration_energy_threshold'),
+        'noise_floor': settings_store.get('calibration_noise_floor'),
+        'timestamp': timestamp
+    }
+
+def set_calibration_profile(energy_threshold, noise_floor, timestamp):
+    """Save the microphone calibration in the database.
+    
+    It is saved every minute while listening, so subscribers aren't notified.
+    """
+    settings_store.set_many({
+        'calibration_energy_threshold': float(energy_threshold),
+        'calibration_noise_floor': float(noise_floor),
+        'calibration_timestamp': float(timestamp)
+    }, notify=False)
+    return True
+
+def clear_calibration_profile():
+    """Forget the saved microphone calibration so the next start calibrates again."""
+    settings_store.set('calibration_timestamp', 0.0)
+    return True
+
+def get_interim_triggering_enabled():
+    """Get whether commands fire from interim hypotheses, from the settings cache."""
+    return settings_store.get('interim_triggering_enabled')
+
+def set_interim_triggering_enabled(enabled):
+    """Set whether commands fire from interim hypotheses in the database."""
+    settings_store.set('interim_triggering_enabled', bool(enabled))
+    return True
+
+def get_wake_word_settings():
+    """Get the wake word, its spotting backend and window from the settings cache."""
+    return {
+        'wake_word': settings_store.get('wake_word'),
+        'backend': settings_store.get('wake_word_backend'),
+        'window_seconds': settings_store.get('wake_word_window_seconds')
+    }
+
+def set_wake_word_settings(wake_word, backend, window_seconds):
+    """Set the wake word, its spotting backend and window in the database."""
+    settings_store.set_many({
+        'wake_word': wake_word,
+        'wake_word_backend': backend,
+        'wake_word_window_seconds': float(window_seconds)
+    })
+    return True
+
+def get_keystroke_timing_profile():
+    """Get the global keystroke timing profile from the settings cache."""
+    return settings_store.get('keystroke_timing_profile')
+
+def set_keystroke_timing_profile(profile):
+    """Set the global keystroke timing profile in the database."""
+    settings_store.set('keystroke_timing_profile', profile)
+    return True
@@ -0,0 +1,124 @@
+"""
+LLM decision cache module for voice command application.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+# Cache limits
+MAX_ENTRIES = 1000
+TTL_SECONDS = 7 * 24 * 60 * 60  # One week
+
+def normalize_utterance(text):
+    """Normalize an utterance so trivially different phrasings share a cache key."""
+    text = re.sub(r"[^a-z0-9' ]+", ' ', text.lower())
+    return ' '.join(text.split())
+
+def command_fingerprint(commands):
+    """Hash the sentiment-enabled commands so any edit changes the fingerprint."""
+    payload = json.dumps(
+        [(cmd['id'], cmd['phrases'], cmd['script']) for cmd in commands if cmd['understand_sentiment']],
+        sort_keys=True
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class DecisionCache:
+    """Bounded LRU cache of utterance to command decisions with a TTL.
+
+    Keys combine the normalized utterance with the command fingerprint, so
+    decisions made against an older command set are never returned. Entries
+    are written through to SQLite and reloaded on first use after a restart.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = None
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_loaded(self):
+        """Load persisted decisions if they haven't been loaded yet."""
+        if self._entries is not None:
+            return
+
+        self._entries = OrderedDict()
+        try:
+            db.delete_llm_decisions_before(time.time() - self.ttl_seconds)
+            for row in db.get_llm_decisions(self.max_entries):
+                self._entries[(row['utterance'], row['fingerprint'])] = (
+                    row['command_id'], row['phrase'], row['created_at']
+                )
+        except Exception as e:
+            print(f"Error loading LLM decision cache: {e}")
+
+    def get(self, text, fingerprint):
+        """Look up a cached decision.
+
+        Args:
+            text: The utterance
+            fingerprint: Fingerprint of the current command set
+
+        Returns:
+            Tuple of (found, command_id, phrase). command_id is None for
+            cached NO_MATCH decisions.
+        """
+        key = (normalize_utterance(text), fingerprint)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[2] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0], entry[1]
+
+    def put(self, text, fingerprint, command_id, phrase):
+        """Store a decision, with command_id and phrase None for NO_MATCH."""
+        key = (normalize_utterance(text), fingerprint)
+        created_at = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = (command_id, phrase, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        try:
+            db.save_llm_decision(key[0], fingerprint, command_id, phrase, created_at, self.max_entries)
+        except Exception as e:
+            print(f"Error saving LLM decision: {e}")
+
+    def clear(self):
+        """Drop every cached decision and reset the counters."""
+        with self._lock:
+            self._entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+        db.delete_llm_decisions_before(float('inf'))
+
+    def get_stats(self):
+        """Get hit and miss counts since startup."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries) if self._entries is not None else 0
+            }
+
+# Global decision cache instance
+decision_cache = DecisionCache()
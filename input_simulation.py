@@ -1,130 +1,131 @@
 """
 Input simulation module for executing keyboard scripts.
 """
-import re
+import os
+import threading
 import time
 import traceback
-from pynput.keyboard import Key, Controller, KeyCode
+from output_backends import create_output_backend
+from script_compiler import KEY, COMBO, TYPE, DELAY, CALL, CompiledScript, compile_script, resolve_key, strip_comments
 
 # Remove the circular import from here
 # Will import inside the functions that need it
 
-# Initialize keyboard controller
-keyboard = Controller()
+# Output backend created on first use: pynput, recording or null
+OUTPUT_BACKEND = os.environ.get('OUTPUT_BACKEND', 'pynput')
+keyboard = None
+keyboard_lock = threading.Lock()
 
-# Debug flag - set to True for verbose logging
-DEBUG = True
+# Seconds slept around key events. normal is the original pacing, which the
+# slowest targets (games, remote desktops) need to register every key; burst
+# sends events back to back for targets that can take it.
+TIMING_PROFILES = {
+    'normal': {'key_hold': 0.05, 'key_gap': 0.05, 'combo_gap': 0.05, 'combo_hold': 0.1, 'type_gap': 0.2},
+    'fast': {'key_hold': 0.01, 'key_gap': 0.01, 'combo_gap': 0.01, 'combo_hold': 0.02, 'type_gap': 0.05},
+    'burst': {'key_hold': 0.0, 'key_gap': 0.0, 'combo_gap': 0.0, 'combo_hold': 0.0, 'type_gap': 0.0},
+}
+DEFAULT_TIMING_PROFILE = 'normal'
 
-def strip_comments(line):
-    """Strip comments from a line of script."""
-    # Remove line comments (starting with --)
-    if line.startswith('--'):
-        return ''
-    
-    # Remove inline comments (after #)
-    if '#' in line:
-        line = line.split('#', 1)[0]
+def get_timing(profile=None):
+    """Get the delays of a timing profile by name, falling back to the default profile."""
+    return TIMING_PROFILES.get(profile) or TIMING_PROFILES[DEFAULT_TIMING_PROFILE]
+
+def pause(seconds):
+    """Sleep unless the delay is zero, so burst mode doesn't even yield."""
+    if seconds:
+        time.sleep(seconds)
+
+def get_keyboard():
+    """Get the output backend scripts are executed on, creating it on first use."""
+    global keyboard
+    if keyboard is None:
+        with keyboard_lock:
+            if keyboard is None:
+                keyboard = create_output_backend(OUTPUT_BACKEND)
+                print(f"Keyboard output backend: {keyboard.name}")
+    return keyboard
+
+def set_keyboard(backend):
+    """Replace the output backend scripts are executed on."""
+    global keyboard
+    with keyboard_lock:
+        keyboard = backend
+
+def set_output_backend(name):
+    """Switch to a new output backend by name.
     
-    return line.strip()
+    Returns:
+        The new OutputBackend
+    """
+    backend = create_output_backend(name)
+    set_keyboard(backend)
+    return backend
+
+# Debug flag - set to True for verbose logging
+DEBUG = True
 
 def parse_key(key_name):
-    """Parse key name into pynput key object."""
-    # Special keys mapping
-    special_keys = {
-        'enter': Key.enter,
-        'space': Key.space,
-        'tab': Key.tab,
-        'escape': Key.esc,
-        'esc': Key.esc,
-        'backspace': Key.backspace,
-        'delete': Key.delete,
-        'shift': Key.shift,
-        'ctrl': Key.ctrl,
-        'control': Key.ctrl,
-        'alt': Key.alt,
-        'win': Key.cmd,
-        'windows': Key.cmd,
-        'cmd': Key.cmd,
-        'command': Key.cmd,
-        'up': Key.up,
-        'down': Key.down,
-        'left': Key.left,
-        'right': Key.right,
-        'home': Key.home,
-        'end': Key.end,
-        'page_up': Key.page_up,
-        'page_down': Key.page_down,
-        'f1': Key.f1,
-        'f2': Key.f2,
-        'f3': Key.f3,
-        'f4': Key.f4,
-        'f5': Key.f5,
-        'f6': Key.f6,
-        'f7': Key.f7,
-        'f8': Key.f8,
-        'f9': Key.f9,
-        'f10': Key.f10,
-        'f11': Key.f11,
-        'f12': Key.f12,
-    }
-    
-    # Return the corresponding key object
-    if key_name.lower() in special_keys:
-        if DEBUG:
-            print(f"Using special key: {key_name} -> {special_keys[key_name.lower()]}")
-        return special_keys[key_name.lower()]
-    
-    # For single character keys
-    if len(key_name) == 1:
-        if DEBUG:
-            print(f"Using character key: {key_name}")
-        return key_name
-    
-    # If not recognized, log warning and try as a regular character
-    print(f"WARNING: Unrecognized key '{key_name}', treating as regular text")
-    return key_name
+    """Parse key name into the output backend's key object."""
+    key = get_keyboard().resolve_key(resolve_key(key_name))
+    if DEBUG:
+        print(f"Using key: {key_name} -> {key}")
+    return key
 
-def press_and_release(key):
-    """Press and release a key with proper delay."""
+def press_and_release(key, timing=None):
+    """Press and release a key with proper delay.
+    
+    Args:
+        key: pynput key or character
+        timing: Delays from get_timing(), the default profile if None
+    """
+    timing = timing or get_timing()
+    output = get_keyboard()
     try:
         if DEBUG:
             print(f"Pressing key: {key}")
-        keyboard.press(key)
-        time.sleep(0.05)  # Small delay to ensure key is registered
-        keyboard.release(key)
-        time.sleep(0.05)  # Small delay after release
+        output.press(key)
+        pause(timing['key_hold'])  # Small delay to ensure key is registered
+        output.release(key)
+        pause(timing['key_gap'])  # Small delay after release
     except Exception as e:
         print(f"ERROR pressing key {key}: {str(e)}")
         traceback.print_exc()
 
-def press_key_combination(keys):
-    """Press a combination of keys."""
+def press_key_combination(keys, timing=None):
+    """Press a combination of keys.
+    
+    Args:
+        keys: pynput keys or characters, pressed in order
+        timing: Delays from get_timing(), the default profile if None
+    """
+    timing = timing or get_timing()
+    output = get_keyboard()
     pressed_keys = []
     try:
         # Press all keys in sequence
         for key in keys:
             if DEBUG:
                 print(f"Pressing key in combination: {key}")
-            keyboard.press(key)
+            output.press(key)
             pressed_keys.append(key)
-            time.sleep(0.05)  # Small delay between key presses
+            pause(timing['combo_gap'])  # Small delay between key presses
         
         # Small delay for key combination to register
-        time.sleep(0.1)
+        pause(timing['combo_hold'])
         
         # Release all keys in reverse order
         for key in reversed(pressed_keys):
             if DEBUG:
                 print(f"Releasing key in combination: {key}")
-            keyboard.release(key)
-            time.sleep(0.05)  # Small delay between key releases
+            output.release(key)
+            pause(timing['combo_gap'])  # Small delay between key releases
     except Exception as e:
         # In case of error, release any pressed keys
         print(f"ERROR in key combination: {str(e)}")
         traceback.print_exc()
         for key in reversed(pressed_keys):
             try:
-                keyboard.release(key)
+                output.release(key)
             except:
                 pass
 
@@ -207,96 +208,96 @@ def handle_special_function(function_name, args=None, socketio=None):
             print("Script execution is already disabled")
             return True
     
+    elif function_name == 'cancel':
+        # Stop every other running or queued script
+        from script_executor import script_executor
+        count = script_executor.cancel_all()
+        print(f"Cancelled {count} script job(s)")
+        if socketio:
+            socketio.emit('script_result', {
+                'success': True,
+                'message': f'Cancelled {count} running script(s)'
+            })
+        return True
+    
     # Add more special functions here as needed
     
     return False  # Function not handled
 
-def execute_script(script, preview_mode=False, socketio=None):
+def execute_script(script, preview_mode=False, socketio=None, cancel_event=None, on_progress=None, timing=None):
     """Execute a keyboard script.
     
     Args:
-        script: The script to execute
+        script: The script to execute, as source or a CompiledScript
         preview_mode: If True, only simulate execution for preview
         socketio: The SocketIO instance for sending updates to the frontend
+        cancel_event: Optional threading.Event that stops the script at the
+            next op or in the middle of a delay when set
+        on_progress: Optional callable(ops_done) called after every op
+        timing: Name of the keystroke timing profile, the default if None
     """
-    print(f"Executing script: {script[:50]}...")
+    program = script if isinstance(script, CompiledScript) else compile_script(script)
+    if DEBUG:
+        print(f"Executing script: {program.source[:50]}...")
     
-    if not script:
+    if not program.source:
         print("WARNING: Empty script, nothing to execute")
         return
-        
-    lines = script.strip().split('\n')
+    
     result_messages = []
+    delays = get_timing(timing)
     
-    for line in lines:
-        line = strip_comments(line)
-        
-        # Skip empty lines
-        if not line:
-            continue
-        
-        print(f"Processing command: {line}")
-        result_messages.append(f"Command: {line}")
+    # Previews don't touch the keyboard, so they don't create the output backend
+    output = None if preview_mode else get_keyboard()
+    ops = program.ops if preview_mode else program.ops_for(output)
+    
+    for step, (opcode, operand, line) in enumerate(ops):
+        if cancel_event is not None and cancel_event.is_set():
+            print("Script cancelled")
+            break
+        if on_progress:
+            on_progress(step)
+        if DEBUG:
+            print(f"Processing command: {line}")
+        if preview_mode:
+            result_messages.append(f"Command: {line}")
         
         try:
-            # Handle function calls - like sentiment_on() or sentiment_off()
-            function_match = re.match(r'(\w+)\(\)', line)
-            if function_match:
-                function_name = function_match.group(1)
-                print(f"Found function call: {function_name}()")
-                
-                if handle_special_function(function_name, socketio=socketio):
-                    result_messages.append(f"Executed function: {function_name}()")
+            # Function calls like sentiment_on() also run in preview mode
+            if opcode == CALL:
+                # ...except cancel(), since previewing must not stop live scripts
+                if preview_mode and operand.lower() == 'cancel':
+                    result_messages.append("Preview mode - would cancel running scripts")
                     continue
+                if handle_special_function(operand, socketio=socketio):
+                    result_messages.append(f"Executed function: {operand}()")
                 else:
-                    print(f"Unknown function: {function_name}()")
-                    result_messages.append(f"WARNING: Unknown function: {function_name}()")
-                    continue
+                    print(f"Unknown function: {operand}()")
+                    result_messages.append(f"WARNING: Unknown function: {operand}()")
+                continue
             
             # Skip actual keyboard input if in preview mode
             if preview_mode:
                 result_messages.append("Preview mode - not actually executing")
                 continue
             
-            # Handle delay lines
-            if line.endswith('ms'):
-                delay_match = re.match(r'(\d+)ms', line)
-                if delay_match:
-                    delay = int(delay_match.group(1)) / 1000  # Convert ms to seconds
-                    print(f"Waiting for {delay} seconds")
-                    time.sleep(delay)
-                    continue
-            
-            if line.endswith('s'):
-                delay_match = re.match(r'(\d+)s', line)
-                if delay_match:
-                    delay = int(delay_match.group(1))
-                    print(f"Waiting for {delay} seconds")
-                    time.sleep(delay)
-                    continue
-            
-            # Handle typing lines
-            type_match = re.match(r'type\s+"([^"]*)"', line)
-            if type_match:
-                text = type_match.group(1)
-                print(f"Typing text: {text}")
-                keyboard.type(text)
+            if opcode == KEY:
+                press_and_release(operand, delays)
+            elif opcode == COMBO:
+                press_key_combination(operand, delays)
+            elif opcode == TYPE:
+                if DEBUG:
+                    print(f"Typing text: {operand}")
+                output.type(operand)
                 # Add a small delay after typing
-                time.sleep(0.2)
-                continue
-            
-            # Handle key combinations
-            if '+' in line:
-                print(f"Executing key combination: {line}")
-                keys = line.split('+')
-                parsed_keys = [parse_key(k.strip()) for k in keys]
-                press_key_combination(parsed_keys)
-                continue
-            
-            # Handle single key presses
-            key = parse_key(line)
-            print(f"Pressing single key: {line}")
-            press_and_release(key)
+                pause(delays['type_gap'])
+            elif opcode == DELAY:
+                if DEBUG:
+                    print(f"Waiting for {operand} seconds")
+                if cancel_event is not None:
+                    cancel_event.wait(operand)
+                else:
+                    time.sleep(operand)
             
         except Exception as e:
             error_msg = f"ERROR executing line '{line}': {str(e)}"
@@ -304,6 +305,10 @@ def execute_script(script, preview_mode=False, socketio=None):
             traceback.print_exc()
             result_messages.append(error_msg)
     
+    else:
+        if on_progress and not (cancel_event is not None and cancel_event.is_set()):
+            on_progress(len(program.ops))
+    
     # Return results for preview
     if preview_mode:
         return "\n".join(result_messages) 
\ No newline at end of file
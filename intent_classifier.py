@@ -0,0 +1,146 @@
+"""
+Local intent classification module for voice command application.
+"""
+import re
+import zlib
+import numpy as np
+
+# Vectorizer settings
+HASH_DIMENSIONS = 2 ** 11
+CHAR_NGRAM_SIZE = 3
+
+# Minimum score gap between the best and second best command for a confident match
+MIN_MARGIN = 0.1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def _features(text):
+    """Extract word, word bigram and character n-gram features from text."""
+    words = TOKEN_PATTERN.findall(text.lower())
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(
+            f"c:{padded[i:i + CHAR_NGRAM_SIZE]}"
+            for i in range(max(1, len(padded) - CHAR_NGRAM_SIZE + 1))
+        )
+    return features
+
+def _hash_counts(text):
+    """Return a dense vector of hashed feature counts."""
+    vector = np.zeros(HASH_DIMENSIONS, dtype=np.float32)
+    indices = [zlib.crc32(feature.encode('utf-8')) % HASH_DIMENSIONS for feature in _features(text)]
+    if indices:
+        np.add.at(vector, indices, 1.0)
+    return vector
+
+class IntentClassifier:
+    """TF-IDF classifier over the phrases of AI-enabled commands.
+
+    Every phrase is turned into a hashed bag of words and character n-grams
+    with TF-IDF weights. A transcript is scored against all phrases with a
+    single matrix-vector product, and each command takes the score of its
+    best phrase.
+    """
+
+    def __init__(self, commands):
+        """Build the classifier from commands with sentiment analysis enabled.
+
+        Args:
+            commands: List of command dicts as returned by db.get_commands()
+        """
+        self.commands = []
+        phrase_owners = []
+        counts = []
+
+        for cmd in commands:
+            if not cmd['understand_sentiment']:
+                continue
+            command_index = len(self.commands)
+            self.commands.append(cmd)
+            for phrase in cmd['phrases']:
+                if phrase.strip():
+                    phrase_owners.append(command_index)
+                    counts.append(_hash_counts(phrase))
+
+        self._phrase_owners = np.array(phrase_owners, dtype=np.int64)
+
+        if counts:
+            count_matrix = np.vstack(counts)
+            document_frequency = np.count_nonzero(count_matrix, axis=0)
+            self._idf = (np.log((1 + len(counts)) / (1 + document_frequency)) + 1).astype(np.float32)
+            self._matrix = self._weigh(count_matrix)
+        else:
+            self._idf = np.ones(HASH_DIMENSIONS, dtype=np.float32)
+            self._matrix = np.zeros((0, HASH_DIMENSIONS), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def _weigh(self, counts):
+        """Apply sublinear TF, IDF and L2 normalization to count rows."""
+        weights = np.log1p(counts) * self._idf
+        norms = np.linalg.norm(weights, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return weights / norms
+
+    def rank(self, text, top_k=None):
+        """Score commands against the text.
+
+        Args:
+            text: Transcript to classify
+            top_k: Only return the best k commands, or all if None
+
+        Returns:
+            List of (command, score) tuples, best first
+        """
+        if not text or not self.commands:
+            return []
+
+        query = self._weigh(_hash_counts(text))
+        # The query is sparse, so only the columns of its features matter
+        features = np.flatnonzero(query)
+        phrase_scores = self._matrix[:, features] @ query[features]
+
+        command_scores = np.zeros(len(self.commands), dtype=np.float32)
+        np.maximum.at(command_scores, self._phrase_owners, phrase_scores)
+
+        if top_k is not None and top_k < len(command_scores):
+            order = np.argpartition(-command_scores, top_k - 1)[:top_k]
+            order = order[np.argsort(-command_scores[order])]
+        else:
+            order = np.argsort(-command_scores)
+        return [(self.commands[i], float(command_scores[i])) for i in order]
+
+    def classify(self, text, threshold):
+        """Return the command the text confidently refers to.
+
+        A match is confident when its score reaches the threshold and beats
+        the runner-up by at least MIN_MARGIN. Anything else is ambiguous and
+        should be escalated.
+
+        Args:
+            text: Transcript to classify
+            threshold: Minimum cosine similarity (0-1) for a confident match
+
+        Returns:
+            Tuple of (command, score), with command None if not confident
+        """
+        ranking = self.rank(text, top_k=2)
+        if not ranking:
+            return None, 0.0
+
+        best_command, best_score = ranking[0]
+        runner_up = ranking[1][1] if len(ranking) > 1 else 0.0
+        if best_score >= threshold and best_score - runner_up >= MIN_MARGIN:
+            return best_command, best_score
+        return None, best_score
+
+def best_phrase(command, text):
+    """Pick the command phrase sharing the most words with the text."""
+    words = set(TOKEN_PATTERN.findall(text.lower()))
+    return max(
+        command['phrases'],
+        key=lambda phrase: len(words & set(TOKEN_PATTERN.findall(phrase.lower())))
+    )
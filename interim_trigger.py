@@ -0,0 +1,110 @@
+"""
+Interim hypothesis command triggering module for voice command application.
+"""
+
+# Consecutive chunks an interim hypothesis must stay unchanged before its command fires
+STABLE_CHUNKS = 3
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+class InterimTrigger:
+    """Fire commands from a streaming recognizer's interim hypotheses.
+
+    Attached to the continuous capture as a phrase listener, it feeds every
+    chunk of a phrase to the backend's stream and checks the hypothesis
+    against the phrase matcher. A command fires as soon as the whole
+    hypothesis is exactly one of its phrases and has stayed the same for
+    STABLE_CHUNKS chunks, well before the pause that ends the phrase.
+    Each command fires at most once per phrase, and the ids that fired are
+    returned to the segmenter so the final transcript doesn't fire them again.
+    """
+
+    def __init__(self, get_backend, get_matcher, on_command, is_enabled=lambda: True):
+        """Create the trigger.
+
+        Args:
+            get_backend: Callable returning the current RecognizerBackend
+            get_matcher: Callable returning the current PhraseMatcher
+            on_command: Callable(entry, hypothesis) run when a command fires
+            is_enabled: Callable telling whether interim triggering is on
+        """
+        self.get_backend = get_backend
+        self.get_matcher = get_matcher
+        self.on_command = on_command
+        self.is_enabled = is_enabled
+        self._stream = None
+        self._fired = set()
+        self._candidate = None
+        self._stable_count = 0
+        self.fired_count = 0
+
+    def on_phrase_start(self, sample_rate, chunks):
+        """Start streaming a phrase, beginning with the chunks before its onset."""
+        self._reset()
+        backend = self.get_backend()
+        if not self.is_enabled() or not backend.supports_streaming:
+            return
+
+        try:
+            self._stream = backend.start_stream(sample_rate)
+        except Exception as e:
+            print(f"Error starting interim recognition: {e}")
+            return
+        for chunk in chunks:
+            self.on_phrase_chunk(chunk)
+
+    def on_phrase_chunk(self, chunk):
+        """Feed one chunk and fire the matched command once it is stable."""
+        if self._stream is None:
+            return
+
+        try:
+            hypothesis = self._stream.accept(chunk.tobytes())
+        except Exception as e:
+            print(f"Error in interim recognition: {e}")
+            self._stream = None
+            return
+
+        entry = self._whole_match(hypothesis) if hypothesis else None
+
+        candidate = (entry.command_id, _normalize(hypothesis)) if entry else None
+        if candidate != self._candidate:
+            self._candidate = candidate
+            self._stable_count = 1 if candidate else 0
+            return
+
+        if candidate is None:
+            return
+        self._stable_count += 1
+        if self._stable_count >= STABLE_CHUNKS and entry.command_id not in self._fired:
+            self._fired.add(entry.command_id)
+            self.fired_count += 1
+            print(f"INTERIM MATCH FOUND: '{entry.phrase}' from hypothesis '{hypothesis}'")
+            self.on_command(entry, hypothesis)
+
+    def _whole_match(self, hypothesis):
+        """Highest priority phrase spanning the whole hypothesis; partial overlaps aren't confident enough."""
+        matcher = self.get_matcher()
+        text = _normalize(matcher.key(hypothesis))
+        best = None
+        for match in matcher.find_all(text):
+            if _normalize(matcher.key(match.entry.phrase)) == text and (best is None or match.entry.priority < best.priority):
+                best = match.entry
+        return best
+
+    def on_phrase_end(self):
+        """Finish the phrase.
+
+        Returns:
+            Set of command ids that already fired during the phrase
+        """
+        fired = self._fired
+        self._reset()
+        return fired
+
+    def _reset(self):
+        self._stream = None
+        self._fired = set()
+        self._candidate = None
+        self._stable_count = 0
@@ -0,0 +1,167 @@
+"""
+OpenAI HTTP client module for voice command application.
+"""
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+POOL_SIZE = 4
+
+# Time spent opening a connection during the current request, per thread
+_connect_timing = threading.local()
+
+class _TimedConnectionMixin:
+    """Record how long establishing a connection (DNS, TCP and TLS) takes."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _connect_timing.seconds = getattr(_connect_timing, 'seconds', 0.0) + time.perf_counter() - start
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter whose pooled connections report their connect time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+class OpenAIClient:
+    """Long-lived keep-alive HTTP client for OpenAI-compatible chat completions.
+
+    Connections are pooled and reused across requests, so only the first
+    request (or the warm-up) pays for DNS, TCP connect and the TLS handshake.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL):
+        """Create the client.
+
+        Args:
+            base_url: API base URL, e.g. https://api.openai.com/v1 or a local
+                OpenAI-compatible server
+        """
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.new_connection_count = 0
+        self.last_timings = None
+
+    @property
+    def chat_completions_url(self):
+        return f"{self.base_url}/chat/completions"
+
+    def _record(self, timings):
+        """Store timings of a finished request."""
+        with self._lock:
+            self.request_count += 1
+            if timings['connectMs'] > 0:
+                self.new_connection_count += 1
+            self.last_timings = timings
+
+    def chat_completion(self, api_key, payload, timeout=5, stream=False):
+        """POST a chat completion request over the pooled session.
+
+        Args:
+            api_key: OpenAI API key
+            payload: Request body as a dict
+            timeout: Seconds before the request times out
+            stream: Return the response without reading the body
+
+        Returns:
+            Tuple of (response, timings dict with connectMs, responseMs and totalMs)
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+
+        _connect_timing.seconds = 0.0
+        start = time.perf_counter()
+        response = self.session.post(
+            self.chat_completions_url,
+            headers=headers,
+            data=json.dumps(payload),
+            timeout=timeout,
+            stream=stream
+        )
+        timings = {
+            'connectMs': round(_connect_timing.seconds * 1000, 1),
+            'responseMs': round(response.elapsed.total_seconds() * 1000, 1),
+            'totalMs': round((time.perf_counter() - start) * 1000, 1)
+        }
+        self._record(timings)
+        print(f"OpenAI request timings: connect {timings['connectMs']}ms, "
+              f"response {timings['responseMs']}ms, total {timings['totalMs']}ms")
+        return response, timings
+
+    def warm_up(self):
+        """Open a pooled connection in the background so the next request can reuse it."""
+        def _warm_up():
+            try:
+                _connect_timing.seconds = 0.0
+                self.session.head(self.base_url, timeout=5)
+                print(f"OpenAI connection pre-warmed in {_connect_timing.seconds * 1000:.1f}ms")
+            except Exception as e:
+                print(f"Error pre-warming OpenAI connection: {e}")
+
+        thread = threading.Thread(target=_warm_up)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def get_stats(self):
+        """Get request counts and the timings of the last request."""
+        with self._lock:
+            return {
+                'baseUrl': self.base_url,
+                'requests': self.request_count,
+                'newConnections': self.new_connection_count,
+                'lastTimings': self.last_timings
+            }
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+def iter_stream_content(response):
+    """Yield the content deltas of a streamed chat completion (server-sent events)."""
+    # Server-sent events are always UTF-8; requests would fall back to
+    # ISO-8859-1 for a text/event-stream response without a charset. Lines are
+    # decoded incrementally, so a character split across chunks is reassembled.
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            break
+        choices = json.loads(payload).get('choices') or []
+        if choices:
+            content = (choices[0].get('delta') or {}).get('content')
+            if content:
+                yield content
@@ -0,0 +1,135 @@
+"""
+Keyboard output backend module for voice command application.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# Key names scripts can use for non-character keys, as pynput.keyboard.Key attributes
+SPECIAL_KEY_NAMES = (
+    'enter', 'space', 'tab', 'esc', 'backspace', 'delete', 'shift', 'ctrl', 'alt', 'cmd',
+    'up', 'down', 'left', 'right', 'home', 'end', 'page_up', 'page_down',
+    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
+)
+
+class OutputBackend(ABC):
+    """Interface of a keyboard output backend.
+
+    Scripts are compiled to key names (SPECIAL_KEY_NAMES or single
+    characters); a backend resolves each name once to whatever it sends
+    and then receives press, release and type calls with the resolved keys.
+    """
+
+    name = None
+
+    def resolve_key(self, key_name):
+        """Resolve a key name to the key object passed to press and release."""
+        return key_name
+
+    @abstractmethod
+    def press(self, key):
+        pass
+
+    @abstractmethod
+    def release(self, key):
+        pass
+
+    @abstractmethod
+    def type(self, text):
+        pass
+
+    def close(self):
+        """Release any resources held by the backend."""
+        pass
+
+class PynputBackend(OutputBackend):
+    """Sends key events to the desktop through pynput.
+
+    pynput is imported when the backend is created, since on Linux it needs
+    a display as soon as it is imported.
+    """
+
+    name = 'pynput'
+
+    def __init__(self):
+        from pynput.keyboard import Key, Controller
+        self._controller = Controller()
+        self._keys = {key_name: getattr(Key, key_name) for key_name in SPECIAL_KEY_NAMES}
+
+    def resolve_key(self, key_name):
+        return self._keys.get(key_name, key_name)
+
+    def press(self, key):
+        self._controller.press(key)
+
+    def release(self, key):
+        self._controller.release(key)
+
+    def type(self, text):
+        self._controller.type(text)
+
+class RecordingBackend(OutputBackend):
+    """Records every key event with a time.perf_counter() timestamp instead of sending it.
+
+    Keys stay plain names, so the recorded stream can be compared with the
+    script that produced it.
+    """
+
+    name = 'recording'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = []
+
+    def press(self, key):
+        with self._lock:
+            self.events.append((time.perf_counter(), 'press', key))
+
+    def release(self, key):
+        with self._lock:
+            self.events.append((time.perf_counter(), 'release', key))
+
+    def type(self, text):
+        with self._lock:
+            self.events.append((time.perf_counter(), 'type', text))
+
+    def get_events(self):
+        """Get a copy of the recorded (timestamp, action, key) events."""
+        with self._lock:
+            return list(self.events)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+class NullBackend(OutputBackend):
+    """Discards every key event, for replay runs and benchmarks."""
+
+    name = 'null'
+
+    def press(self, key):
+        pass
+
+    def release(self, key):
+        pass
+
+    def type(self, text):
+        pass
+
+OUTPUT_BACKENDS = {
+    backend.name: backend
+    for backend in (PynputBackend, RecordingBackend, NullBackend)
+}
+
+def create_output_backend(name):
+    """Create a keyboard output backend by name.
+
+    Args:
+        name: One of OUTPUT_BACKENDS
+
+    Returns:
+        OutputBackend instance
+    """
+    if name not in OUTPUT_BACKENDS:
+        raise ValueError(f"Unknown output backend: {name}")
+    return OUTPUT_BACKENDS[name]()
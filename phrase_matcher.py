@@ -0,0 +1,335 @@
+"""
+Phrase matching module for voice command application.
+"""
+from bisect import bisect_left
+from collections import deque, namedtuple
+from difflib import SequenceMatcher
+
+# A single command phrase compiled into the matcher
+PhraseEntry = namedtuple(
+    'PhraseEntry',
+    ['command_id', 'phrase', 'script', 'partial_match', 'priority', 'fuzzy_threshold'],
+    defaults=(None,)
+)
+
+# An occurrence of a phrase in a transcript
+PhraseMatch = namedtuple('PhraseMatch', ['start', 'end', 'entry'])
+
+class PhraseMatcher:
+    """Aho-Corasick automaton compiled from every command phrase.
+
+    The automaton is built once from the command set and finds every phrase
+    occurrence in a single pass over the transcript, so matching cost no
+    longer grows with the number of phrases.
+
+    Phrases and transcripts are compared by their key(): lowercased by
+    default, or passed through the given normalize function, e.g. to match
+    the punctuation-free text a grammar-constrained decoder returns.
+    """
+
+    def __init__(self, commands, normalize=None):
+        """Compile the matcher from a list of commands.
+
+        Args:
+            commands: List of command dicts as returned by db.get_commands()
+            normalize: Optional function mapping phrases and transcripts to match keys
+        """
+        self._normalize = normalize
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self.entries = []
+
+        for cmd in commands:
+            for phrase in cmd['phrases']:
+                phrase_key = self.key(phrase)
+                # An empty phrase would match every transcript
+                if not phrase_key:
+                    continue
+                entry = PhraseEntry(
+                    cmd['id'],
+                    phrase,
+                    cmd['script'],
+                    bool(cmd.get('partial_match')),
+                    len(self.entries),
+                    cmd.get('fuzzy_threshold')
+                )
+                self.entries.append(entry)
+                self._insert(phrase_key, entry)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, text):
+        """Return the form of a phrase or transcript the matcher compares."""
+        if self._normalize is not None:
+            return self._normalize(text)
+        return text.lower()
+
+    def _insert(self, phrase, entry):
+        """Add a phrase key to the trie."""
+        node = 0
+        for char in phrase:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].append((len(phrase), entry))
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque()
+        for next_node in self._goto[0].values():
+            queue.append(next_node)
+
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                if self._fail[next_node] == next_node:
+                    self._fail[next_node] = 0
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+
+    def find_all(self, text):
+        """Find every phrase occurrence in the text.
+
+        Args:
+            text: Transcript to scan
+
+        Returns:
+            List of PhraseMatch tuples in the order they end in the text;
+            start and end index into key(text)
+        """
+        matches = []
+        if not text or not self.entries:
+            return matches
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for index, char in enumerate(self.key(text)):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, entry in output[node]:
+                end = index + 1
+                matches.append(PhraseMatch(end - length, end, entry))
+        return matches
+
+    def best_match(self, text, partial_only=False, matches=None):
+        """Return the highest priority phrase found in the text.
+
+        Priority follows command order, so the result is the same phrase a
+        linear scan over the commands would have found first.
+
+        Args:
+            text: Transcript to scan
+            partial_only: Only consider commands with partial matching enabled
+            matches: Result of a previous find_all() call to reuse
+
+        Returns:
+            PhraseEntry or None if no phrase occurs in the text
+        """
+        if matches is None:
+            matches = self.find_all(text)
+
+        best = None
+        for match in matches:
+            if partial_only and not match.entry.partial_match:
+                continue
+            if best is None or match.entry.priority < best.priority:
+                best = match.entry
+        return best
+
+# Fuzzy matching tuning
+NGRAM_SIZE = 3
+MIN_NGRAM_OVERLAP = 0.3  # Fraction of a phrase's n-grams the text must share
+MAX_FUZZY_CANDIDATES = 20
+# Phrases shorter than this only match exactly: one misheard letter in a short
+# word still leaves a high similarity ('top' scores 0.86 against 'stop')
+MIN_FUZZY_PHRASE_LENGTH = 6
+
+def _ngrams(text):
+    """Return the set of padded character n-grams of a lowercased string."""
+    padded = f" {' '.join(text.lower().split())} "
+    if len(padded) < NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+class FuzzyPhraseIndex:
+    """Character n-gram index for approximate phrase matching.
+
+    Candidate phrases are looked up through an inverted n-gram index, so only
+    phrases sharing enough n-grams with the transcript are scored. Candidates
+    are then scored against every word window of the transcript with the
+    same number of words as the phrase.
+
+    A score is the difflib similarity ratio of the phrase and the window:
+    twice the number of matching characters divided by their total length.
+    A phrase matches when its best score reaches the threshold, so 0.9
+    tolerates about one wrong character in every ten. Phrases shorter than
+    MIN_FUZZY_PHRASE_LENGTH characters are left out of the index.
+    """
+
+    def __init__(self, entries):
+        """Build the index from compiled phrase entries.
+
+        Args:
+            entries: List of PhraseEntry, typically PhraseMatcher.entries
+        """
+        self.entries = []
+        self._ngram_counts = []
+        self._postings = {}
+
+        for entry in entries:
+            # A threshold of 1 or more disables fuzzy matching for the command
+            if entry.fuzzy_threshold is not None and entry.fuzzy_threshold >= 1:
+                continue
+            if len(' '.join(entry.phrase.split())) < MIN_FUZZY_PHRASE_LENGTH:
+                continue
+            index = len(self.entries)
+            ngrams = _ngrams(entry.phrase)
+            self.entries.append(entry)
+            self._ngram_counts.append(len(ngrams))
+            for ngram in ngrams:
+                self._postings.setdefault(ngram, []).append(index)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def candidates(self, text):
+        """Return indices of entries sharing enough n-grams with the text."""
+        overlap = {}
+        for ngram in _ngrams(text):
+            for index in self._postings.get(ngram, ()):
+                overlap[index] = overlap.get(index, 0) + 1
+
+        scored = [
+            (count / self._ngram_counts[index], index)
+            for index, count in overlap.items()
+            if count >= self._ngram_counts[index] * MIN_NGRAM_OVERLAP
+        ]
+        scored.sort(reverse=True)
+        return [index for _, index in scored[:MAX_FUZZY_CANDIDATES]]
+
+    def best_match(self, text, default_threshold):
+        """Find the phrase most similar to some part of the text.
+
+        Args:
+            text: Transcript to match
+            default_threshold: Similarity (0-1) required for commands without their own threshold
+
+        Returns:
+            Tuple of (PhraseEntry, similarity) or (None, 0.0) if nothing is similar enough
+        """
+        if not text or not self.entries:
+            return None, 0.0
+
+        words = text.lower().split()
+        best_entry = None
+        best_score = 0.0
+
+        for index in self.candidates(text):
+            entry = self.entries[index]
+            threshold = entry.fuzzy_threshold if entry.fuzzy_threshold is not None else default_threshold
+            phrase = ' '.join(entry.phrase.lower().split())
+            score = _window_similarity(phrase, words)
+            if score < threshold:
+                continue
+            if score > best_score or (score == best_score and entry.priority < best_entry.priority):
+                best_entry = entry
+                best_score = score
+
+        return best_entry, best_score
+
+def _window_similarity(phrase, words):
+    """Best similarity between the phrase and any word window of the text."""
+    size = len(phrase.split())
+    best = 0.0
+    matcher = SequenceMatcher(autojunk=False)
+    matcher.set_seq2(phrase)
+    # Allow one word more or less to absorb split or merged words
+    for window in (size, size - 1, size + 1):
+        if window < 1 or window > len(words):
+            continue
+        for start in range(len(words) - window + 1):
+            matcher.set_seq1(' '.join(words[start:start + window]))
+            if matcher.real_quick_ratio() <= best or matcher.quick_ratio() <= best:
+                continue
+            best = max(best, matcher.ratio())
+    return best
+
+# Prefix models sometimes put in front of the phrase they pick
+REPLY_PREFIX = 'command:'
+
+def _normalize_reply(text):
+    """Normalize a (partial) model reply, or return None while it is still inconclusive."""
+    reply = text.strip().strip('"\'').lower()
+    if REPLY_PREFIX.startswith(reply):
+        return None
+    if reply.startswith(REPLY_PREFIX):
+        reply = reply[len(REPLY_PREFIX):].strip()
+    reply = ' '.join(reply.rstrip('.!').split())
+    return reply or None
+
+class StreamingPhraseResolver:
+    """Resolve a streamed model reply to a phrase as soon as it is unambiguous.
+
+    Reply tokens are fed in as they arrive. Once only one valid phrase still
+    starts with the reply so far, that phrase is the answer and the rest of
+    the stream can be dropped. If no phrase can match anymore, the reply is
+    resolved as unmatched.
+    """
+
+    def __init__(self, phrases):
+        """Create a resolver over the valid replies.
+
+        Args:
+            phrases: Every phrase the model may answer with, including sentinels like NO_MATCH
+        """
+        self._choices = {}
+        for phrase in phrases:
+            key = ' '.join(phrase.lower().split())
+            if key:
+                self._choices.setdefault(key, phrase)
+        self._keys = sorted(self._choices)
+        self.text = ''
+
+    def feed(self, delta):
+        """Add streamed text.
+
+        Args:
+            delta: Next piece of the model's reply
+
+        Returns:
+            Tuple of (resolved, phrase). phrase is None when resolved without a match.
+        """
+        self.text += delta
+        reply = _normalize_reply(self.text)
+        if reply is None:
+            return False, None
+
+        start = bisect_left(self._keys, reply)
+        end = bisect_left(self._keys, reply + '\uffff')
+        if end - start == 1:
+            return True, self._choices[self._keys[start]]
+        if end == start:
+            # Nothing extends the reply, but it may already be a complete phrase
+            return True, self._choices.get(reply)
+        return False, None
+
+    def finish(self):
+        """Resolve the complete reply once the stream has ended."""
+        reply = _normalize_reply(self.text)
+        return self._choices.get(reply) if reply else None
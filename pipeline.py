@@ -0,0 +1,182 @@
+"""
+Staged processing pipeline module for voice command application.
+"""
+import queue
+import threading
+import time
+import traceback
+
+# Queue policies when a stage's inbox is full
+BLOCK = 'block'              # Wait for space (backpressure on the previous stage)
+DROP_OLDEST = 'drop_oldest'  # Discard the oldest queued item to make room
+DROP_NEWEST = 'drop_newest'  # Discard the item being added
+
+class StageQueue:
+    """Bounded queue between two pipeline stages with an overflow policy."""
+
+    def __init__(self, name, maxsize, policy=BLOCK):
+        """Create the queue.
+
+        Args:
+            name: Name used in logs and stats
+            maxsize: Maximum number of queued items
+            policy: BLOCK, DROP_OLDEST or DROP_NEWEST
+        """
+        if policy not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.name = name
+        self.policy = policy
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item, is_running):
+        """Add an item according to the overflow policy.
+
+        Args:
+            item: Item to add
+            is_running: Callable telling a blocked put whether to keep waiting
+
+        Returns:
+            True if the item was queued
+        """
+        if self.policy == BLOCK:
+            while is_running():
+                try:
+                    self._queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    print(f"Pipeline queue '{self.name}' full, dropped the newest item")
+                    return False
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    print(f"Pipeline queue '{self.name}' full, dropped the oldest item")
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Take the next item, or return None after the timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_stats(self):
+        return {
+            'size': self._queue.qsize(),
+            'maxSize': self._queue.maxsize,
+            'policy': self.policy,
+            'dropped': self.dropped
+        }
+
+class Pipeline:
+    """Chain of stages, each running on its own worker thread.
+
+    The first stage is a source called repeatedly without input; every other
+    stage takes items from the queue in front of it. A stage returning None
+    produces nothing for the next stage. Stages run concurrently, so e.g.
+    recognition of one phrase overlaps capture of the next.
+    """
+
+    def __init__(self, name='pipeline'):
+        self.name = name
+        self._stages = []
+        self._threads = []
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def add_stage(self, name, func, maxsize=None, policy=BLOCK):
+        """Append a stage.
+
+        Args:
+            name: Stage name used in logs, thread names and stats
+            func: Callable taking the previous stage's output (no argument
+                for the first stage) and returning the output for the next
+            maxsize: Size of the queue in front of the stage (not used for
+                the first stage)
+            policy: Overflow policy of that queue
+
+        Returns:
+            The pipeline, for chaining
+        """
+        inbox = StageQueue(name, maxsize, policy) if self._stages else None
+        self._stages.append({'name': name, 'func': func, 'inbox': inbox, 'processed': 0, 'errors': 0})
+        return self
+
+    def start(self):
+        """Start one worker thread per stage."""
+        self._running = True
+        for index, stage in enumerate(self._stages):
+            outbox = self._stages[index + 1]['inbox'] if index + 1 < len(self._stages) else None
+            thread = threading.Thread(
+                target=self._run_stage, args=(stage, outbox), name=f"{self.name}-{stage['name']}"
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _run_stage(self, stage, outbox):
+        """Worker loop of one stage."""
+        inbox = stage['inbox']
+        while self._running:
+            try:
+                if inbox is None:
+                    result = stage['func']()
+                else:
+                    item = inbox.get(timeout=0.5)
+                    if item is None:
+                        continue
+                    result = stage['func'](item)
+                stage['processed'] += 1
+            except Exception as e:
+                stage['errors'] += 1
+                print(f"Error in pipeline stage '{stage['name']}': {e}")
+                traceback.print_exc()
+                time.sleep(1)  # Prevent tight loop on recurring errors
+                continue
+
+            if result is not None and outbox is not None:
+                outbox.put(result, lambda: self._running)
+
+    def submit(self, stage_name, item):
+        """Queue an item directly for a stage, bypassing the stages before it.
+
+        Returns:
+            True if the item was queued
+        """
+        for stage in self._stages:
+            if stage['name'] == stage_name and stage['inbox'] is not None:
+                return stage['inbox'].put(item, lambda: self._running)
+        raise ValueError(f"Unknown pipeline stage: {stage_name}")
+
+    def stop(self, timeout=2):
+        """Stop the workers and wait briefly for them to finish their current item."""
+        self._running = False
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+        self._threads = []
+
+    def get_stats(self):
+        """Get per-stage counters and queue depths."""
+        return {
+            stage['name']: {
+                'processed': stage['processed'],
+                'errors': stage['errors'],
+                'queue': stage['inbox'].get_stats() if stage['inbox'] else None
+            }
+            for stage in self._stages
+        }
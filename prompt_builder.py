@@ -0,0 +1,123 @@
+"""
+Sentiment analysis prompt builder module for voice command application.
+"""
+from decision_cache import command_fingerprint
+
+# Largest catalog sent as-is; bigger ones are pre-filtered to this many candidates
+MAX_PROMPT_COMMANDS = 25
+
+# Reply the model gives when no command fits
+NO_MATCH = "NO_MATCH"
+
+SYSTEM_PROMPT = (
+    "You determine which predefined command best matches a user's voice input. "
+    "Respond only with the id of the command that matches best."
+)
+
+def _normalize_reply(reply):
+    """Strip quotes, punctuation and a leading 'Command:' from a model reply."""
+    reply = reply.strip().strip('"\'.! ')
+    if reply.lower().startswith('command:'):
+        reply = reply[len('command:'):].strip('"\'.! ')
+    return ' '.join(reply.split()).lower()
+
+class PromptBuilder:
+    """Cached, compact command catalog for sentiment analysis prompts.
+
+    Each AI-enabled command is rendered once as a short id followed by its
+    phrases, without the script body. The model replies with the id, which
+    maps straight back to the command. Build a new instance when the
+    commands change.
+    """
+
+    def __init__(self, commands):
+        """Render the catalog for the commands with sentiment analysis enabled.
+
+        Args:
+            commands: List of command dicts as returned by db.get_commands()
+        """
+        self.commands = [cmd for cmd in commands if cmd['understand_sentiment']]
+        self.fingerprint = command_fingerprint(self.commands)
+        self._lines = {}
+        self._by_token = {}
+        self._by_phrase = {}
+
+        for cmd in self.commands:
+            token = self.token(cmd)
+            self._lines[cmd['id']] = f"{token}: {' | '.join(cmd['phrases'])}"
+            self._by_token[token] = cmd
+            for phrase in cmd['phrases']:
+                self._by_phrase.setdefault(' '.join(phrase.lower().split()), cmd)
+
+        self.catalog = "\n".join(self._lines.values())
+
+    def __len__(self):
+        return len(self.commands)
+
+    @staticmethod
+    def token(cmd):
+        """Short id the model uses to refer to a command."""
+        return f"c{cmd['id']}"
+
+    def select(self, text, classifier, top_k=MAX_PROMPT_COMMANDS):
+        """Pick the commands to send for this utterance.
+
+        Args:
+            text: The utterance
+            classifier: IntentClassifier used to rank large catalogs
+            top_k: Maximum number of commands to send
+
+        Returns:
+            List of candidate commands
+        """
+        if len(self.commands) <= top_k:
+            return self.commands
+        return [cmd for cmd, _ in classifier.rank(text, top_k=top_k)]
+
+    def render(self, candidates):
+        """Render the catalog lines for the candidate commands."""
+        if candidates is self.commands:
+            return self.catalog
+        return "\n".join(self._lines[cmd['id']] for cmd in candidates)
+
+    def build_messages(self, text, candidates):
+        """Build the chat messages asking the model to pick a candidate."""
+        prompt = f"""
+A user said: "{text}"
+
+Available commands (id: phrases):
+{self.render(candidates)}
+
+Which command best matches what the user said? Respond with ONLY the id of that command (for example c12), nothing else. If there's no good match, respond with "{NO_MATCH}".
+"""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def replies(self, candidates):
+        """Every valid reply for the candidates, for streaming resolution.
+
+        Holds each candidate's id and, since resolve() accepts them too, its
+        phrases, so a model that answers with a phrase isn't cut off as unmatched.
+        """
+        replies = [self.token(cmd) for cmd in candidates]
+        replies += [phrase for cmd in candidates for phrase in cmd['phrases']]
+        return replies + [NO_MATCH]
+
+    def resolve(self, reply):
+        """Map a model reply back to a command.
+
+        Accepts the command id and, as a fallback, one of its phrases.
+
+        Returns:
+            The command dict, or None for NO_MATCH and unknown replies
+        """
+        reply = _normalize_reply(reply)
+        if not reply or reply == NO_MATCH.lower():
+            return None
+        return self._by_token.get(reply) or self._by_phrase.get(reply)
+
+    def is_no_match(self, reply):
+        """Whether a model reply explicitly says no command fits."""
+        return bool(reply) and _normalize_reply(reply) == NO_MATCH.lower()
@@ -763,6 +763,20 @@ document.addEventListener('alpine:init', () => {
                     }
                 });
 
+                // Listen for setting changes pushed by the server
+                this.socket.on('settings_changed', (data) => {
+                    console.log('Setting changed:', data);
+                    if (data.key === 'active') {
+                        this.isActive = data.value;
+                    } else if (data.key === 'global_shortcut_key') {
+                        this.shortcutKey = data.value;
+                    } else if (data.key === 'ai_timeout_enabled') {
+                        this.aiTimeout.enabled = data.value;
+                    } else if (data.key === 'ai_timeout_seconds') {
+                        this.aiTimeout.seconds = data.value;
+                    }
+                });
+
                 this.socket.on('disconnect', () => {
                     console.log('Disconnected from WebSocket server');
                 });
@@ -0,0 +1,193 @@
+"""
+Script compiler module for voice command application.
+"""
+import re
+import threading
+
+# Op codes of compiled scripts
+KEY = 'key'        # Press and release one key
+COMBO = 'combo'    # Press keys in order, release them in reverse
+TYPE = 'type'      # Type a string
+DELAY = 'delay'    # Sleep for a number of seconds
+CALL = 'call'      # Run a special function such as scripts_on()
+
+# Key names usable in scripts and the output backend key names they stand for
+SPECIAL_KEYS = {
+    'enter': 'enter',
+    'space': 'space',
+    'tab': 'tab',
+    'escape': 'esc',
+    'esc': 'esc',
+    'backspace': 'backspace',
+    'delete': 'delete',
+    'shift': 'shift',
+    'ctrl': 'ctrl',
+    'control': 'ctrl',
+    'alt': 'alt',
+    'win': 'cmd',
+    'windows': 'cmd',
+    'cmd': 'cmd',
+    'command': 'cmd',
+    'up': 'up',
+    'down': 'down',
+    'left': 'left',
+    'right': 'right',
+    'home': 'home',
+    'end': 'end',
+    'page_up': 'page_up',
+    'page_down': 'page_down',
+    'f1': 'f1',
+    'f2': 'f2',
+    'f3': 'f3',
+    'f4': 'f4',
+    'f5': 'f5',
+    'f6': 'f6',
+    'f7': 'f7',
+    'f8': 'f8',
+    'f9': 'f9',
+    'f10': 'f10',
+    'f11': 'f11',
+    'f12': 'f12',
+}
+
+FUNCTION_PATTERN = re.compile(r'(\w+)\(\)')
+MS_DELAY_PATTERN = re.compile(r'(\d+)ms')
+S_DELAY_PATTERN = re.compile(r'(\d+)s')
+TYPE_PATTERN = re.compile(r'type\s+"([^"]*)"')
+
+def strip_comments(line):
+    """Strip comments from a line of script."""
+    # Remove line comments (starting with --)
+    if line.startswith('--'):
+        return ''
+
+    # Remove inline comments (after #)
+    if '#' in line:
+        line = line.split('#', 1)[0]
+
+    return line.strip()
+
+def resolve_key(key_name):
+    """Resolve a script key name to an output backend key name, or the character itself for other keys."""
+    key = SPECIAL_KEYS.get(key_name.lower())
+    if key is not None:
+        return key
+
+    # If not recognized, log warning and try as a regular character
+    if len(key_name) != 1:
+        print(f"WARNING: Unrecognized key '{key_name}', treating as regular text")
+    return key_name
+
+def compile_line(line):
+    """Compile one comment-free script line to an (opcode, operand, line) op."""
+    function_match = FUNCTION_PATTERN.match(line)
+    if function_match:
+        return (CALL, function_match.group(1), line)
+
+    if line.endswith('ms'):
+        delay_match = MS_DELAY_PATTERN.match(line)
+        if delay_match:
+            return (DELAY, int(delay_match.group(1)) / 1000, line)
+
+    if line.endswith('s'):
+        delay_match = S_DELAY_PATTERN.match(line)
+        if delay_match:
+            return (DELAY, int(delay_match.group(1)), line)
+
+    type_match = TYPE_PATTERN.match(line)
+    if type_match:
+        return (TYPE, type_match.group(1), line)
+
+    if '+' in line:
+        return (COMBO, tuple(resolve_key(k.strip()) for k in line.split('+')), line)
+
+    return (KEY, resolve_key(line), line)
+
+class CompiledScript:
+    """A script parsed once into a list of ops with key names already resolved.
+
+    ops_for() binds the key names to an output backend's key objects once,
+    so running the script again on the same backend does no lookups at all.
+    """
+
+    def __init__(self, source, ops):
+        self.source = source
+        self.ops = ops
+        # Names of the special functions the script calls
+        self.functions = frozenset(operand.lower() for opcode, operand, _ in ops if opcode == CALL)
+        self._bound = None
+
+    def __len__(self):
+        return len(self.ops)
+
+    def ops_for(self, backend):
+        """Get the ops with keys resolved by an OutputBackend."""
+        bound = self._bound
+        if bound is None or bound[0] is not backend:
+            ops = []
+            for opcode, operand, line in self.ops:
+                if opcode == KEY:
+                    operand = backend.resolve_key(operand)
+                elif opcode == COMBO:
+                    operand = tuple(backend.resolve_key(key) for key in operand)
+                ops.append((opcode, operand, line))
+            self._bound = bound = (backend, ops)
+        return bound[1]
+
+def compile_script(script):
+    """Compile a keyboard script.
+
+    Args:
+        script: Script source, one command per line
+
+    Returns:
+        CompiledScript
+    """
+    ops = []
+    for line in (script or '').strip().split('\n'):
+        line = strip_comments(line)
+        if line:
+            ops.append(compile_line(line))
+    return CompiledScript(script or '', ops)
+
+class ScriptCache:
+    """Compiled scripts of the commands, keyed by command id.
+
+    Entries are dropped when their command changes, and an entry whose
+    source no longer matches the script asked for is recompiled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scripts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, command_id, script):
+        """Get the compiled form of a command's script, compiling it on first use."""
+        with self._lock:
+            compiled = self._scripts.get(command_id)
+            if compiled is not None and compiled.source == script:
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = compile_script(script)
+        with self._lock:
+            self._scripts[command_id] = compiled
+        return compiled
+
+    def invalidate(self, command_id=None):
+        """Drop one command's compiled script, or all of them if command_id is None."""
+        with self._lock:
+            if command_id is None:
+                self._scripts.clear()
+            else:
+                self._scripts.pop(command_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            return {'size': len(self._scripts), 'hits': self.hits, 'misses': self.misses}
+
+# Global compiled script cache instance
+script_cache = ScriptCache()
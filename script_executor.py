@@ -0,0 +1,296 @@
+"""
+Asynchronous script executor module for voice command application.
+"""
+import itertools
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+
+from input_simulation import execute_script
+from script_compiler import CompiledScript, compile_script
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+DROPPED = 'dropped'
+
+# Jobs waiting behind the running one; more are dropped rather than replayed late
+MAX_QUEUED_JOBS = 4
+
+# Finished jobs kept for the API
+JOB_HISTORY_SIZE = 50
+
+# Minimum seconds between progress events of a job
+PROGRESS_INTERVAL = 0.1
+
+class ScriptJob:
+    """One queued run of a script."""
+
+    def __init__(self, job_id, script, command_id=None, phrase=None, timing=None):
+        self.id = job_id
+        self.script = script
+        self.command_id = command_id
+        self.phrase = phrase
+        self.timing = timing
+        self.status = QUEUED
+        self.step = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.done_event.is_set()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'commandId': self.command_id,
+            'phrase': self.phrase,
+            'timing': self.timing,
+            'status': self.status,
+            'step': self.step,
+            'totalSteps': len(self.script),
+            'error': self.error,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+class ScriptExecutor:
+    """Runs scripts one at a time on a dedicated thread.
+
+    submit() only queues a job and returns, so the speech pipeline never
+    waits for a macro's key presses or delays. Every state change and the
+    progress through the script's ops are sent to clients as
+    'script_job' Socket.IO events. Jobs can be cancelled while queued or
+    running; a running job stops at its next op or in the middle of a delay.
+    """
+
+    def __init__(self, max_queued=MAX_QUEUED_JOBS, on_job_finished=None):
+        """Create the executor.
+
+        Args:
+            max_queued: Maximum number of jobs waiting to run
+            on_job_finished: Optional callable(job) run after each job ends
+        """
+        self.max_queued = max_queued
+        self.on_job_finished = on_job_finished
+        self.socketio = None
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._current = None
+        self._thread = None
+        self._running = False
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self, socketio=None):
+        """Start the worker thread if it isn't running."""
+        with self._condition:
+            self.socketio = socketio
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name='script-executor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """Cancel every job and stop the worker thread."""
+        self.cancel_all()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, script, command_id=None, phrase=None, timing=None):
+        """Queue a script to run.
+
+        A script calling cancel() first cancels every other job, so it
+        doesn't wait behind the macro it is meant to stop.
+
+        Args:
+            script: Script source or CompiledScript
+            command_id: Id of the command the script belongs to, if any
+            phrase: Phrase that triggered it, for events and the API
+            timing: Name of the keystroke timing profile, the default if None
+
+        Returns:
+            The ScriptJob, with status DROPPED if the queue was full
+        """
+        if not isinstance(script, CompiledScript):
+            script = compile_script(script)
+        if 'cancel' in script.functions:
+            self.cancel_all()
+
+        with self._condition:
+            job = ScriptJob(next(self._ids), script, command_id, phrase, timing)
+            self._remember(job)
+            if len(self._queue) >= self.max_queued:
+                job.status = DROPPED
+                job.finished_at = time.time()
+                job.done_event.set()
+                self.dropped += 1
+                print(f"Script queue full, dropped job {job.id}")
+            else:
+                self._queue.append(job)
+                self._condition.notify()
+
+        self._emit(job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job.
+
+        Returns:
+            True if the job was still queued or running
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            self._cancel_locked(job)
+        self._emit(job)
+        return True
+
+    def cancel_all(self):
+        """Cancel every queued job and the running one, unless called from it.
+
+        Returns:
+            Number of jobs cancelled
+        """
+        with self._condition:
+            jobs = list(self._queue)
+            if self._current is not None and threading.current_thread() is not self._thread:
+                jobs.append(self._current)
+            for job in jobs:
+                self._cancel_locked(job)
+        for job in jobs:
+            self._emit(job)
+        return len(jobs)
+
+    def _cancel_locked(self, job):
+        """Flag a job to stop; a queued job is finished right away, a running one at its next op."""
+        job.cancel_event.set()
+        if job in self._queue:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED)
+        print(f"Cancelled script job {job.id}")
+
+    def get_job(self, job_id):
+        """Get a job by id, or None if it is unknown or was forgotten."""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def get_jobs(self):
+        """Get the recent jobs, newest first."""
+        with self._condition:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                'running': self._running,
+                'current': self._current.id if self._current else None,
+                'queued': len(self._queue),
+                'maxQueued': self.max_queued,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'dropped': self.dropped
+            }
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > JOB_HISTORY_SIZE:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+
+    def _run(self):
+        """Worker loop: run queued jobs in order."""
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait(0.5)
+                if not self._running:
+                    return
+                job = self._queue.popleft()
+                self._current = job
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            self._emit(job)
+            status = DONE
+            try:
+                last_progress = [0.0]
+
+                def on_progress(step):
+                    job.step = step
+                    now = time.time()
+                    if now - last_progress[0] >= PROGRESS_INTERVAL:
+                        last_progress[0] = now
+                        self._emit(job)
+
+                execute_script(job.script, socketio=self.socketio,
+                               cancel_event=job.cancel_event, on_progress=on_progress, timing=job.timing)
+                if job.cancel_event.is_set():
+                    status = CANCELLED
+            except Exception as e:
+                job.error = str(e)
+                status = FAILED
+                print(f"Error running script job {job.id}: {e}")
+                traceback.print_exc()
+
+            with self._condition:
+                self._current = None
+                self._finish(job, status)
+            self._emit(job)
+
+            if self.on_job_finished:
+                try:
+                    self.on_job_finished(job)
+                except Exception as e:
+                    print(f"Error in script job callback: {e}")
+
+    def _finish(self, job, status):
+        """Record the end of a job; called with the lock held."""
+        job.status = status
+        job.finished_at = time.time()
+        job.done_event.set()
+        if status == DONE:
+            self.completed += 1
+        elif status == CANCELLED:
+            self.cancelled += 1
+        elif status == FAILED:
+            self.failed += 1
+
+    def _emit(self, job):
+        """Send a job's state to connected clients."""
+        if self.socketio:
+            try:
+                self.socketio.emit('script_job', job.to_dict())
+            except Exception as e:
+                print(f"Error sending script job event: {e}")
+
+# Global script executor instance
+script_executor = ScriptExecutor()
@@ -4,12 +4,22 @@ Speech recognition module for voice command application.
 import time
 import threading
 import traceback
-import json
 import os
-import requests
-from db import get_command_mappings, get_active_state, set_active_state, increment_openai_request_count, get_commands, get_global_shortcut_key, get_ai_timeout_settings
+from collections import namedtuple
+from db import get_active_state, set_active_state, increment_openai_request_count, get_commands, get_command, get_commands_version, get_global_shortcut_key, get_ai_timeout_settings, get_fuzzy_match_threshold, get_intent_confidence_threshold, get_openai_base_url, get_openai_streaming_enabled, get_continuous_capture_enabled, get_recognizer_backend_settings, get_grammar_mode_enabled, get_vad_enabled, get_calibration_profile, set_calibration_profile, get_interim_triggering_enabled, get_wake_word_settings, get_keystroke_timing_profile, subscribe_settings, subscribe_commands
 from input_simulation import execute_script
+from script_compiler import CompiledScript, compile_script, script_cache
+from script_executor import script_executor
+from command_policy import CommandPolicyGate
 from speech_recognizer import SpeechRecognizer
+from phrase_matcher import PhraseMatcher, FuzzyPhraseIndex, StreamingPhraseResolver
+from intent_classifier import IntentClassifier, best_phrase
+from decision_cache import decision_cache
+from prompt_builder import PromptBuilder
+from command_grammar import CommandGrammar, normalize_grammar_phrase
+from interim_trigger import InterimTrigger
+from openai_client import OpenAIClient, iter_stream_content
+from pipeline import Pipeline, BLOCK, DROP_OLDEST, DROP_NEWEST
 
 # Global flag for stopping the speech recognition thread
 stop_listening = False
@@ -17,10 +27,8 @@ speech_thread = None
 last_thread_health_check = 0
 health_check_interval = 10  # seconds
 
-# Command debounce tracking
-last_command_time = 0
-last_command_phrase = None
-COMMAND_DEBOUNCE_TIME = 2.0  # seconds
+# Per-command coalescing, rate and concurrency state
+command_gate = CommandPolicyGate()
 
 # Sentiment mode flag (toggled by shortcut key)
 sentiment_mode_active = False
@@ -34,11 +42,38 @@ scripts_enabled = True
 
 # OpenAI API settings
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
-OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+
+# Pooled keep-alive OpenAI client, created on first use
+openai_client = None
+openai_client_lock = threading.Lock()
 
 # Global speech recognizer instance
 speech_recognizer = None
 
+# Saved calibrations younger than this are reused instead of calibrating at startup
+CALIBRATION_MAX_AGE = 7 * 24 * 60 * 60  # One week
+CALIBRATION_SAVE_INTERVAL = 60  # seconds
+
+# Running speech pipeline and the sizes of the queues between its stages
+speech_pipeline = None
+AUDIO_QUEUE_SIZE = 4
+TEXT_QUEUE_SIZE = 8
+SCRIPT_QUEUE_SIZE = 4
+
+# Everything compiled from one version of the command registry, published as a
+# single tuple so readers never mix objects built from different command sets
+CompiledCommands = namedtuple(
+    'CompiledCommands',
+    ['version', 'phrase_matcher', 'grammar_matcher', 'fuzzy_index', 'intent_classifier', 'prompt_builder']
+)
+compiled_commands = None
+
+# Phrase list for grammar-constrained recognition, updated with the matcher
+command_grammar = CommandGrammar()
+
+# Serializes rebuilding compiled_commands and updating and applying command_grammar
+compiled_commands_lock = threading.Lock()
+
 def update_openai_api_key(api_key):
     """Update the OpenAI API key."""
     global OPENAI_API_KEY
@@ -47,6 +82,122 @@ def update_openai_api_key(api_key):
     print(f"OpenAI API key updated: {'*' * (len(api_key) - 4) + api_key[-4:] if len(api_key) > 4 else api_key}")
     return True
 
+def get_openai_client():
+    """Get the shared OpenAI client for the configured base URL."""
+    global openai_client
+    client = openai_client
+    if client is None:
+        with openai_client_lock:
+            if openai_client is None:
+                openai_client = OpenAIClient(get_openai_base_url())
+            client = openai_client
+    return client
+
+def on_openai_base_url_changed(key, base_url):
+    """Swap in a client for the new base URL.
+    
+    The old client isn't closed, since a request may still be using it; its
+    pooled connections are released once the last reference to it is gone.
+    """
+    global openai_client
+    with openai_client_lock:
+        openai_client = OpenAIClient(base_url)
+    print(f"OpenAI base URL updated: {base_url}")
+
+subscribe_settings(on_openai_base_url_changed, 'openai_base_url')
+
+# Recompile a command's script on its next run after it is edited or deleted
+subscribe_commands(script_cache.invalidate)
+
+def on_command_changed(command_id):
+    """Forget the trigger history of deleted commands."""
+    if command_id is None or get_command(command_id) is None:
+        command_gate.forget(command_id)
+
+subscribe_commands(on_command_changed)
+
+def apply_recognizer_backend():
+    """Switch the speech recognizer to the backend chosen in the settings."""
+    if speech_recognizer is None:
+        return False
+    settings = get_recognizer_backend_settings()
+    # The new backend takes the current grammar; keep a concurrent grammar update from landing on the old one
+    with compiled_commands_lock:
+        return speech_recognizer.set_backend(settings['backend'], model_path=settings['vosk_model_path'])
+
+def on_recognizer_backend_changed(key, value):
+    """Swap the recognizer backend when its settings change."""
+    if key == 'vosk_model_path' and get_recognizer_backend_settings()['backend'] != 'vosk':
+        return
+    apply_recognizer_backend()
+
+subscribe_settings(on_recognizer_backend_changed, 'recognizer_backend')
+subscribe_settings(on_recognizer_backend_changed, 'vosk_model_path')
+
+def apply_wake_word():
+    """Set up the wake word gate from the settings."""
+    if speech_recognizer is None:
+        return False
+    settings = get_wake_word_settings()
+    return speech_recognizer.set_wake_word(
+        settings['wake_word'],
+        settings['backend'],
+        settings['window_seconds'],
+        model_path=get_recognizer_backend_settings()['vosk_model_path']
+    )
+
+def on_wake_word_changed(key, value):
+    """Rebuild the wake word gate when its settings change."""
+    apply_wake_word()
+
+subscribe_settings(on_wake_word_changed, 'wake_word')
+subscribe_settings(on_wake_word_changed, 'wake_word_backend')
+subscribe_settings(on_wake_word_changed, 'wake_word_window_seconds')
+
+def get_wake_word_stats():
+    """Get the wake word gate's hit and miss counters, or None when there is no gate."""
+    if speech_recognizer is None or speech_recognizer.wake_gate is None:
+        return None
+    return speech_recognizer.wake_gate.get_stats()
+
+def on_vad_enabled_changed(key, enabled):
+    """Turn voice activity detection on or off for the running recognizer."""
+    if speech_recognizer is not None:
+        speech_recognizer.vad.enabled = enabled
+
+subscribe_settings(on_vad_enabled_changed, 'vad_enabled')
+
+def load_calibration():
+    """Apply the saved calibration profile if there is a recent one."""
+    profile = get_calibration_profile()
+    if not profile or time.time() - profile['timestamp'] > CALIBRATION_MAX_AGE:
+        return False
+    
+    speech_recognizer.apply_calibration(profile['energy_threshold'], profile['noise_floor'])
+    print(f"Reusing saved calibration (energy threshold {profile['energy_threshold']:.0f}, "
+          f"{time.time() - profile['timestamp']:.0f}s old)")
+    return True
+
+def save_calibration():
+    """Save the recognizer's current, possibly refined, calibration."""
+    try:
+        calibration = speech_recognizer.get_calibration()
+        set_calibration_profile(calibration['energy_threshold'], calibration['noise_floor'], time.time())
+    except Exception as e:
+        print(f"Error saving calibration: {e}")
+
+def get_vad_stats():
+    """Get the voice activity detector's noise floor and counters, or None before startup."""
+    if speech_recognizer is None:
+        return None
+    return speech_recognizer.vad.get_stats()
+
+def get_capture_stats():
+    """Get the continuous capture counters, or None when it isn't running."""
+    if speech_recognizer is None or speech_recognizer.capture is None:
+        return None
+    return speech_recognizer.capture.get_stats()
+
 def toggle_sentiment_mode(socketio=None):
     """Toggle the sentiment mode flag."""
     global sentiment_mode_active, ai_timeout_timer, ai_timeout_end_time
@@ -61,8 +212,9 @@ def toggle_sentiment_mode(socketio=None):
     sentiment_mode_active = not sentiment_mode_active
     print(f"Sentiment mode {'activated' if sentiment_mode_active else 'deactivated'}")
     
-    # If turning on and timeout is enabled, start the timer
+    # If turning on, pre-warm the OpenAI connection and start the timeout timer if enabled
     if sentiment_mode_active:
+        get_openai_client().warm_up()
         timeout_settings = get_ai_timeout_settings()
         if timeout_settings['enabled']:
             start_ai_timeout(timeout_settings['seconds'], socketio)
@@ -119,6 +271,25 @@ def ai_timeout_callback(socketio=None):
     
     return True
 
+def on_active_state_changed(key, active):
+    """Stop the speech recognition loop as soon as the active setting is turned off."""
+    global stop_listening
+    if not active:
+        print("Active state is false, stopping speech recognition loop.")
+        stop_listening = True
+
+def on_ai_timeout_setting_changed(key, value):
+    """Cancel a running AI mode timeout when the timeout is disabled."""
+    global ai_timeout_timer, ai_timeout_end_time
+    if key == 'ai_timeout_enabled' and not value and ai_timeout_timer is not None:
+        print("AI mode timeout disabled, cancelling running timer")
+        ai_timeout_timer.cancel()
+        ai_timeout_timer = None
+        ai_timeout_end_time = None
+
+subscribe_settings(on_active_state_changed, 'active')
+subscribe_settings(on_ai_timeout_setting_changed, 'ai_timeout_enabled')
+
 def get_sentiment_mode_state():
     """Get the current state of the sentiment mode."""
     return sentiment_mode_active
@@ -152,56 +323,162 @@ def get_scripts_execution_state():
     """Get the current state of script execution."""
     return scripts_enabled
 
-def check_exact_match(text, command_phrases):
+def get_compiled_commands():
+    """Get the matcher, fuzzy index, intent classifier and prompt builder for the current command set.
+
+    They are only rebuilt when the command registry changes. The pipeline
+    stages and settings callbacks may ask at the same time, so the rebuild
+    runs under compiled_commands_lock and is published as one tuple; take
+    every object needed for a decision from the same tuple.
+    """
+    global compiled_commands
+
+    compiled = compiled_commands
+    if compiled is not None and compiled.version == get_commands_version():
+        return compiled
+
+    with compiled_commands_lock:
+        # Another thread may have rebuilt while this one waited
+        version = get_commands_version()
+        compiled = compiled_commands
+        if compiled is None or compiled.version != version:
+            commands = get_commands()
+            matcher = PhraseMatcher(commands)
+            compiled = CompiledCommands(
+                version,
+                matcher,
+                PhraseMatcher(commands, normalize=normalize_grammar_phrase),
+                FuzzyPhraseIndex(matcher.entries),
+                IntentClassifier(commands),
+                PromptBuilder(commands)
+            )
+            compiled_commands = compiled
+            print(f"Compiled phrase matcher with {len(matcher)} phrases")
+            if command_grammar.update(commands):
+                _apply_grammar_locked()
+    return compiled
+
+def select_phrase_matcher(compiled):
+    """Pick the matcher for the current recognition mode.
+
+    In grammar mode decoders return phrases in their grammar form, without
+    punctuation, so transcripts are matched against phrase keys normalized
+    the same way.
+    """
+    if get_grammar_mode_enabled():
+        return compiled.grammar_matcher
+    return compiled.phrase_matcher
+
+def get_phrase_matcher():
+    """Get the compiled phrase matcher for the current command set and recognition mode."""
+    return select_phrase_matcher(get_compiled_commands())
+
+def _apply_grammar_locked():
+    """Set the recognizer's grammar; called with compiled_commands_lock held."""
+    if speech_recognizer is None:
+        return
+    speech_recognizer.set_grammar(command_grammar.phrases if get_grammar_mode_enabled() else None)
+
+def apply_grammar():
+    """Constrain the recognizer to the command phrases if grammar mode is on."""
+    get_compiled_commands()
+    with compiled_commands_lock:
+        _apply_grammar_locked()
+
+def on_grammar_mode_changed(key, enabled):
+    """Apply or lift the command grammar when grammar mode is toggled."""
+    apply_grammar()
+
+subscribe_settings(on_grammar_mode_changed, 'grammar_mode_enabled')
+
+def get_fuzzy_index():
+    """Get the fuzzy phrase index for the current command set."""
+    return get_compiled_commands().fuzzy_index
+
+def get_intent_classifier():
+    """Get the local intent classifier for the current command set."""
+    return get_compiled_commands().intent_classifier
+
+def get_prompt_builder():
+    """Get the cached sentiment analysis prompt builder for the current command set."""
+    return get_compiled_commands().prompt_builder
+
+# Match score of each tier, multiplied with the recognizer's confidence to rank hypotheses.
+# Fuzzy and intent matches use their similarity as the score.
+EXACT_MATCH_SCORE = 1.0
+PARTIAL_MATCH_SCORE = 0.9
+
+# Confidence assumed when the recognizer gives none: the top hypothesis gets
+# DEFAULT_CONFIDENCE and each further alternative a fraction of the one before
+DEFAULT_CONFIDENCE = 0.9
+ALTERNATIVE_CONFIDENCE_DECAY = 0.8
+
+def check_exact_match(text, matcher, matches=None):
     """Check if the recognized text exactly matches any command phrase."""
     if not text:
-        return None, None, None
+        return None, None, None, 0.0
         
     text = text.lower()
     print(f"Checking for exact matches in text: '{text}'")
-    print(f"Available commands: {list(command_phrases.keys())}")
+    print(f"Available phrases: {len(matcher)}")
     
-    for phrase, script in command_phrases.items():
-        phrase_lower = phrase.lower()
-        if phrase_lower in text:
-            print(f"EXACT MATCH FOUND: '{phrase_lower}' in '{text}'")
-            
-            # Find command ID by phrase
-            command_id = None
-            for cmd in get_commands():
-                if phrase in cmd['phrases']:
-                    command_id = cmd['id']
-                    break
-                    
-            return command_id, phrase, script
+    entry = matcher.best_match(text, matches=matches)
+    if entry:
+        print(f"EXACT MATCH FOUND: '{entry.phrase.lower()}' in '{text}'")
+        return entry.command_id, entry.phrase, entry.script, EXACT_MATCH_SCORE
             
     print("No exact matches found.")
-    return None, None, None
+    return None, None, None, 0.0
 
-def check_partial_match(text, commands):
+def check_partial_match(text, matcher, matches=None):
     """Check if the recognized text contains any phrases from commands with partial matching enabled."""
     if not text:
-        return None, None, None
+        return None, None, None, 0.0
         
     text = text.lower()
     print(f"Checking for partial matches in text: '{text}'")
     
-    # Filter commands with partial matching enabled
-    partial_match_commands = [cmd for cmd in commands if cmd['partial_match']]
+    entry = matcher.best_match(text, partial_only=True, matches=matches)
+    if entry:
+        print(f"PARTIAL MATCH FOUND: '{entry.phrase.lower()}' in '{text}'")
+        return entry.command_id, entry.phrase, entry.script, PARTIAL_MATCH_SCORE
     
-    if not partial_match_commands:
-        print("No commands with partial matching enabled.")
-        return None, None, None
+    print("No partial matches found.")
+    return None, None, None, 0.0
+
+def check_fuzzy_match(text, index):
+    """Check if the recognized text is similar enough to any command phrase."""
+    if not text:
+        return None, None, None, 0.0
     
-    for cmd in partial_match_commands:
-        for phrase in cmd['phrases']:
-            phrase_lower = phrase.lower()
-            if phrase_lower in text:
-                print(f"PARTIAL MATCH FOUND: '{phrase_lower}' in '{text}'")
-                return cmd['id'], phrase, cmd['script']
+    text = text.lower()
+    print(f"Checking for fuzzy matches in text: '{text}'")
     
-    print("No partial matches found.")
-    return None, None, None
+    entry, score = index.best_match(text, get_fuzzy_match_threshold())
+    if entry:
+        print(f"FUZZY MATCH FOUND: '{entry.phrase.lower()}' ~ '{text}' (similarity {score:.2f})")
+        return entry.command_id, entry.phrase, entry.script, score
+    
+    print("No fuzzy matches found.")
+    return None, None, None, 0.0
+
+def check_intent_match(text, classifier):
+    """Check if the local intent classifier confidently maps the text to an AI-enabled command."""
+    if not text:
+        return None, None, None, 0.0
+    
+    if not len(classifier):
+        print("No commands with sentiment analysis enabled.")
+        return None, None, None, 0.0
+    
+    cmd, score = classifier.classify(text, get_intent_confidence_threshold())
+    if cmd:
+        phrase = best_phrase(cmd, text)
+        print(f"LOCAL INTENT MATCH FOUND: '{phrase}' for '{text}' (confidence {score:.2f})")
+        return cmd['id'], phrase, cmd['script'], score
+    
+    print(f"Local intent classifier not confident (best score {score:.2f}).")
+    return None, None, None, 0.0
 
 def validate_openai_settings():
     """Validate that OpenAI API key is set for sentiment analysis."""
@@ -210,6 +487,26 @@ def validate_openai_settings():
         return False
     return True
 
+def resolve_streamed_phrase(response, replies):
+    """Read a streamed completion until the suggested reply is unambiguous.
+    
+    The rest of the stream is cancelled as soon as only one valid reply (a
+    command id or NO_MATCH) can still be the answer.
+    """
+    resolver = StreamingPhraseResolver(replies)
+    start_time = time.time()
+    
+    try:
+        for delta in iter_stream_content(response):
+            resolved, phrase = resolver.feed(delta)
+            if resolved:
+                print(f"Resolved streamed reply after {(time.time() - start_time) * 1000:.0f}ms: '{resolver.text}'")
+                return phrase if phrase else resolver.text.strip()
+        return resolver.finish() or resolver.text.strip()
+    finally:
+        # Cancel the rest of the stream
+        response.close()
+
 def process_sentiment_analysis(text, socketio=None):
     """Process speech using sentiment analysis with OpenAI to determine the best command to execute."""
     if not text:
@@ -222,77 +519,71 @@ def process_sentiment_analysis(text, socketio=None):
                          'message': 'OpenAI API key not set. Cannot use sentiment mode.'})
         return None, None, None
     
-    # Get commands with sentiment analysis enabled
-    sentiment_commands = get_commands()
-    sentiment_commands = [cmd for cmd in sentiment_commands if cmd['understand_sentiment']]
+    # Get the cached prompt catalog of commands with sentiment analysis enabled
+    compiled = get_compiled_commands()
+    builder = compiled.prompt_builder
     
-    if not sentiment_commands:
+    if not len(builder):
         print("No commands with sentiment analysis enabled.")
         return None, None, None
     
-    # Format commands for the API
-    formatted_commands = []
-    for cmd in sentiment_commands:
-        cmd_phrases = ", ".join(cmd['phrases'])
-        formatted_commands.append(f"Command: {cmd_phrases} => Script: {cmd['script']}")
+    # Reuse an earlier decision for the same utterance and command set
+    fingerprint = builder.fingerprint
+    found, cached_id, cached_phrase = decision_cache.get(text, fingerprint)
+    if found:
+        if cached_id is None:
+            print(f"Cached sentiment analysis decision: NO_MATCH for '{text}'")
+            return None, None, None
+        for cmd in builder.commands:
+            if cmd['id'] == cached_id:
+                print(f"Cached sentiment analysis decision: '{cached_phrase}' for '{text}'")
+                return cmd['id'], cached_phrase, cmd['script']
     
-    command_list = "\n".join(formatted_commands)
+    # Large catalogs are pre-filtered to the most likely candidates
+    candidates = builder.select(text, compiled.intent_classifier)
     
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENAI_API_KEY}"
-        }
-        
-        # Create the prompt for ChatGPT
-        prompt = f"""
-I have several voice commands configured with sentiment analysis. A user said: "{text}"
-
-Available commands:
-{command_list}
-
-Which command best matches what the user said? Respond with ONLY the exact command text (one of the phrases) that matches best, nothing else. If there's no good match, respond with "NO_MATCH".
-"""
-        
         data = {
             "model": "gpt-4.1-mini",
-            "messages": [
-                {"role": "system", "content": "You determine which predefined command best matches a user's voice input. Respond only with the exact command text that matches best."},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": builder.build_messages(text, candidates),
             "temperature": 0.3
         }
         
-        print("Sending request to OpenAI API for sentiment analysis...")
-        response = requests.post(OPENAI_API_URL, headers=headers, data=json.dumps(data), timeout=5)
-        response.raise_for_status()
-        
-        # Increment the OpenAI request count
-        increment_openai_request_count()
-        
-        result = response.json()
-        matched_phrase = result['choices'][0]['message']['content'].strip()
+        print(f"Sending request to OpenAI API for sentiment analysis with {len(candidates)} candidate commands...")
+        if get_openai_streaming_enabled():
+            data["stream"] = True
+            response, _ = get_openai_client().chat_completion(OPENAI_API_KEY, data, timeout=5, stream=True)
+            response.raise_for_status()
+            
+            # Increment the OpenAI request count
+            increment_openai_request_count()
+            
+            reply = resolve_streamed_phrase(response, builder.replies(candidates))
+        else:
+            response, _ = get_openai_client().chat_completion(OPENAI_API_KEY, data, timeout=5)
+            response.raise_for_status()
+            
+            # Increment the OpenAI request count
+            increment_openai_request_count()
+            
+            result = response.json()
+            reply = result['choices'][0]['message']['content'].strip()
         
-        print(f"ChatGPT suggested match for sentiment analysis: '{matched_phrase}'")
+        print(f"ChatGPT suggested match for sentiment analysis: '{reply}'")
         
-        # If no match was found, return None
-        if matched_phrase == "NO_MATCH":
+        # Map the reply (a command id) back to the command
+        cmd = builder.resolve(reply)
+        if cmd is None:
+            print(f"No command matches ChatGPT's reply in sentiment analysis: '{reply}'")
+            # Only an explicit NO_MATCH is a decision; a reply that didn't parse is asked again next time
+            if builder.is_no_match(reply):
+                decision_cache.put(text, fingerprint, None, None)
             return None, None, None
         
-        # Find the command that matches the suggested phrase
-        for cmd in sentiment_commands:
-            for phrase in cmd['phrases']:
-                # Remove the "Command: " prefix if it exists in the match
-                clean_match = matched_phrase
-                if clean_match.startswith("Command: "):
-                    clean_match = clean_match[9:]
-                    
-                if clean_match.lower() == phrase.lower():
-                    print(f"Found matching command in sentiment analysis: '{phrase}'")
-                    return cmd['id'], phrase, cmd['script']
-        
-        print(f"Couldn't find a command that matches ChatGPT's suggestion in sentiment analysis: '{matched_phrase}'")
-        return None, None, None
+        phrase = best_phrase(cmd, text)
+        print(f"Found matching command in sentiment analysis: '{phrase}'")
+        decision_cache.put(text, fingerprint, cmd['id'], phrase)
+        return cmd['id'], phrase, cmd['script']
         
     except Exception as e:
         print(f"Error calling OpenAI API in sentiment analysis: {e}")
@@ -305,61 +596,125 @@ def process_speech_input(text, socketio=None):
     The matching priority is:
     1. Exact phrase matches (always checked)
     2. Partial phrase matches (if enabled for the command)
-    3. AI sentiment analysis (only if sentiment mode is active)
+    3. Fuzzy phrase matches (similarity above the command's threshold)
+    4. AI sentiment analysis (only if sentiment mode is active), resolved by
+       the local intent classifier when confident and by OpenAI otherwise
     """
-    if not text:
-        return None, None, None
-        
-    print(f"Processing speech input: '{text}'")
+    command_id, matched_phrase, script, _ = process_hypotheses([{'text': text, 'confidence': None}], socketio)
+    return command_id, matched_phrase, script
+
+def fill_confidences(hypotheses):
+    """Estimate the confidence of hypotheses the recognizer gave none for from their rank."""
+    previous = DEFAULT_CONFIDENCE / ALTERNATIVE_CONFIDENCE_DECAY
+    filled = []
+    for hypothesis in hypotheses:
+        confidence = hypothesis.get('confidence')
+        if confidence is None:
+            confidence = previous * ALTERNATIVE_CONFIDENCE_DECAY
+        filled.append({'text': hypothesis['text'], 'confidence': confidence})
+        previous = confidence
+    return filled
+
+def best_in_tier(tier, hypotheses, check):
+    """Run one matching tier over every hypothesis.
     
-    # Get all commands
-    all_commands = get_commands()
+    Returns:
+        Tuple of (command_id, matched_phrase, script, match) for the match
+        with the best recognizer confidence times match score, or None
+    """
+    best = None
+    for hypothesis in hypotheses:
+        command_id, matched_phrase, script, match_score = check(hypothesis)
+        if not (matched_phrase and script):
+            continue
+        score = hypothesis['confidence'] * match_score
+        if best is None or score > best[3]['score']:
+            best = (command_id, matched_phrase, script, {
+                'tier': tier,
+                'text': hypothesis['text'],
+                'confidence': round(hypothesis['confidence'], 3),
+                'matchScore': round(match_score, 3),
+                'score': round(score, 3)
+            })
+    if best:
+        print(f"Using {tier} match: '{best[1]}' from '{best[3]['text']}' (score {best[3]['score']:.2f})")
+    return best
+
+def process_hypotheses(hypotheses, socketio=None):
+    """Determine the command to execute from the recognizer's N-best hypotheses.
     
-    # Get phrase to script mappings for exact matching
-    command_phrases = get_command_mappings()
+    Each tier of process_speech_input runs over all hypotheses before
+    falling through to the next, so an exact match on the second hypothesis
+    beats a fuzzy match on the first, and OpenAI is only asked (about the top
+    hypothesis) when no hypothesis matches locally. Within a tier the best
+    recognizer confidence times match score wins.
     
-    # 1. Always check for exact matches first
-    command_id, matched_phrase, script = check_exact_match(text, command_phrases)
-    if matched_phrase and script:
-        print(f"Using exact match: '{matched_phrase}'")
-        return command_id, matched_phrase, script
+    Args:
+        hypotheses: List of dicts with text and confidence (None if unknown), best first
+        
+    Returns:
+        Tuple of (command_id, matched_phrase, script, match) where match
+        describes the winning hypothesis and its scores
+    """
+    hypotheses = fill_confidences([h for h in hypotheses if h.get('text')])
+    if not hypotheses:
+        return None, None, None, None
+        
+    print(f"Processing speech input: {', '.join(repr(h['text']) for h in hypotheses)}")
+    
+    # Get the compiled phrase matcher and scan each hypothesis once for all tiers
+    compiled = get_compiled_commands()
+    matcher = select_phrase_matcher(compiled)
+    fuzzy = compiled.fuzzy_index
+    matches = {h['text']: matcher.find_all(h['text']) for h in hypotheses}
     
-    # 2. Check for partial matches if no exact match found
-    command_id, matched_phrase, script = check_partial_match(text, all_commands)
-    if matched_phrase and script:
-        print(f"Using partial match: '{matched_phrase}'")
-        return command_id, matched_phrase, script
+    tiers = (
+        # 1. Always check for exact matches first
+        ('exact', lambda h: check_exact_match(h['text'], matcher, matches[h['text']])),
+        # 2. Check for partial matches if no exact match found
+        ('partial', lambda h: check_partial_match(h['text'], matcher, matches[h['text']])),
+        # 3. Check for fuzzy matches to absorb small transcription errors
+        ('fuzzy', lambda h: check_fuzzy_match(h['text'], fuzzy))
+    )
+    for tier, check in tiers:
+        result = best_in_tier(tier, hypotheses, check)
+        if result:
+            return result
     
-    # 3. Use sentiment analysis only if sentiment mode is active
+    # 4. Use sentiment analysis only if sentiment mode is active
     if sentiment_mode_active:
         print("No exact or partial matches found. Using AI sentiment analysis...")
         if socketio:
             socketio.emit('sentiment_mode', {'active': True})
         
+        # Resolve confident matches locally before paying for an API call
+        classifier = compiled.intent_classifier
+        result = best_in_tier('intent', hypotheses, lambda h: check_intent_match(h['text'], classifier))
+        if result:
+            return result
+        
         # Only use sentiment analysis if key is valid
         if validate_openai_settings():
-            command_id, matched_phrase, script = process_sentiment_analysis(text, socketio)
+            top = hypotheses[0]
+            command_id, matched_phrase, script = process_sentiment_analysis(top['text'], socketio)
             if matched_phrase and script:
                 print(f"Using AI sentiment match: '{matched_phrase}'")
-                return command_id, matched_phrase, script
+                return command_id, matched_phrase, script, {
+                    'tier': 'openai',
+                    'text': top['text'],
+                    'confidence': round(top['confidence'], 3),
+                    'matchScore': None,
+                    'score': None
+                }
     
-    return None, None, None
+    return None, None, None, None
 
-def should_execute_command(phrase):
-    """Check if we should execute this command based on debounce rules."""
-    global last_command_time, last_command_phrase
-    
-    current_time = time.time()
-    
-    # If it's the same command and within the debounce time, don't execute
-    if phrase == last_command_phrase and current_time - last_command_time < COMMAND_DEBOUNCE_TIME:
-        print(f"Debouncing command '{phrase}' - too soon after last execution")
-        return False
-    
-    # Update the last command time and phrase
-    last_command_time = current_time
-    last_command_phrase = phrase
-    return True
+def should_execute_command(command_id, phrase):
+    """Check if a command should fire under its coalescing and rate limits."""
+    allowed, reason = command_gate.allow(command_id or phrase, get_command(command_id) if command_id else None)
+    if not allowed:
+        print(f"Skipping command '{phrase}' - {reason.replace('_', ' ')}")
+    return allowed
 
 def can_execute_script(script):
     """Check if a script can be executed based on the scripts_enabled flag.
@@ -374,11 +729,175 @@ def can_execute_script(script):
         return True
     
     # If scripts are disabled, only allow if it contains scripts_on()
+    if isinstance(script, CompiledScript):
+        return 'scripts_on' in script.functions
     return "scripts_on()" in script
 
+def capture_stage():
+    """Pipeline source: wait for the next phrase of audio."""
+    return speech_recognizer.listen(timeout=5)
+
+def recognize_stage(audio, socketio=None):
+    """Pipeline stage: transcribe a phrase and forward its hypotheses."""
+    # Drop phrases that don't follow the wake word
+    if not speech_recognizer.passes_wake_gate(audio):
+        return None
+    
+    # Pick up command edits before decoding against the grammar
+    if get_grammar_mode_enabled():
+        get_compiled_commands()
+    
+    hypotheses = speech_recognizer.recognize_n_best(audio)
+    if not hypotheses:
+        return None
+    
+    text = hypotheses[0]['text']
+    print(f"Recognized: {text}")
+    
+    # Send recognized text and the alternatives to connected clients if socketio is provided
+    if socketio:
+        socketio.emit('speech_chunk', {
+            'text': text,
+            'confidence': hypotheses[0]['confidence'],
+            'alternatives': hypotheses
+        })
+    return {
+        'hypotheses': hypotheses,
+        # Commands already fired from interim hypotheses of this phrase
+        'fired': getattr(audio, 'interim_fired', None) or set()
+    }
+
+def match_stage(utterance, socketio=None):
+    """Pipeline stage: match the hypotheses to a command and forward it for execution."""
+    command_id, matched_phrase, script, match = process_hypotheses(utterance['hypotheses'], socketio)
+    
+    if not (matched_phrase and script):
+        print("No matching command found for the recognized speech.")
+        return None
+    
+    if command_id in utterance['fired']:
+        print(f"Skipping '{matched_phrase}', already fired from an interim hypothesis")
+        return None
+    
+    return dispatch_command(command_id, matched_phrase, script, socketio, match)
+
+def dispatch_command(command_id, matched_phrase, script, socketio=None, match=None):
+    """Apply the command's coalescing and rate limits and announce it.
+    
+    Args:
+        match: Optional dict of the hypothesis and scores behind the match
+    
+    Returns:
+        Dict of the command id, phrase and compiled script to execute, or
+        None if the command is coalesced or rate limited
+    """
+    if not should_execute_command(command_id, matched_phrase):
+        return None
+    
+    print(f"Executing command for phrase: '{matched_phrase}'")
+    print(f"Script to execute: {script}")
+    
+    # Notify clients that a command was triggered
+    if socketio and command_id:
+        socketio.emit('command_triggered', {
+            'command_id': command_id,
+            'phrase': matched_phrase,
+            'match': match
+        })
+    return {
+        'command_id': command_id,
+        'phrase': matched_phrase,
+        'script': script_cache.get(command_id, script) if command_id else compile_script(script)
+    }
+
+def execute_stage(command, socketio=None):
+    """Pipeline stage: queue a matched command's script on the script executor.
+    
+    Returns:
+        The ScriptJob, or None if script execution is disabled or the
+        command's concurrency policy dropped it
+    """
+    # Check if this script can be executed based on scripts_enabled flag
+    if can_execute_script(command['script']):
+        command_id = command['command_id']
+        options = get_command(command_id) if command_id else None
+        timing = (options or {}).get('timing_profile') or get_keystroke_timing_profile()
+        job, reason = command_gate.submit(
+            command_id or command['phrase'],
+            options,
+            lambda: script_executor.submit(command['script'], command_id, command['phrase'], timing),
+            lambda earlier: script_executor.cancel(earlier.id)
+        )
+        if job is None:
+            print(f"Skipping '{command['phrase']}' - {'still running' if reason == 'running' else reason.replace('_', ' ')}")
+        return job
+    else:
+        print("Script execution is disabled. Skipping execution.")
+        if socketio:
+            socketio.emit('system_message', {
+                'type': 'warning',
+                'message': 'Script execution is disabled. Use scripts_on() to re-enable.'
+            })
+    return None
+
+def on_interim_command(entry, hypothesis, socketio=None):
+    """Run a command matched from an interim hypothesis without waiting for the final transcript."""
+    if socketio:
+        socketio.emit('speech_chunk', {'text': hypothesis, 'interim': True})
+    
+    command = dispatch_command(entry.command_id, entry.phrase, entry.script, socketio, {
+        'tier': 'interim',
+        'text': hypothesis,
+        'confidence': None,
+        'matchScore': EXACT_MATCH_SCORE,
+        'score': None
+    })
+    if command and speech_pipeline is not None:
+        speech_pipeline.submit('execute', command)
+
+def build_speech_pipeline(socketio=None):
+    """Chain capture, recognition, matching and execution on worker threads.
+    
+    Stale audio is dropped when recognition falls behind and matching applies
+    backpressure to recognition. The execute stage only queues scripts on the
+    script executor, which drops commands arriving while its queue is full
+    rather than replaying them late.
+    """
+    return (
+        Pipeline('speech')
+        .add_stage('capture', capture_stage)
+        .add_stage('recognize', lambda audio: recognize_stage(audio, socketio), AUDIO_QUEUE_SIZE, DROP_OLDEST)
+        .add_stage('match', lambda text: match_stage(text, socketio), TEXT_QUEUE_SIZE, BLOCK)
+        .add_stage('execute', lambda command: execute_stage(command, socketio), SCRIPT_QUEUE_SIZE, DROP_NEWEST)
+    )
+
+def get_pipeline_stats():
+    """Get the speech pipeline counters, or None when it isn't running."""
+    if speech_pipeline is None:
+        return None
+    return speech_pipeline.get_stats()
+
+def get_script_jobs():
+    """Get the recent script jobs and the executor counters."""
+    return {
+        'jobs': script_executor.get_jobs(),
+        'stats': script_executor.get_stats(),
+        'policies': command_gate.get_stats()
+    }
+
+def cancel_script_job(job_id=None):
+    """Cancel one script job, or every queued and running job if job_id is None.
+    
+    Returns:
+        Number of jobs cancelled
+    """
+    if job_id is None:
+        return script_executor.cancel_all()
+    return 1 if script_executor.cancel(job_id) else 0
+
 def speech_recognition_loop(socketio=None):
     """Main loop for speech recognition."""
-    global stop_listening, speech_recognizer
+    global stop_listening, speech_recognizer, speech_pipeline
     
     # Initialize speech recognizer if not already initialized
     if speech_recognizer is None:
@@ -392,74 +911,58 @@ def speech_recognition_loop(socketio=None):
             non_speaking_duration=0.1,
             operation_timeout=None
         )
+        speech_recognizer.vad.enabled = get_vad_enabled()
+        apply_recognizer_backend()
+        apply_wake_word()
+        apply_grammar()
     
     print("Speech recognizer initialized")
     
-    # Calibrate for ambient noise
-    if not speech_recognizer.calibrate(duration=2):
-        print("Failed to calibrate speech recognizer")
-        return
+    # Reuse the saved calibration, or calibrate for ambient noise on first start.
+    # The voice activity detector keeps refining the noise floor while listening.
+    if not load_calibration():
+        if not speech_recognizer.calibrate(duration=2):
+            print("Failed to calibrate speech recognizer")
+            return
+        save_calibration()
+    
+    speech_pipeline = build_speech_pipeline(socketio)
+    
+    # Keep the microphone open between phrases, firing short commands from
+    # interim hypotheses on streaming backends
+    if get_continuous_capture_enabled():
+        interim_trigger = InterimTrigger(
+            lambda: speech_recognizer.backend,
+            get_phrase_matcher,
+            lambda entry, hypothesis: on_interim_command(entry, hypothesis, socketio),
+            get_interim_triggering_enabled
+        )
+        speech_recognizer.start_continuous(listener=interim_trigger)
+    
+    script_executor.start(socketio)
+    speech_pipeline.start()
     
     print("Voice command system active!")
     
+    last_calibration_save = time.time()
     try:
         while not stop_listening:
-            try:
-                # Check if we should still be listening
-                if not get_active_state():
-                    print("Active state is false, stopping speech recognition loop.")
-                    break
-                
-                # Listen for audio and recognize it
-                text = speech_recognizer.listen_and_recognize(timeout=5)
-                
-                if text:
-                    print(f"Recognized: {text}")
-                    
-                    # Send recognized text to connected clients if socketio is provided
-                    if socketio:
-                        socketio.emit('speech_chunk', {'text': text})
-                    
-                    # Process the speech input
-                    command_id, matched_phrase, script = process_speech_input(text, socketio)
-                    
-                    # Execute the matched command if found
-                    if matched_phrase and script:
-                        # Check if we should execute this command (debounce)
-                        if should_execute_command(matched_phrase):
-                            print(f"Executing command for phrase: '{matched_phrase}'")
-                            print(f"Script to execute: {script}")
-                            
-                            # Notify clients that a command was triggered
-                            if socketio and command_id:
-                                socketio.emit('command_triggered', {
-                                    'command_id': command_id,
-                                    'phrase': matched_phrase
-                                })
-                            
-                            # Check if this script can be executed based on scripts_enabled flag
-                            if can_execute_script(script):
-                                # Execute the script
-                                execute_script(script, socketio=socketio)
-                            else:
-                                print("Script execution is disabled. Skipping execution.")
-                                if socketio:
-                                    socketio.emit('system_message', {
-                                        'type': 'warning',
-                                        'message': 'Script execution is disabled. Use scripts_on() to re-enable.'
-                                    })
-                        else:
-                            print(f"Skipping execution of '{matched_phrase}' due to debounce rules")
-                    else:
-                        print("No matching command found for the recognized speech.")
-                
-            except Exception as e:
-                print(f"Error in speech recognition loop: {e}")
-                time.sleep(1)  # Prevent tight loop on recurring errors
+            time.sleep(0.2)
+            
+            # Persist the refined calibration now and then
+            if time.time() - last_calibration_save >= CALIBRATION_SAVE_INTERVAL:
+                save_calibration()
+                last_calibration_save = time.time()
     except Exception as e:
         print(f"Critical error in speech recognition thread: {e}")
         traceback.print_exc()
         time.sleep(1)
+    finally:
+        speech_pipeline.stop()
+        speech_pipeline = None
+        script_executor.stop()
+        speech_recognizer.stop_continuous()
+        save_calibration()
 
 def check_thread_health(socketio=None):
     """Check if speech recognition thread is healthy and restart if needed."""
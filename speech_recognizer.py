@@ -2,7 +2,278 @@
 Speech recognition module for voice command application.
 """
 import speech_recognition as sr
+import json
+import os
 import time
+from abc import ABC, abstractmethod
+from audio_capture import ContinuousCapture
+from vad import VoiceActivityDetector, MIN_NOISE_FLOOR
+from wake_word import WakeWordGate, DEFAULT_WINDOW_SECONDS
+
+# Sample rate audio is converted to for the Vosk backend
+VOSK_SAMPLE_RATE = 16000
+
+# Alternatives requested from backends that can return several hypotheses
+MAX_ALTERNATIVES = 5
+
+# PocketSphinx keyword spotting sensitivity for command phrases (0-1)
+KEYWORD_SENSITIVITY = 0.8
+
+class RecognizerBackend(ABC):
+    """Interface of a speech-to-text backend.
+    
+    Backends turn a phrase of speech_recognition.AudioData into text. They
+    may raise sr.UnknownValueError when nothing was understood and
+    sr.RequestError when the engine itself failed.
+    """
+    
+    name = None
+    
+    # Whether the backend can restrict decoding to a closed phrase list
+    supports_grammar = False
+    grammar = None
+    
+    # Whether the backend can decode audio as it arrives (see start_stream)
+    supports_streaming = False
+    
+    # Whether audio stays on this machine; only these may spot the wake word
+    on_device = True
+    
+    def __init__(self, **options):
+        pass
+    
+    def set_grammar(self, phrases):
+        """Restrict decoding to the given phrases, or lift the restriction with None."""
+        self.grammar = list(phrases) if phrases is not None else None
+    
+    @abstractmethod
+    def recognize(self, recognizer, audio):
+        """Transcribe a phrase.
+        
+        Args:
+            recognizer: The speech_recognition.Recognizer in use
+            audio: speech_recognition.AudioData to transcribe
+            
+        Returns:
+            Recognized text or None
+        """
+    
+    def recognize_n_best(self, recognizer, audio):
+        """Transcribe a phrase into a list of alternative hypotheses.
+        
+        Returns:
+            List of dicts with text and confidence (0-1, or None if the
+            backend doesn't give one), best first
+        """
+        text = self.recognize(recognizer, audio)
+        return [{'text': text, 'confidence': None}] if text else []
+    
+    def start_stream(self, sample_rate):
+        """Start decoding a phrase incrementally.
+        
+        Args:
+            sample_rate: Sample rate of the 16-bit audio that will be fed
+            
+        Returns:
+            Object with accept(frame_data) returning the current interim
+            hypothesis (or None), for backends that support streaming
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any resources held by the backend."""
+        pass
+
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API. Needs network access."""
+    
+    name = 'google'
+    on_device = False
+    
+    def recognize(self, recognizer, audio):
+        return recognizer.recognize_google(audio)
+    
+    def recognize_n_best(self, recognizer, audio):
+        result = recognizer.recognize_google(audio, show_all=True)
+        if not isinstance(result, dict):
+            return []  # Nothing was recognized
+        # Google only gives a confidence for the top alternative
+        return [
+            {'text': alternative['transcript'], 'confidence': alternative.get('confidence')}
+            for alternative in result.get('alternative', [])[:MAX_ALTERNATIVES]
+            if alternative.get('transcript')
+        ]
+
+class SphinxBackend(RecognizerBackend):
+    """CMU PocketSphinx, running offline on the CPU."""
+    
+    name = 'sphinx'
+    supports_grammar = True
+    
+    def __init__(self, **options):
+        try:
+            import pocketsphinx  # noqa: F401
+        except ImportError:
+            raise RuntimeError("The sphinx backend requires the pocketsphinx package")
+        self._keyword_entries = None
+    
+    def set_grammar(self, phrases):
+        super().set_grammar(phrases)
+        self._keyword_entries = [(phrase, KEYWORD_SENSITIVITY) for phrase in self.grammar] if self.grammar else None
+    
+    def recognize(self, recognizer, audio):
+        return recognizer.recognize_sphinx(audio, keyword_entries=self._keyword_entries)
+
+class VoskBackend(RecognizerBackend):
+    """Vosk (Kaldi) model, running offline on the CPU."""
+    
+    name = 'vosk'
+    supports_grammar = True
+    supports_streaming = True
+    
+    def __init__(self, model_path='', **options):
+        """Load the Vosk model.
+        
+        Args:
+            model_path: Directory of an unpacked Vosk model
+        """
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("The vosk backend requires the vosk package")
+        if not model_path or not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model directory not found: '{model_path}'")
+        
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self._grammar_json = None
+    
+    def set_grammar(self, phrases):
+        super().set_grammar(phrases)
+        # "[unk]" absorbs speech outside the grammar instead of forcing a command
+        self._grammar_json = json.dumps(self.grammar + ['[unk]']) if self.grammar else None
+    
+    def _decoder(self, sample_rate):
+        if self._grammar_json:
+            return self._vosk.KaldiRecognizer(self.model, sample_rate, self._grammar_json)
+        return self._vosk.KaldiRecognizer(self.model, sample_rate)
+    
+    def recognize(self, recognizer, audio):
+        raw_data = audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2)
+        decoder = self._decoder(VOSK_SAMPLE_RATE)
+        decoder.AcceptWaveform(raw_data)
+        return _strip_unknown(json.loads(decoder.FinalResult()).get('text', '')) or None
+    
+    def recognize_n_best(self, recognizer, audio):
+        raw_data = audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2)
+        decoder = self._decoder(VOSK_SAMPLE_RATE)
+        decoder.SetMaxAlternatives(MAX_ALTERNATIVES)
+        decoder.AcceptWaveform(raw_data)
+        # Vosk alternative confidences are unnormalized likelihoods, so only their order is used
+        texts = [_strip_unknown(alternative.get('text', ''))
+                 for alternative in json.loads(decoder.FinalResult()).get('alternatives', [])]
+        return [{'text': text, 'confidence': None} for text in dict.fromkeys(texts) if text]
+    
+    def start_stream(self, sample_rate):
+        return _VoskStream(self._decoder(sample_rate))
+
+def _strip_unknown(text):
+    """Remove the out-of-grammar marker from a Vosk transcript."""
+    return ' '.join(word for word in text.split() if word != '[unk]')
+
+class _VoskStream:
+    """Incremental Vosk decoding of one phrase."""
+    
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.final_parts = []
+    
+    def accept(self, frame_data):
+        if self.decoder.AcceptWaveform(frame_data):
+            self.final_parts.append(_strip_unknown(json.loads(self.decoder.Result()).get('text', '')))
+            partial = ''
+        else:
+            partial = _strip_unknown(json.loads(self.decoder.PartialResult()).get('partial', ''))
+        return ' '.join(part for part in self.final_parts + [partial] if part) or None
+
+class FakeBackend(RecognizerBackend):
+    """Deterministic backend for tests and benchmarks.
+    
+    Returns the ``transcript`` attribute of the audio when present, otherwise
+    the next of the given transcripts in order. Every call takes exactly
+    ``latency`` seconds. With a grammar set, only the longest grammar phrase
+    heard as whole words in the transcript is recognized. Streams reveal the
+    next of the given partials one word per chunk.
+    """
+    
+    name = 'fake'
+    supports_grammar = True
+    supports_streaming = True
+    
+    def __init__(self, transcripts=(), latency=0.0, partials=(), **options):
+        """Create the backend.
+        
+        Args:
+            transcripts: Transcripts returned in order for audio without one
+            latency: Seconds each recognition takes
+            partials: Transcripts streamed in order, one per phrase
+        """
+        self._transcripts = iter(transcripts)
+        self._partials = iter(partials)
+        self.latency = latency
+        self.calls = 0
+    
+    def recognize(self, recognizer, audio):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        transcript = getattr(audio, 'transcript', None)
+        if transcript is None:
+            transcript = next(self._transcripts, None)
+        if transcript is not None and self.grammar is not None:
+            # Like a constrained decoder, only the longest grammar phrase heard is returned
+            padded = f" {' '.join(transcript.lower().split())} "
+            heard = [phrase for phrase in self.grammar if f" {phrase} " in padded]
+            return max(heard, key=len) if heard else None
+        return transcript
+    
+    def start_stream(self, sample_rate):
+        return _FakeStream(next(self._partials, ''))
+
+class _FakeStream:
+    """Reveals a transcript one word per accepted chunk."""
+    
+    def __init__(self, transcript):
+        self.words = transcript.split()
+        self.count = 0
+    
+    def accept(self, frame_data):
+        self.count = min(self.count + 1, len(self.words))
+        return ' '.join(self.words[:self.count]) or None
+
+# Available backends by name
+RECOGNIZER_BACKENDS = {
+    backend.name: backend
+    for backend in (GoogleBackend, SphinxBackend, VoskBackend, FakeBackend)
+}
+
+# Backends the wake word can be spotted with, so audio outside the window never leaves the machine
+WAKE_WORD_BACKENDS = [name for name, backend in RECOGNIZER_BACKENDS.items() if backend.on_device]
+
+def create_backend(name, **options):
+    """Create a recognizer backend by name.
+    
+    Args:
+        name: One of RECOGNIZER_BACKENDS
+        **options: Backend options, e.g. model_path for vosk
+        
+    Returns:
+        RecognizerBackend instance
+    """
+    if name not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer backend: {name}")
+    return RECOGNIZER_BACKENDS[name](**options)
 
 class SpeechRecognizer:
     """Class to handle speech recognition functionality."""
@@ -40,6 +311,50 @@ class SpeechRecognizer:
         self.recognizer.phrase_threshold = phrase_threshold
         self.recognizer.non_speaking_duration = non_speaking_duration
         self.microphone = None
+        self.capture = None
+        self.backend = GoogleBackend()
+        self.grammar = None
+        self.vad = VoiceActivityDetector(energy_threshold / dynamic_energy_ratio)
+        self.wake_gate = None
+        
+    def set_backend(self, name, **options):
+        """Switch the speech-to-text backend.
+        
+        The new backend is given the current grammar, so callers updating the
+        grammar from another thread must serialize this with set_grammar().
+        
+        Args:
+            name: One of RECOGNIZER_BACKENDS
+            **options: Backend options, e.g. model_path for vosk
+            
+        Returns:
+            True if the backend was switched, False if it couldn't be created
+        """
+        try:
+            backend = create_backend(name, **options)
+        except Exception as e:
+            print(f"Error creating recognizer backend '{name}': {e}")
+            return False
+        
+        if self.grammar is not None and backend.supports_grammar:
+            backend.set_grammar(self.grammar)
+        
+        previous, self.backend = self.backend, backend
+        previous.close()
+        print(f"Recognizer backend set to {name}")
+        return True
+        
+    def set_grammar(self, phrases):
+        """Constrain decoding to a phrase list on backends that support it.
+        
+        Args:
+            phrases: List of phrases, or None to decode open-domain speech
+        """
+        self.grammar = list(phrases) if phrases is not None else None
+        if self.backend.supports_grammar:
+            self.backend.set_grammar(self.grammar)
+            if self.grammar is not None:
+                print(f"Recognizer grammar set to {len(self.grammar)} phrases")
         
     def calibrate(self, duration=2):
         """Calibrate the recognizer for ambient noise."""
@@ -48,12 +363,101 @@ class SpeechRecognizer:
                 self.microphone = source
                 print("Calibrating for ambient noise...")
                 self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+                self.vad.noise_floor = self.recognizer.energy_threshold / self.recognizer.dynamic_energy_ratio
                 print("Calibration complete")
                 return True
         except Exception as e:
             print(f"Error during calibration: {e}")
             return False
             
+    def set_wake_word(self, wake_word, backend_name='sphinx', window_seconds=DEFAULT_WINDOW_SECONDS, **options):
+        """Gate recognition behind a wake word, or remove the gate.
+        
+        Args:
+            wake_word: Wake word, or an empty string to recognize every phrase
+            backend_name: On-device backend used to spot the wake word
+            window_seconds: Seconds phrases pass without the wake word after a hit
+            **options: Backend options, e.g. model_path for vosk
+            
+        Returns:
+            True if the gate was set up or removed, False if its backend couldn't be created
+        """
+        previous, self.wake_gate = self.wake_gate, None
+        if previous:
+            previous.close()
+        if not wake_word:
+            return True
+        if backend_name not in WAKE_WORD_BACKENDS:
+            print(f"Wake word backend must run on-device, not '{backend_name}'")
+            return False
+            
+        try:
+            backend = create_backend(backend_name, **options)
+        except Exception as e:
+            print(f"Error creating wake word backend '{backend_name}': {e}")
+            return False
+        
+        try:
+            self.wake_gate = WakeWordGate(wake_word, backend, window_seconds)
+        except ValueError as e:
+            print(f"Error setting wake word: {e}")
+            backend.close()
+            return False
+        print(f"Wake word set to '{wake_word}' ({backend_name}, {window_seconds:g}s window)")
+        return True
+        
+    def passes_wake_gate(self, audio):
+        """Whether a phrase should be sent to full recognition."""
+        return self.wake_gate is None or self.wake_gate.check(self.recognizer, audio)
+        
+    def get_calibration(self):
+        """Get the current energy threshold and noise floor."""
+        return {
+            'energy_threshold': self.recognizer.energy_threshold,
+            'noise_floor': self.vad.noise_floor
+        }
+        
+    def apply_calibration(self, energy_threshold, noise_floor):
+        """Use a saved calibration instead of measuring the ambient noise again."""
+        self.recognizer.energy_threshold = energy_threshold
+        # A profile saved in silence (or by hand) must not disable the VAD's floor
+        self.vad.noise_floor = max(noise_floor, MIN_NOISE_FLOOR)
+        
+    def start_continuous(self, listener=None, source_factory=sr.Microphone):
+        """Keep the microphone open and segment phrases in the background.
+        
+        While running, listen() returns phrases from the capture instead of
+        opening the microphone for every utterance.
+        
+        Args:
+            listener: Optional phrase listener that sees each phrase's chunks
+                as they are captured
+            source_factory: Callable returning the audio source, e.g. a
+                ReplaySource instead of the microphone
+        
+        Returns:
+            True if the capture started, False otherwise
+        """
+        if self.capture and self.capture.running:
+            return True
+            
+        try:
+            self.capture = ContinuousCapture(
+                self.recognizer, source_factory=source_factory, vad=self.vad, listener=listener
+            )
+            self.capture.start()
+            return True
+        except Exception as e:
+            print(f"Error starting continuous capture: {e}")
+            self.capture = None
+            return False
+            
+    def stop_continuous(self):
+        """Stop the background capture and release the microphone."""
+        if self.capture:
+            self.capture.stop()
+            self.capture = None
+            
     def listen(self, timeout=5):
         """Listen for audio and return it.
         
@@ -63,6 +467,13 @@ class SpeechRecognizer:
         Returns:
             Audio data or None if an error occurred
         """
+        if self.capture:
+            # Drain phrases captured before the stream ended
+            if self.capture.running or not self.capture.phrases.empty():
+                return self.capture.next_phrase(timeout)
+            print("Continuous capture ended, falling back to per-phrase listening")
+            self.stop_continuous()
+            
         if not self.microphone:
             try:
                 self.microphone = sr.Microphone()
@@ -73,10 +484,79 @@ class SpeechRecognizer:
         try:
             with self.microphone as source:
                 audio = self.recognizer.listen(source, timeout=timeout)
-                return audio
+        except sr.WaitTimeoutError:
+            return None
         except Exception as e:
             print(f"Error listening: {e}")
             return None
+            
+        # Don't send noise-only phrases to the recognizer
+        if self.vad.enabled:
+            speech = self.vad.contains_speech_audio(audio, adapt=True)
+            self.recognizer.energy_threshold = self.vad.energy_threshold
+            if not speech:
+                print("Dropped a noise-only phrase")
+                return None
+        return audio
+    
+    def recognize(self, audio):
+        """Recognize speech with the selected backend.
+        
+        Args:
+            audio: Audio data to recognize
+            
+        Returns:
+            Recognized text or None if an error occurred
+        """
+        if not audio:
+            return None
+            
+        try:
+            text = self.backend.recognize(self.recognizer, audio)
+            if text and self.wake_gate:
+                text = self.wake_gate.strip(text) or None
+            return text
+        except sr.UnknownValueError:
+            # Could not understand audio
+            return None
+        except sr.RequestError as e:
+            print(f"Speech recognition service error ({self.backend.name}): {e}")
+            return None
+        except Exception as e:
+            print(f"Error recognizing speech: {e}")
+            return None
+    
+    def recognize_n_best(self, audio):
+        """Recognize speech into alternative hypotheses with the selected backend.
+        
+        Args:
+            audio: Audio data to recognize
+            
+        Returns:
+            List of dicts with text and confidence (None if unknown), best
+            first; empty if nothing was recognized or an error occurred
+        """
+        if not audio:
+            return []
+            
+        try:
+            hypotheses = self.backend.recognize_n_best(self.recognizer, audio)
+            if self.wake_gate:
+                hypotheses = [
+                    {'text': self.wake_gate.strip(h['text']), 'confidence': h['confidence']}
+                    for h in hypotheses
+                ]
+                hypotheses = [h for h in hypotheses if h['text']]
+            return hypotheses
+        except sr.UnknownValueError:
+            # Could not understand audio
+            return []
+        except sr.RequestError as e:
+            print(f"Speech recognition service error ({self.backend.name}): {e}")
+            return []
+        except Exception as e:
+            print(f"Error recognizing speech: {e}")
+            return []
     
     def recognize_google(self, audio):
         """Recognize speech using Google Speech Recognition.
@@ -91,8 +571,7 @@ class SpeechRecognizer:
             return None
             
         try:
-            text = self.recognizer.recognize_google(audio)
-            return text
+            return GoogleBackend().recognize(self.recognizer, audio)
         except sr.UnknownValueError:
             # Could not understand audio
             return None
@@ -113,6 +592,6 @@ class SpeechRecognizer:
             Recognized text or None if an error occurred
         """
         audio = self.listen(timeout)
-        if audio:
-            return self.recognize_google(audio)
+        if audio and self.passes_wake_gate(audio):
+            return self.recognize(audio)
         return None 
\ No newline at end of file
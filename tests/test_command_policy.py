@@ -0,0 +1,73 @@
+"""
+Tests for per-command coalescing, rate and concurrency policies.
+"""
+from command_policy import CommandPolicyGate, DROP_IF_RUNNING, REPLACE_RUNNING
+from script_executor import ScriptJob, DROPPED
+
+def make_job(status=None, finished=False):
+    job = ScriptJob(1, [])
+    if status:
+        job.status = status
+    if finished:
+        job.done_event.set()
+    return job
+
+def submit(gate, options, now, job=None):
+    job = job or make_job()
+    return gate.submit('cmd', options, lambda: job, lambda earlier: None, now=now)
+
+def test_allow_does_not_charge_the_limits():
+    gate = CommandPolicyGate()
+    options = {'coalesce_ms': 1000, 'max_rate_per_minute': 1}
+
+    assert gate.allow('cmd', options, now=0) == (True, None)
+    assert gate.allow('cmd', options, now=0.1) == (True, None)
+
+def test_queued_job_starts_the_coalescing_window_and_uses_the_rate():
+    gate = CommandPolicyGate()
+    options = {'coalesce_ms': 1000, 'max_rate_per_minute': 2}
+
+    assert submit(gate, options, now=0, job=make_job(finished=True))[1] is None
+    assert submit(gate, options, now=0.5) == (None, 'coalesced')
+    assert gate.allow('cmd', options, now=0.5) == (False, 'coalesced')
+    assert submit(gate, options, now=2, job=make_job(finished=True))[1] is None
+    assert submit(gate, options, now=4) == (None, 'rate_limited')
+    assert submit(gate, options, now=61, job=make_job(finished=True))[1] is None
+
+def test_triggers_dropped_while_running_do_not_use_the_rate():
+    gate = CommandPolicyGate()
+    options = {'coalesce_ms': 0, 'max_rate_per_minute': 2, 'concurrency_policy': DROP_IF_RUNNING}
+
+    running, reason = submit(gate, options, now=0)
+    assert reason is None
+    assert submit(gate, options, now=1) == (None, 'running')
+    assert submit(gate, options, now=2) == (None, 'running')
+
+    running.done_event.set()
+    assert submit(gate, options, now=3, job=make_job(finished=True))[1] is None
+    assert submit(gate, options, now=4) == (None, 'rate_limited')
+
+def test_jobs_dropped_by_a_full_executor_do_not_use_the_budget():
+    gate = CommandPolicyGate()
+    options = {'coalesce_ms': 1000, 'max_rate_per_minute': 1}
+    full = make_job(status=DROPPED, finished=True)
+
+    assert submit(gate, options, now=0, job=full) == (None, 'queue_full')
+    assert submit(gate, options, now=0.1, job=make_job(finished=True))[1] is None
+
+def test_replaced_runs_are_kept_when_the_new_job_is_dropped():
+    gate = CommandPolicyGate()
+    options = {'coalesce_ms': 0, 'concurrency_policy': REPLACE_RUNNING}
+    cancelled = []
+
+    def submit_replacing(job, now):
+        return gate.submit('cmd', options, lambda: job, cancelled.append, now=now)
+
+    running, reason = submit_replacing(make_job(), now=0)
+    assert reason is None
+    assert submit_replacing(make_job(status=DROPPED, finished=True), now=1) == (None, 'queue_full')
+    assert cancelled == []
+
+    replacement, reason = submit_replacing(make_job(), now=2)
+    assert reason is None
+    assert cancelled == [running]
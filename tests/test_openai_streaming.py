@@ -0,0 +1,121 @@
+"""
+Tests for streamed OpenAI replies against a local fake SSE server.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from openai_client import OpenAIClient, iter_stream_content
+from phrase_matcher import StreamingPhraseResolver
+
+# Seconds between the chunks the fake server sends
+CHUNK_INTERVAL = 0.05
+
+def sse_event(content):
+    payload = json.dumps({'choices': [{'delta': {'content': content}}]}, ensure_ascii=False)
+    return f"data: {payload}\n\n".encode('utf-8')
+
+class FakeSSEServer:
+    """Chat completions endpoint that streams a fixed list of raw chunks.
+
+    Each chunk is written as one HTTP chunk, so a chunk boundary can fall
+    inside an event or a UTF-8 character. The server records what it sent
+    and whether the client hung up before the stream ended.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = []
+        self.disconnected = threading.Event()
+        self.finished = threading.Event()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for chunk in server.chunks:
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                        self.wfile.flush()
+                        server.sent.append(chunk)
+                        time.sleep(CHUNK_INTERVAL)
+                    self.wfile.write(b'0\r\n\r\n')
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    server.disconnected.set()
+                finally:
+                    server.finished.set()
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def stream(server):
+    client = OpenAIClient(server.base_url)
+    response, _ = client.chat_completion('test-key', {'model': 'test', 'stream': True}, stream=True)
+    response.raise_for_status()
+    return client, response
+
+def test_stream_content_reassembles_split_utf8_characters():
+    event = sse_event('fenêtre')
+    split = event.index('ê'.encode('utf-8')) + 1
+    chunks = [sse_event('La '), event[:split], event[split:], b'data: [DONE]\n\n']
+
+    with FakeSSEServer(chunks) as server:
+        client, response = stream(server)
+        try:
+            assert ''.join(iter_stream_content(response)) == 'La fenêtre'
+        finally:
+            response.close()
+            client.close()
+
+def test_resolver_closes_stream_once_reply_is_unambiguous():
+    tokens = ['fen', 'être', ' ouv', 'erte'] + [' and', ' some', ' more', ' text'] * 5
+    event = sse_event(tokens[1])
+    split = event.index('ê'.encode('utf-8')) + 1
+    chunks = [sse_event(tokens[0]), event[:split], event[split:]]
+    chunks += [sse_event(token) for token in tokens[2:]] + [b'data: [DONE]\n\n']
+
+    with FakeSSEServer(chunks) as server:
+        client, response = stream(server)
+        resolver = StreamingPhraseResolver(['fenêtre ouverte', 'fenêtre fermée', 'NO_MATCH'])
+        try:
+            for delta in iter_stream_content(response):
+                resolved, phrase = resolver.feed(delta)
+                if resolved:
+                    break
+            else:
+                pytest.fail('stream ended without resolving the reply')
+        finally:
+            response.close()
+            client.close()
+
+        assert phrase == 'fenêtre ouverte'
+        assert resolver.text == 'fenêtre ouv'
+        assert server.finished.wait(5)
+        assert server.disconnected.is_set()
+        assert b'data: [DONE]\n\n' not in server.sent
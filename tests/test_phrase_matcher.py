@@ -0,0 +1,33 @@
+from command_grammar import normalize_grammar_phrase
+from phrase_matcher import PhraseMatcher
+
+COMMANDS = [
+    {'id': 1, 'phrases': ["What's up?"], 'script': 'status', 'partial_match': True},
+    {'id': 2, 'phrases': ['Scroll down.', 'page-down'], 'script': 'scroll', 'partial_match': False},
+]
+
+
+def test_grammar_matcher_finds_punctuated_phrases_in_decoder_output():
+    matcher = PhraseMatcher(COMMANDS, normalize=normalize_grammar_phrase)
+
+    # Grammar-constrained decoders return the normalized phrase
+    assert matcher.best_match(normalize_grammar_phrase("What's up?")).command_id == 1
+    assert matcher.best_match('scroll down').command_id == 2
+    assert matcher.best_match('page down').phrase == 'page-down'
+    # Open-vocabulary transcripts with punctuation are normalized the same way
+    assert matcher.best_match("Hey, what's up?").command_id == 1
+
+
+def test_match_positions_index_into_the_key():
+    matcher = PhraseMatcher(COMMANDS, normalize=normalize_grammar_phrase)
+
+    text = "ok what's up"
+    [match] = matcher.find_all(text)
+    assert matcher.key(text)[match.start:match.end] == "what's up"
+
+
+def test_default_matcher_keeps_punctuation():
+    matcher = PhraseMatcher(COMMANDS)
+
+    assert matcher.best_match("What's up?").command_id == 1
+    assert matcher.best_match("what's up") is None
@@ -0,0 +1,40 @@
+"""
+Tests for resolving sentiment analysis replies to commands.
+"""
+from phrase_matcher import StreamingPhraseResolver
+from prompt_builder import NO_MATCH, PromptBuilder
+
+COMMANDS = [
+    {'id': 1, 'phrases': ['open tab', 'new tab'], 'script': 'ctrl+t', 'understand_sentiment': True, 'partial_match': False},
+    {'id': 12, 'phrases': ['close tab'], 'script': 'ctrl+w', 'understand_sentiment': True, 'partial_match': False},
+    {'id': 3, 'phrases': ['jump'], 'script': 'space', 'understand_sentiment': False, 'partial_match': False},
+]
+
+def stream_reply(builder, reply):
+    """Feed a reply one character at a time, as resolve_streamed_phrase does."""
+    resolver = StreamingPhraseResolver(builder.replies(builder.commands))
+    for char in reply:
+        resolved, phrase = resolver.feed(char)
+        if resolved:
+            return phrase if phrase else resolver.text.strip()
+    return resolver.finish() or resolver.text.strip()
+
+def test_streamed_id_replies_resolve_to_their_command():
+    builder = PromptBuilder(COMMANDS)
+
+    assert builder.resolve(stream_reply(builder, 'c12'))['id'] == 12
+    assert builder.resolve(stream_reply(builder, 'c1'))['id'] == 1
+
+def test_streamed_phrase_replies_resolve_to_their_command():
+    builder = PromptBuilder(COMMANDS)
+
+    assert stream_reply(builder, 'Open tab') == 'open tab'
+    assert builder.resolve(stream_reply(builder, 'Open tab'))['id'] == 1
+    assert builder.resolve(stream_reply(builder, '"close tab."'))['id'] == 12
+
+def test_no_match_and_unknown_replies():
+    builder = PromptBuilder(COMMANDS)
+
+    assert builder.is_no_match(stream_reply(builder, NO_MATCH))
+    assert builder.resolve(stream_reply(builder, 'jump')) is None
+    assert builder.replies([]) == [NO_MATCH]
@@ -0,0 +1,81 @@
+"""
+Tests for the recognizer backends, driven through SpeechRecognizer with the fake backend.
+"""
+import pytest
+
+sr = pytest.importorskip('speech_recognition')
+
+from speech_recognizer import FakeBackend, RecognizerBackend, SpeechRecognizer, create_backend
+from vad import MIN_NOISE_FLOOR
+
+def make_audio(transcript=None):
+    """A short silent phrase, optionally carrying the transcript the fake backend returns."""
+    audio = sr.AudioData(b'\0\0' * 1600, 16000, 2)
+    if transcript is not None:
+        audio.transcript = transcript
+    return audio
+
+def fake_recognizer(**options):
+    recognizer = SpeechRecognizer()
+    assert recognizer.set_backend('fake', **options)
+    return recognizer
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        RecognizerBackend()
+
+    class Incomplete(RecognizerBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_create_backend_rejects_unknown_names():
+    assert isinstance(create_backend('fake'), FakeBackend)
+    with pytest.raises(ValueError):
+        create_backend('nonexistent')
+
+def test_n_best_returns_transcripts_in_order():
+    recognizer = fake_recognizer(transcripts=['open the door', 'close the door'])
+
+    assert recognizer.recognize_n_best(make_audio()) == [{'text': 'open the door', 'confidence': None}]
+    assert recognizer.recognize_n_best(make_audio()) == [{'text': 'close the door', 'confidence': None}]
+    assert recognizer.recognize_n_best(make_audio()) == []
+    assert recognizer.backend.calls == 3
+
+def test_n_best_prefers_the_transcript_carried_by_the_audio():
+    recognizer = fake_recognizer(transcripts=['open the door'])
+
+    assert recognizer.recognize_n_best(make_audio('lights on')) == [{'text': 'lights on', 'confidence': None}]
+    assert recognizer.recognize(make_audio()) == 'open the door'
+
+def test_grammar_mode_returns_only_grammar_phrases():
+    recognizer = fake_recognizer()
+    recognizer.set_grammar(['open', 'open the door', 'lights on'])
+
+    hypotheses = recognizer.recognize_n_best(make_audio('please open the door now'))
+    assert hypotheses == [{'text': 'open the door', 'confidence': None}]
+    assert recognizer.recognize_n_best(make_audio('what a nice day')) == []
+
+    recognizer.set_grammar(None)
+    assert recognizer.recognize(make_audio('what a nice day')) == 'what a nice day'
+
+def test_grammar_is_kept_when_switching_backends():
+    recognizer = SpeechRecognizer()
+    recognizer.set_grammar(['lights on'])
+    assert recognizer.set_backend('fake')
+
+    assert recognizer.backend.grammar == ['lights on']
+    assert recognizer.recognize(make_audio('turn the lights on')) == 'lights on'
+
+def test_stream_reveals_one_word_per_chunk():
+    backend = FakeBackend(partials=['gear up now'])
+    stream = backend.start_stream(16000)
+
+    assert [stream.accept(b'') for _ in range(4)] == ['gear', 'gear up', 'gear up now', 'gear up now']
+
+def test_saved_calibration_keeps_the_minimum_noise_floor():
+    recognizer = SpeechRecognizer()
+    recognizer.apply_calibration(120.0, 0.0)
+
+    assert recognizer.get_calibration() == {'energy_threshold': 120.0, 'noise_floor': MIN_NOISE_FLOOR}
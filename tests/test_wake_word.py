@@ -0,0 +1,65 @@
+"""
+Tests for the wake word gate.
+"""
+import pytest
+
+from wake_word import WakeWordGate
+
+class StubBackend:
+    """Keyword spotter returning fixed transcripts, or raising for an Exception."""
+
+    name = 'stub'
+    supports_grammar = False
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def recognize(self, recognizer, audio):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self):
+        pass
+
+def test_wake_word_is_matched_on_word_boundaries():
+    gate = WakeWordGate('Hey', StubBackend())
+
+    assert gate.heard_in('hey computer')
+    assert gate.heard_in('oh, HEY there')
+    assert not gate.heard_in('they said so')
+    assert not gate.heard_in('heyday')
+    assert not gate.heard_in('')
+
+def test_multi_word_wake_word_must_be_consecutive():
+    gate = WakeWordGate('hey computer', StubBackend())
+
+    assert gate.heard_in('well hey computer open the door')
+    assert not gate.heard_in('hey there computer')
+    assert not gate.heard_in('they computer')
+
+def test_strip_removes_only_a_leading_whole_wake_word():
+    gate = WakeWordGate('hey computer', StubBackend())
+
+    assert gate.strip('Hey, computer: gear up') == 'gear up'
+    assert gate.strip('hey computer') == ''
+    assert gate.strip('they computer gear up') == 'they computer gear up'
+    assert gate.strip('hey computers gear up') == 'hey computers gear up'
+    assert gate.strip('gear up hey computer') == 'gear up hey computer'
+
+def test_check_opens_the_window_on_a_hit_and_counts_backend_errors_as_misses():
+    gate = WakeWordGate('hey', StubBackend('they left', RuntimeError('decoder failed'), 'hey gear up'))
+
+    assert not gate.check(None, None)
+    assert not gate.check(None, None)
+    assert gate.check(None, None)
+    assert gate.is_open
+    assert gate.check(None, None)
+
+    stats = gate.get_stats()
+    assert (stats['hits'], stats['misses'], stats['passes']) == (1, 2, 1)
+
+def test_wake_word_without_words_is_rejected():
+    with pytest.raises(ValueError):
+        WakeWordGate('?!', StubBackend())
@@ -0,0 +1,144 @@
+"""
+Voice activity detection module for voice command application.
+"""
+import math
+import threading
+import numpy as np
+
+# Analysis frame length
+FRAME_SECONDS = 0.02
+
+# A frame is loud when its energy exceeds the noise floor by this factor (about 9.5 dB)
+SPEECH_TO_NOISE_RATIO = 3.0
+
+# Voiced speech has few zero crossings; hiss and fan noise have many
+MAX_SPEECH_ZCR = 0.3
+
+# Speech has a peaky spectrum; broadband noise is flat (close to 1)
+MAX_SPEECH_FLATNESS = 0.5
+
+# Time constant for the noise floor to rise towards louder background noise
+NOISE_ADAPT_SECONDS = 5.0
+
+# Lowest noise floor, so digital silence doesn't make every sound speech
+MIN_NOISE_FLOOR = 10.0
+
+# Minimum seconds of speech frames for a segment to be sent to the recognizer
+MIN_SPEECH_SECONDS = 0.1
+
+class VoiceActivityDetector:
+    """Vectorized voice activity detector with an online noise floor.
+
+    Audio is split into 20 ms frames and all frames of a block are analysed
+    at once with NumPy. A frame is speech when it is loud relative to the
+    noise floor and either has a low zero-crossing rate or a non-flat
+    spectrum. Frames judged to be noise continuously update the noise floor.
+    """
+
+    def __init__(self, noise_floor=MIN_NOISE_FLOOR, min_energy=0.0):
+        """Create the detector.
+
+        Args:
+            noise_floor: Initial RMS energy of the background noise
+            min_energy: RMS energy below which nothing counts as speech
+        """
+        self.enabled = True
+        self.noise_floor = max(noise_floor, MIN_NOISE_FLOOR)
+        self.min_energy = min_energy
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.segments_checked = 0
+        self.segments_rejected = 0
+
+    @property
+    def energy_threshold(self):
+        """RMS energy a frame needs to count as loud."""
+        return max(self.noise_floor * SPEECH_TO_NOISE_RATIO, self.min_energy)
+
+    def _window(self, frame_length):
+        window = self._windows.get(frame_length)
+        if window is None:
+            window = self._windows[frame_length] = np.hanning(frame_length).astype(np.float32)
+        return window
+
+    def analyze(self, samples, sample_rate, adapt=True):
+        """Classify every frame of a block of audio.
+
+        Args:
+            samples: NumPy int16 array
+            sample_rate: Samples per second
+            adapt: Update the noise floor from the frames judged to be noise
+
+        Returns:
+            Boolean NumPy array with one speech flag per frame
+        """
+        frame_length = max(1, int(sample_rate * FRAME_SECONDS))
+        frame_count = len(samples) // frame_length
+        if frame_count == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length).astype(np.float32)
+        energy = np.sqrt(np.mean(frames * frames, axis=1))
+
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        power = np.abs(np.fft.rfft(frames * self._window(frame_length), axis=1)) ** 2 + 1e-10
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+        with self._lock:
+            loud = energy > self.energy_threshold
+            speech = loud & ((zcr < MAX_SPEECH_ZCR) | (flatness < MAX_SPEECH_FLATNESS))
+
+            noise = energy[~speech]
+            if adapt and len(noise):
+                level = float(np.median(noise))
+                if level < self.noise_floor:
+                    # Fall quickly when the room gets quieter
+                    self.noise_floor = level
+                else:
+                    seconds = len(noise) * FRAME_SECONDS
+                    alpha = 1 - math.exp(-seconds / NOISE_ADAPT_SECONDS)
+                    self.noise_floor += alpha * (level - self.noise_floor)
+                self.noise_floor = max(self.noise_floor, MIN_NOISE_FLOOR)
+
+        return speech
+
+    def is_speech(self, samples, sample_rate):
+        """Whether most frames of a chunk are speech."""
+        flags = self.analyze(samples, sample_rate)
+        return bool(len(flags)) and float(np.mean(flags)) >= 0.5
+
+    def contains_speech(self, samples, sample_rate, adapt=False):
+        """Whether a segment has enough speech to be worth recognizing.
+
+        Args:
+            samples: NumPy int16 array
+            sample_rate: Samples per second
+            adapt: Update the noise floor, for segments the detector hasn't
+                already seen chunk by chunk
+        """
+        flags = self.analyze(samples, sample_rate, adapt=adapt)
+        speech_seconds = int(np.count_nonzero(flags)) * FRAME_SECONDS
+        with self._lock:
+            self.segments_checked += 1
+            if speech_seconds < MIN_SPEECH_SECONDS:
+                self.segments_rejected += 1
+                return False
+        return True
+
+    def contains_speech_audio(self, audio, adapt=False):
+        """contains_speech for a speech_recognition.AudioData segment."""
+        samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype='<i2')
+        return self.contains_speech(samples, audio.sample_rate, adapt)
+
+    def get_stats(self):
+        """Get the noise floor and how many segments were rejected."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'noiseFloor': round(self.noise_floor, 1),
+                'energyThreshold': round(self.energy_threshold, 1),
+                'segmentsChecked': self.segments_checked,
+                'segmentsRejected': self.segments_rejected
+            }
@@ -0,0 +1,117 @@
+"""
+Wake word gate module for voice command application.
+"""
+import threading
+import time
+
+from command_grammar import normalize_grammar_phrase
+
+# Seconds after the wake word during which phrases go straight to recognition
+DEFAULT_WINDOW_SECONDS = 10.0
+
+class WakeWordGate:
+    """Only let phrases through to full recognition after a wake word.
+
+    Every phrase outside the window is first decoded by a small on-device
+    backend whose grammar holds nothing but the wake word. A hit opens the
+    window and passes the phrase on (it may hold a command right after the
+    wake word); a miss drops it before it costs an API call or a full decode.
+    """
+
+    def __init__(self, wake_word, backend, window_seconds=DEFAULT_WINDOW_SECONDS):
+        """Create the gate.
+
+        Args:
+            wake_word: Phrase that opens the gate
+            backend: RecognizerBackend used for keyword spotting; it is
+                constrained to the wake word if it supports grammars
+            window_seconds: Seconds the gate stays open after a hit
+
+        Raises:
+            ValueError: If the wake word has no words a decoder can match
+        """
+        self.wake_word = normalize_grammar_phrase(wake_word)
+        self._wake_words = self.wake_word.split()
+        # An empty wake word would be "heard" in every phrase
+        if not self._wake_words:
+            raise ValueError(f"Wake word '{wake_word}' has no words to listen for")
+        self.backend = backend
+        self.window_seconds = window_seconds
+        if backend.supports_grammar:
+            backend.set_grammar([self.wake_word])
+
+        self._lock = threading.Lock()
+        self._open_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.passes = 0
+
+    @property
+    def is_open(self):
+        return time.time() < self._open_until
+
+    def check(self, recognizer, audio):
+        """Decide whether a phrase should be recognized.
+
+        Args:
+            recognizer: The speech_recognition.Recognizer in use
+            audio: speech_recognition.AudioData of the phrase
+
+        Returns:
+            True to send the phrase to full recognition
+        """
+        if self.is_open:
+            with self._lock:
+                self.passes += 1
+            return True
+
+        try:
+            text = self.backend.recognize(recognizer, audio) or ''
+        except Exception as e:
+            # Keyword spotters raise for audio they can't decode; count it as a miss
+            print(f"Error spotting wake word ({self.backend.name}): {e}")
+            text = ''
+
+        found = self.heard_in(text)
+        with self._lock:
+            if found:
+                self.hits += 1
+                self._open_until = time.time() + self.window_seconds
+            else:
+                self.misses += 1
+        if found:
+            print(f"Wake word '{self.wake_word}' detected, listening for {self.window_seconds:g}s")
+        return found
+
+    def heard_in(self, text):
+        """Whether the wake word occurs in a transcript as whole words, so 'hey' isn't heard in 'they'."""
+        words = normalize_grammar_phrase(text).split()
+        size = len(self._wake_words)
+        return any(words[start:start + size] == self._wake_words for start in range(len(words) - size + 1))
+
+    def strip(self, text):
+        """Remove a leading wake word, matched as whole words, from a transcript."""
+        words = text.split()
+        heard = []
+        for index, word in enumerate(words):
+            heard.extend(normalize_grammar_phrase(word).split())
+            if heard == self._wake_words:
+                return ' '.join(words[index + 1:])
+            if heard != self._wake_words[:len(heard)]:
+                break
+        return text
+
+    def get_stats(self):
+        """Get hit, miss and pass counts and whether the window is open."""
+        with self._lock:
+            return {
+                'wakeWord': self.wake_word,
+                'hits': self.hits,
+                'misses': self.misses,
+                'passes': self.passes,
+                'open': self.is_open,
+                'remainingSeconds': max(0.0, round(self._open_until - time.time(), 1))
+            }
+
+    def close(self):
+        self.backend.close()